@@ -72,7 +72,7 @@ def ejecutar_accion(
         return gmail_leer_ultimo()
 
     if accion == "contar_no_leidos":
-        return gmail_contar_no_leidos()
+        return gmail_contar_no_leidos(accurate=bool(filtros.get("exacto")))
 
     if accion in {"resumen", "resumen_hoy"}:
         return _do_resumen(filtros.get("max"))
@@ -28,6 +28,7 @@ if USE_FAKE:
         listar as _listar,
         leer_ultimo as _leer_ultimo,
         contar_no_leidos as _contar_no_leidos,
+        mailbox_version as _mailbox_version,
     )
     # buscar puede no existir en fake → hacemos fallback a lista vacía
     try:
@@ -40,6 +41,7 @@ else:
         listar as _listar,
         leer_ultimo as _leer_ultimo,
         contar_no_leidos as _contar_no_leidos,
+        mailbox_version as _mailbox_version,
     )
     # Buscar real es opcional: si no está, devolvemos vacío
     try:
@@ -48,6 +50,21 @@ else:
         def _buscar(*, query: str, max_results: int = 20, **kwargs) -> List[Dict[str, Any]]:
             return []
 
+    # Engine async (gmail.engine = "async"): mismo contrato, I/O sobre asyncio+httpx.
+    # Sin httpx instalado seguimos con el engine de threads.
+    from utils.config import gmail_engine
+    if gmail_engine() == "async":
+        try:
+            from .leer_async import (  # type: ignore
+                listar as _listar,
+                leer_ultimo as _leer_ultimo,
+                contar_no_leidos as _contar_no_leidos,
+                buscar as _buscar,
+            )
+            BACKEND = "real-async"
+        except ImportError as e:
+            print(f"⚠️ gmail.engine=async no disponible ({e}); uso threads")
+
 # Remitentes: módulo dedicado (fake/real lo resuelve internamente)
 from .remitentes import (  # type: ignore
     remitentes_hoy as _remitentes_hoy,
@@ -91,10 +108,11 @@ def leer_ultimo(*args, **kwargs) -> Dict[str, Any]:
     return _timed("leer_ultimo", _leer_ultimo)
 
 
-def contar_no_leidos(*args, **kwargs) -> int:
+def contar_no_leidos(accurate: bool = False, *args, **kwargs) -> int:
+    """No leídos de Primary; `accurate=True` recorre mensaje a mensaje (exacto, más caro)."""
     if args or kwargs:
         print(f"⚠️ contar_no_leidos ignoró args extra: args={args} kwargs={kwargs}")
-    return _timed("contar_no_leidos", _contar_no_leidos)
+    return _timed("contar_no_leidos", lambda: _contar_no_leidos(accurate=bool(accurate)))
 
 
 def buscar(query: str, max_results: int = 20, *args, **kwargs) -> List[Dict[str, Any]]:
@@ -103,6 +121,13 @@ def buscar(query: str, max_results: int = 20, *args, **kwargs) -> List[Dict[str,
     return _timed("buscar", lambda: _buscar(query=query, max_results=max_results))
 
 
+def mailbox_version(max_age_s: int = 5) -> str | None:
+    """Versión del buzón (historyId en real); cambia cuando cambia el inbox."""
+    if USE_FAKE:
+        return _mailbox_version()
+    return _mailbox_version(max_age_s)
+
+
 __all__ = [
     "listar",
     "remitentes_hoy",
@@ -110,4 +135,5 @@ __all__ = [
     "leer_ultimo",
     "contar_no_leidos",
     "buscar",
+    "mailbox_version",
 ]
@@ -2,19 +2,29 @@
 from __future__ import annotations
 
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 
+import httplib2
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
 
 # Config centralizada (H4)
 from utils import config as cfg
 
 # Cache en módulo para no reconstruir el cliente en cada llamada
 _SERVICE = None  # type: Optional[object]
+_SERVICE_LOCK = threading.Lock()
+# Credenciales compartidas (cliente sync y engine async)
+_CREDS = None  # type: Optional[Credentials]
+_CREDS_LOCK = threading.Lock()
 
 
 def _scopes() -> List[str]:
@@ -76,13 +86,32 @@ def _load_or_create_credentials(scopes: List[str]) -> Credentials:
     return creds
 
 
+# Discovery document vendorizado (tools/update_gmail_discovery.py lo genera)
+DISCOVERY_PATH = Path(__file__).resolve().parent / "discovery" / "gmail.v1.json"
+
+
+def _build_service(creds: Credentials):
+    """
+    Construye el cliente sin pedir el discovery document por red:
+      1) copia vendorizada en core/gmail/discovery/gmail.v1.json (versión fija)
+      2) copia estática que trae google-api-python-client >= 2.0
+      3) red (clientes antiguos sin static_discovery)
+    """
+    if DISCOVERY_PATH.exists():
+        return build_from_document(DISCOVERY_PATH.read_text(encoding="utf-8"), credentials=creds)
+    try:
+        return build("gmail", "v1", credentials=creds, cache_discovery=False, static_discovery=True)
+    except TypeError:
+        return build("gmail", "v1", credentials=creds, cache_discovery=False)
+
+
 def get_authenticated_service():
     """
     Devuelve un cliente de Gmail autenticado.
     Respetar:
       - Scopes desde config.json
       - Refresco/creación de token.json
-      - cache_discovery deshabilitado (menos ruido)
+      - Discovery offline (ver _build_service)
     """
     global _SERVICE
     if _SERVICE is not None:
@@ -94,7 +123,175 @@ def get_authenticated_service():
         # Devolvemos None para que sea evidente si alguien lo usa por error.
         return None
 
-    scopes = _scopes()
-    creds = _load_or_create_credentials(scopes)
-    _SERVICE = build("gmail", "v1", credentials=creds, cache_discovery=False)
+    # Lock: el warmup de arranque y el primer request pueden llegar juntos
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = _build_service(get_credentials())
     return _SERVICE
+
+
+def get_credentials() -> Credentials:
+    """Credenciales OAuth cargadas una vez por proceso (token.json / flujo OAuth)."""
+    global _CREDS
+    with _CREDS_LOCK:
+        if _CREDS is None:
+            _CREDS = _load_or_create_credentials(_scopes())
+        return _CREDS
+
+
+def get_access_token() -> str:
+    """Access token vigente; refresca si expiró. Thread-safe (lo usa el engine async)."""
+    creds = get_credentials()
+    with _CREDS_LOCK:
+        if not creds.valid and creds.refresh_token:
+            creds.refresh(Request())
+        return str(creds.token)
+
+
+# ---------------- Pool de servicios (thread-safe) ----------------
+# httplib2.Http (transporte de googleapiclient) no es thread-safe: un mismo servicio
+# usado desde varios threads mezcla sockets y respuestas. Cada thread de fetch toma
+# prestado un servicio propio (mismas credenciales, transporte y keep-alive propios).
+
+_POOL_LOCK = threading.Lock()
+_POOL_IDLE: "queue.LifoQueue[Any]" = queue.LifoQueue()  # LIFO: reusa las conexiones más calientes
+_POOL_STATS: Dict[str, Any] = {
+    "size": 0, "max_size": 0, "in_use": 0, "peak_in_use": 0,
+    "checkouts": 0, "waits": 0, "wait_ms_total": 0.0, "builds": 0,
+}
+
+
+def _pool_max_size() -> int:
+    try:
+        return int(cfg.gmail_concurrency_get())
+    except Exception:
+        return 4
+
+
+def _build_pooled_service():
+    """Servicio nuevo con transporte propio; reutiliza el discovery del servicio principal."""
+    primary = get_authenticated_service()
+    http = AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=30))
+    return build_from_document(primary._rootDesc, http=http)
+
+
+def _checkout():
+    max_size = _pool_max_size()
+    with _POOL_LOCK:
+        _POOL_STATS["max_size"] = max_size
+    try:
+        svc = _POOL_IDLE.get_nowait()
+    except queue.Empty:
+        svc = None
+        with _POOL_LOCK:
+            can_build = _POOL_STATS["size"] < max_size
+            if can_build:
+                _POOL_STATS["size"] += 1
+        if can_build:
+            try:
+                svc = _build_pooled_service()
+            except Exception:
+                with _POOL_LOCK:
+                    _POOL_STATS["size"] -= 1
+                raise
+            with _POOL_LOCK:
+                _POOL_STATS["builds"] += 1
+        else:
+            # Pool lleno: esperamos a que otro thread devuelva su servicio
+            t0 = time.perf_counter()
+            svc = _POOL_IDLE.get()
+            with _POOL_LOCK:
+                _POOL_STATS["waits"] += 1
+                _POOL_STATS["wait_ms_total"] += (time.perf_counter() - t0) * 1000.0
+    with _POOL_LOCK:
+        _POOL_STATS["checkouts"] += 1
+        _POOL_STATS["in_use"] += 1
+        _POOL_STATS["peak_in_use"] = max(_POOL_STATS["peak_in_use"], _POOL_STATS["in_use"])
+    return svc
+
+
+def _checkin(svc) -> None:
+    with _POOL_LOCK:
+        _POOL_STATS["in_use"] -= 1
+    _POOL_IDLE.put(svc)
+
+
+@contextmanager
+def lease_service(service) -> Iterator[Any]:
+    """
+    Presta un servicio del pool para usar desde un thread de fetch.
+    Sólo aplica al servicio compartido de get_authenticated_service(); cualquier otro
+    (fakes de tests, None en modo fake) se devuelve tal cual.
+    Mantener el préstamo sólo durante la llamada (no anidar leases).
+    """
+    if service is None or service is not _SERVICE:
+        yield service
+        return
+    svc = _checkout()
+    try:
+        yield svc
+    finally:
+        _checkin(svc)
+
+
+def service_pool_stats() -> Dict[str, Any]:
+    """Métricas de utilización del pool (para /health y tuning de concurrency_get)."""
+    with _POOL_LOCK:
+        stats = dict(_POOL_STATS)
+    checkouts = stats["checkouts"]
+    stats["utilization"] = round(stats["in_use"] / stats["max_size"], 3) if stats["max_size"] else None
+    stats["avg_wait_ms"] = round(stats["wait_ms_total"] / checkouts, 2) if checkouts else 0.0
+    stats["wait_ms_total"] = round(stats["wait_ms_total"], 2)
+    return stats
+
+
+# ---------------- Warmup de arranque ----------------
+
+_WARMUP: Dict[str, Any] = {"status": "idle", "duration_ms": None, "error": None}
+
+
+def _warmup() -> None:
+    t0 = time.perf_counter()
+    _WARMUP.update(status="running", error=None)
+    try:
+        get_access_token()          # carga token.json y refresca si expiró
+        get_authenticated_service()  # cliente principal (discovery offline)
+        with lease_service(_SERVICE):
+            pass                     # primer servicio del pool, listo para el primer fetch
+        _WARMUP["status"] = "done"
+    except Exception as e:
+        _WARMUP.update(status="failed", error=f"{type(e).__name__}: {e}")
+        print(f"⚠️ warmup Gmail falló: {_WARMUP['error']}")
+    finally:
+        _WARMUP["duration_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+
+def start_warmup(background: bool = True) -> bool:
+    """
+    Refresca credenciales y construye el cliente antes del primer request.
+    No hace nada en modo fake ni sin token.json (el flujo OAuth abre un navegador:
+    eso no debe pasar en un thread de fondo). Retorna True si el warmup partió.
+    """
+    if os.getenv("USE_FAKE_GMAIL", "0") in {"1", "true", "yes"}:
+        return False
+    _, token_path = _credentials_paths()
+    if not token_path.exists():
+        _WARMUP["status"] = "skipped"
+        return False
+    if background:
+        threading.Thread(target=_warmup, name="gmail-warmup", daemon=True).start()
+    else:
+        _warmup()
+    return True
+
+
+def warmup_status() -> Dict[str, Any]:
+    return dict(_WARMUP)
+
+
+def _reset_pool_for_tests() -> None:
+    global _POOL_IDLE
+    with _POOL_LOCK:
+        _POOL_IDLE = queue.LifoQueue()
+        for k in _POOL_STATS:
+            _POOL_STATS[k] = 0.0 if k == "wait_ms_total" else 0
@@ -1,11 +1,24 @@
 # core/gmail/buscar.py
 from __future__ import annotations
+import contextvars
 from typing import List, Dict, Any, Optional
 
 from .auth import get_authenticated_service
-from .leer import _list_primary_message_ids, _get_message_metadata
+from .leer import iter_message_metadata, _effective_concurrency
 from utils import config
-from utils.retry import RetryError
+
+# Métricas de la última búsqueda del request (mismo patrón que utils.retry)
+_search_ctx: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("_search_ctx", default=None)
+
+
+def consume_buscar_stats() -> Optional[Dict[str, Any]]:
+    """
+    Snapshot de la última búsqueda del contexto actual y reset. None si no hubo búsqueda.
+    Formato: {"ids_listed": int, "gets_issued": int, "gets_wasted": int, "results": int}
+    """
+    data = _search_ctx.get()
+    _search_ctx.set(None)
+    return dict(data) if data is not None else None
 
 
 def buscar(query: str, max_results: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -15,6 +28,9 @@ def buscar(query: str, max_results: Optional[int] = None) -> List[Dict[str, Any]
       - Campos mínimos y headers filtrados (reutiliza helpers de leer.py)
       - Backoff con jitter ante 429/403 rate/5xx (reutiliza retry interno)
       - Corte estricto en max_results (configurable)
+      - Gets concurrentes (concurrency_get) sobre el pipeline de listar, en orden de
+        inbox; deja de pedir apenas tiene max_results resultados válidos
+      - Métricas por búsqueda en consume_buscar_stats()
     """
     q = (query or "").strip()
     if not q:
@@ -25,21 +41,27 @@ def buscar(query: str, max_results: Optional[int] = None) -> List[Dict[str, Any]
         # Respeta límite global y el solicitado
         settings["max_results"] = max(1, min(int(max_results), settings["max_results"]))
 
-    service = get_authenticated_service()
+    wanted = settings["max_results"]
+    # Listamos con holgura (2×) para reponer los excluidos/degradados; el corte
+    # temprano evita pedir el resto una vez que hay `wanted` resultados válidos
+    settings["max_results"] = wanted * 2
 
-    # Reutiliza la misma lógica de listado que Primary (agrega el query del usuario)
-    ids = _list_primary_message_ids(service, settings, base_query=q)
+    service = get_authenticated_service()
 
+    stats: Dict[str, int] = {}
     out: List[Dict[str, Any]] = []
-    for mid in ids:
-        try:
-            meta = _get_message_metadata(service, mid, settings)
-            if meta:
-                out.append(meta)
-        except RetryError:
-            # Si se agotaron reintentos en este ID, seguimos con el siguiente
-            continue
-        if len(out) >= settings["max_results"]:
-            break
+    # Ventana = concurrency_get: a lo más esa cantidad de gets queda sobrando al cortar
+    stream = iter_message_metadata(
+        service, settings, base_query=q, window=_effective_concurrency(settings), stats=stats
+    )
+    try:
+        for meta in stream:
+            out.append(meta)
+            if len(out) >= wanted:
+                break
+    finally:
+        stream.close()
+        stats["results"] = len(out)
+        _search_ctx.set(stats)
 
     return out
@@ -1,18 +1,32 @@
 # core/gmail/leer.py
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+from collections import deque
 from email.utils import parsedate_to_datetime
 from datetime import datetime, timezone
+import contextvars
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
 
-from .auth import get_authenticated_service
+from .auth import get_authenticated_service, lease_service
 from utils.dates import get_rfc3339_today
 from utils import config
-from utils.retry import gmail_retry_wrapper, RetryError
-from utils.cache import cache_get, cache_set, make_cache_key
-from utils.circuit_breaker import before_call as cb_before, after_success as cb_ok, after_failure as cb_fail, configure as cb_conf
+from utils.retry import gmail_guarded_call, gmail_retry_wrapper, DeadlineExceeded, RetryError
+from utils import deadline
+from utils.cache import cache_get, cache_get_or_load, cache_set, make_cache_key
+from utils.circuit_breaker import before_call as cb_before, after_success as cb_ok, after_failure as cb_fail, configure_from_settings as cb_conf
+from utils.message_store import read_through, store_peek, store_put
+from utils.degradation import record_skipped
+from utils.hedging import hedged_result, submit_primary
+from utils.rate_governor import QUOTA_UNITS
+from .mirror import CB_KEY_HISTORY, mirror_enabled, mirror_messages  # noqa: F401
 
+# Un breaker por operación: un list degradado no debe cortar los get (ni viceversa)
+CB_KEY_LIST = "gmail:messages.list"
 CB_KEY_GET = "gmail:messages.get"
+# Latencias para el hedging de chunks batch (las de un get suelto van en CB_KEY_GET)
+HEDGE_OP_BATCH = "gmail:messages.get:batch"
 
 def _effective_concurrency(settings: Dict[str, Any]) -> int:
     if os.getenv("USE_FAKE_GMAIL", "").strip().lower() in {"1", "true", "yes", "y"}:
@@ -38,92 +52,187 @@ def _primary_query(base_query: Optional[str] = None) -> str:
         parts.append(f"({base_query})")
     return " ".join(parts)
 
-def _list_primary_message_ids(service, settings: Dict[str, Any], base_query: Optional[str] = None) -> List[str]:
+def _iter_primary_id_pages(service, settings: Dict[str, Any], base_query: Optional[str] = None) -> Iterator[List[str]]:
+    """Páginas de ids (messages.list) a medida que llegan; corta en max_results."""
     q = _primary_query(base_query)
     max_results = settings["max_results"]
     fields_list = settings["fields_list"]
 
-    ids: List[str] = []
+    listed = 0
     page_token = None
 
-    while len(ids) < max_results:
+    while listed < max_results:
         def _call():
-            return (
-                service.users()
-                .messages()
-                .list(
-                    userId="me",
-                    q=q,
-                    labelIds=["INBOX"],
-                    maxResults=min(max_results - len(ids), max_results),
-                    includeSpamTrash=False,
-                    fields=fields_list,
-                    pageToken=page_token,
+            with lease_service(service) as svc:
+                return (
+                    svc.users()
+                    .messages()
+                    .list(
+                        userId="me",
+                        q=q,
+                        labelIds=["INBOX"],
+                        maxResults=min(max_results - listed, max_results),
+                        includeSpamTrash=False,
+                        fields=fields_list,
+                        pageToken=page_token,
+                    )
+                    .execute()
+                    or {}
                 )
-                .execute()
-                or {}
-            )
 
-        resp, meta = gmail_retry_wrapper(_call, settings)
+        try:
+            resp, meta = gmail_guarded_call(CB_KEY_LIST, _call, settings, units=QUOTA_UNITS["messages.list"])
+        except DeadlineExceeded:
+            # sin tiempo para otra página: se entrega lo ya listado (sin nada, es un error)
+            if not listed:
+                raise
+            return
         msgs = resp.get("messages", []) or []
-        ids.extend([m["id"] for m in msgs])
+        page = [m["id"] for m in msgs][: max_results - listed]
+        listed += len(page)
+        if page:
+            yield page
         page_token = resp.get("nextPageToken")
-        if not page_token or len(ids) >= max_results:
+        if not page_token:
             break
 
-    return ids[:max_results]
+def _list_primary_message_ids(service, settings: Dict[str, Any], base_query: Optional[str] = None) -> List[str]:
+    ids: List[str] = []
+    for page in _iter_primary_id_pages(service, settings, base_query=base_query):
+        ids.extend(page)
+    return ids
+
+def _negative_key(msg_id: str):
+    return make_cache_key("msg_neg", id=msg_id)
+
+def _negative_hit(msg_id: str) -> bool:
+    """True si el id falló hace poco (cache negativa): se omite sin gastar cuota."""
+    entry = cache_get(_negative_key(msg_id))
+    if entry is None:
+        return False
+    record_skipped(msg_id, "negative_cache", max(0.0, float(entry["until"]) - time.time()))
+    return True
+
+def _negative_put(msg_id: str, reason: str, settings: Dict[str, Any]) -> None:
+    """Recuerda un fallo por gmail.negative_cache_seconds y lo anota en el reporte del request."""
+    ttl = int(settings.get("negative_ttl_s", 30))
+    record_skipped(msg_id, reason, ttl or None)
+    if ttl > 0:
+        cache_set(_negative_key(msg_id), {"reason": reason, "until": time.time() + ttl}, ttl)
 
-def _get_message_metadata(service, msg_id: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+def _get_message_metadata(service, msg_id: str, settings: Dict[str, Any], *, single_flight: bool = True,
+                          excluded: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """
+    Metadata de un id (cache negativa → cache → store → messages.get con retry + breaker).
+    `single_flight=False` (duplicado del hedging) no espera al load en curso del mismo id.
+    `excluded` (opcional) junta los ids que llegaron bien pero tienen un label excluido:
+    así el caller distingue un {} por filtro de uno por fallo.
+    """
     fields_get = settings["fields_get"]
-    wanted_headers = [h.lower() for h in settings["headers_get"]]
-    excluded_labels = set(settings.get("excluded_labels", []))
-    ttl = int(settings.get("cache_ttl_seconds", 60))
+
+    # ---- CACHE NEGATIVA: ids que fallaron hace poco no se reintentan en cada request
+    if _negative_hit(msg_id):
+        return {}
 
     # Configure breaker según settings (idempotente y barato)
-    cb_conf(CB_KEY_GET,
-            threshold=int(settings.get("cb_threshold", 3)),
-            cooldown_s=int(settings.get("cb_cooldown_s", 30)))
+    cb_conf(CB_KEY_GET, settings)
 
-    # ---- CACHE: lookup previo
     cache_key = make_cache_key("msg_get", id=msg_id, fields=fields_get)
-    cached = cache_get(cache_key)
-    if cached is not None:
-        return cached
-
-    # ---- CIRCUIT BREAKER: precheck
-    if settings.get("cb_enabled", True):
-        allow, retry_after = cb_before(CB_KEY_GET)
-        if not allow:
-            # Degradamos silenciosamente este item
+
+    def _fetch() -> Dict[str, Any]:
+        # ---- CIRCUIT BREAKER: precheck
+        if settings.get("cb_enabled", True):
+            allow, retry_after = cb_before(CB_KEY_GET)
+            if not allow:
+                # Degradamos este item (queda en el reporte del request)
+                record_skipped(msg_id, "breaker_open", retry_after)
+                return {}
+
+        def _call():
+            with lease_service(service) as svc:
+                return (
+                    svc.users()
+                    .messages()
+                    .get(
+                        userId="me",
+                        id=msg_id,
+                        format="metadata",
+                        metadataHeaders=settings["headers_get"],
+                        fields=fields_get,
+                    )
+                    .execute()
+                    or {}
+                )
+
+        try:
+            msg, meta = gmail_retry_wrapper(_call, settings)
+            # éxito → cerrar breaker si estaba half-open
+            if settings.get("cb_enabled", True):
+                cb_ok(CB_KEY_GET)
+            return msg
+        except RetryError as e:
+            code = int(e.last_error_code or 429)
+            # fallo → incrementar breaker (si aplica; el 408 del deadline sólo libera la prueba)
+            if settings.get("cb_enabled", True):
+                cb_fail(CB_KEY_GET, code)
+            if isinstance(e, DeadlineExceeded):
+                # corte nuestro, no de Gmail: sin cache negativa
+                record_skipped(msg_id, "deadline")
+                return {}
+            _negative_put(msg_id, f"retry_exhausted:{code}", settings)
+            # devolvemos vacío para que el batch lo filtre
             return {}
 
+    def _load() -> Dict[str, Any]:
+        # ---- STORE persistente: contenido inmutable + labels de vida corta
+        msg = read_through(msg_id, fields_get, _fetch,
+                           labels_loader=lambda: _fetch_label_ids(service, msg_id, settings))
+        if not msg:
+            return {}
+        meta = _postprocess_metadata(msg, settings, None)
+        if not meta and excluded is not None:
+            excluded.add(msg_id)
+        return meta
+
+    if not single_flight:
+        return _load()
+
+    # ---- CACHE: single-flight por id + stale-while-revalidate (los {} no se cachean)
+    return cache_get_or_load(cache_key, _load,
+                             int(settings.get("cache_ttl_seconds", 60)),
+                             int(settings.get("cache_stale_s", 0)))
+
+def _fetch_label_ids(service, msg_id: str, settings: Optional[Dict[str, Any]] = None) -> Optional[List[str]]:
+    """labelIds vigentes con format=minimal (refresco barato para el message store)."""
+    if service is None:
+        return None
+
     def _call():
-        return (
-            service.users()
-            .messages()
-            .get(
-                userId="me",
-                id=msg_id,
-                format="metadata",
-                metadataHeaders=settings["headers_get"],
-                fields=fields_get,
+        with lease_service(service) as svc:
+            return (
+                svc.users()
+                .messages()
+                .get(userId="me", id=msg_id, format="minimal", fields="id,labelIds")
+                .execute()
+                or {}
             )
-            .execute()
-            or {}
-        )
 
     try:
-        msg, meta = gmail_retry_wrapper(_call, settings)
-        # éxito → cerrar breaker si estaba half-open
-        if settings.get("cb_enabled", True):
-            cb_ok(CB_KEY_GET)
-    except RetryError as e:
-        # fallo → incrementar breaker (si aplica)
-        if settings.get("cb_enabled", True):
-            code = getattr(e, "code", 429)
-            cb_fail(CB_KEY_GET, int(code))
-        # devolvemos vacío para que el batch lo filtre
-        return {}
+        if settings is not None:
+            resp, _ = gmail_retry_wrapper(_call, settings)
+        else:
+            resp = _call()
+    except Exception:
+        return None
+    labels = resp.get("labelIds")
+    return list(labels) if isinstance(labels, list) else None
+
+def _postprocess_metadata(msg: Dict[str, Any], settings: Dict[str, Any], cache_key) -> Dict[str, Any]:
+    """Filtra labels excluidos y headers no pedidos; guarda en cache si corresponde
+    (cache_key=None → no guarda: lo hace el caller vía cache_get_or_load)."""
+    wanted_headers = [h.lower() for h in settings["headers_get"]]
+    excluded_labels = set(settings.get("excluded_labels", []))
+    ttl = int(settings.get("cache_ttl_seconds", 60))
 
     label_ids = set(msg.get("labelIds", []) or [])
     if label_ids & excluded_labels:
@@ -134,51 +243,302 @@ def _get_message_metadata(service, msg_id: str, settings: Dict[str, Any]) -> Dic
     if "payload" in msg:
         msg["payload"]["headers"] = filtered
 
-    if ttl > 0:
-        cache_set(cache_key, msg, ttl)
+    if ttl > 0 and cache_key is not None:
+        cache_set(cache_key, msg, ttl, int(settings.get("cache_stale_s", 0)))
 
     return msg
 
-def _batch_get_metadata(service, ids: List[str], settings: Dict[str, Any]) -> List[Dict[str, Any]]:
-    if not ids:
-        return []
-    pos_by_id: Dict[str, int] = {mid: i for i, mid in enumerate(ids)}
-    results: List[Tuple[int, Dict[str, Any]]] = []
+def _batch_supported(service, settings: Dict[str, Any]) -> bool:
+    if not settings.get("batch_enabled", False):
+        return False
+    if os.getenv("USE_FAKE_GMAIL", "").strip().lower() in {"1", "true", "yes", "y"}:
+        return False
+    return service is not None and hasattr(service, "new_batch_http_request")
+
+def _http_batch_get_metadata(service, ids: List[str], settings: Dict[str, Any],
+                             excluded: Optional[Set[str]] = None) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    messages.get agrupados en requests multipart (hasta gmail.batch.size por batch).
+    Retorna (metas_por_id, pendientes): los pendientes son ids que fallaron dentro del
+    batch (o cuyo batch completo falló) y deben reintentarse con llamadas individuales,
+    que ya aplican retry + breaker + cache por id.
+    """
+    fields_get = settings["fields_get"]
+    size = max(1, min(int(settings.get("batch_size", 50)), 100))
+    cb_enabled = settings.get("cb_enabled", True)
+
+    cb_conf(CB_KEY_GET, settings)
+
+    found: Dict[str, Dict[str, Any]] = {}
+    pending: List[str] = []
+
+    # ---- CACHE: sólo pedimos al batch lo que no está en cache
+    to_fetch: List[str] = []
+    for mid in ids:
+        if _negative_hit(mid):
+            continue
+        cache_key = make_cache_key("msg_get", id=mid, fields=fields_get)
+        cached = cache_get(cache_key)
+        if cached is not None:
+            found[mid] = cached
+            continue
+        stored = store_peek(mid, fields_get)
+        if stored is not None:
+            found[mid] = _postprocess_metadata(stored, settings, cache_key)
+            if not found[mid] and excluded is not None:
+                excluded.add(mid)
+            continue
+        to_fetch.append(mid)
+
+    for start in range(0, len(to_fetch), size):
+        chunk = to_fetch[start:start + size]
+
+        # ---- CIRCUIT BREAKER: si está abierto, el fallback individual degradará cada id
+        if cb_enabled:
+            allow, _ = cb_before(CB_KEY_GET)
+            if not allow:
+                pending.extend(chunk)
+                continue
+
+        responses: Dict[str, Dict[str, Any]] = {}
+        failed: Dict[str, Exception] = {}
+
+        def _on_response(request_id, response, exception):
+            if exception is not None:
+                failed[request_id] = exception
+            else:
+                responses[request_id] = response or {}
+
+        def _call():
+            # Batch nuevo por intento: un reintento no debe mezclar respuestas previas
+            responses.clear()
+            failed.clear()
+            with lease_service(service) as svc:
+                batch = svc.new_batch_http_request(callback=_on_response)
+                for mid in chunk:
+                    batch.add(
+                        svc.users()
+                        .messages()
+                        .get(
+                            userId="me",
+                            id=mid,
+                            format="metadata",
+                            metadataHeaders=settings["headers_get"],
+                            fields=fields_get,
+                        ),
+                        request_id=mid,
+                    )
+                batch.execute()
+            return None
+
+        try:
+            # el batch cuesta lo mismo que sus sub-requests
+            gmail_retry_wrapper(_call, settings, units=QUOTA_UNITS["messages.get"] * len(chunk))
+        except RetryError as e:
+            if cb_enabled:
+                cb_fail(CB_KEY_GET, int(getattr(e, "last_error_code", None) or 429))
+            pending.extend(chunk)
+            continue
+
+        if cb_enabled and responses:
+            cb_ok(CB_KEY_GET)
+
+        for mid in chunk:
+            if mid in responses:
+                cache_key = make_cache_key("msg_get", id=mid, fields=fields_get)
+                store_put(mid, fields_get, responses[mid])
+                found[mid] = _postprocess_metadata(responses[mid], settings, cache_key)
+                if not found[mid] and excluded is not None:
+                    excluded.add(mid)
+            else:
+                # sub-respuesta con error (429/5xx/...) → fallback por id
+                pending.append(mid)
+
+    return found, pending
+
+def _submit_in_ctx(ex: Executor, fn, *args) -> Future:
+    """submit() que propaga contextvars (métricas de retry del request) al worker."""
+    return ex.submit(contextvars.copy_context().run, fn, *args)
+
+def _parallel_get_metadata(service, ids: List[str], settings: Dict[str, Any],
+                           excluded: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """messages.get individuales con el pool de threads (concurrency_get)."""
+    found: Dict[str, Dict[str, Any]] = {}
     conc = _effective_concurrency(settings)
 
     if conc <= 1 or len(ids) == 1:
         for mid in ids:
             try:
-                meta = _get_message_metadata(service, mid, settings)
+                meta = _get_message_metadata(service, mid, settings, excluded=excluded)
                 if meta:
-                    results.append((pos_by_id[mid], meta))
+                    found[mid] = meta
             except RetryError:
                 continue
     else:
-        def fetch_one(mid: str) -> Tuple[int, Dict[str, Any]]:
+        def fetch_one(mid: str) -> Tuple[str, Dict[str, Any]]:
             try:
-                meta = _get_message_metadata(service, mid, settings)
-                return (pos_by_id[mid], meta if meta else {})
+                meta = _get_message_metadata(service, mid, settings, excluded=excluded)
+                return (mid, meta if meta else {})
             except RetryError:
-                return (pos_by_id[mid], {})
+                return (mid, {})
 
-        with ThreadPoolExecutor(max_workers=conc, thread_name_prefix="gmail-get") as ex:
-            future_by_id = {ex.submit(fetch_one, mid): mid for mid in ids}
-            for fut in as_completed(future_by_id):
-                idx, meta = fut.result()
+        ex = ThreadPoolExecutor(max_workers=conc, thread_name_prefix="gmail-get")
+        futures = [_submit_in_ctx(ex, fetch_one, mid) for mid in ids]
+        done = 0
+        try:
+            for fut in as_completed(futures, timeout=deadline.remaining_s()):
+                done += 1
+                mid, meta = fut.result()
                 if meta:
-                    results.append((idx, meta))
+                    found[mid] = meta
+        except FuturesTimeout:
+            # deadline: se entrega lo que ya llegó; los gets en vuelo terminan solos
+            deadline.record_cut("messages", len(ids) - done)
+        finally:
+            ex.shutdown(wait=False, cancel_futures=True)
 
-    results.sort(key=lambda t: t[0])
-    return [m for _, m in results]
+    return found
+
+def _batch_get_metadata(service, ids: List[str], settings: Dict[str, Any],
+                        excluded: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Metadata de `ids` en orden, sin los vacíos. Un id que no vuelve quedó fuera por
+    label excluido (anotado en `excluded`, si se pasa) o por fallo/corte.
+    """
+    if not ids:
+        return []
+
+    found: Dict[str, Dict[str, Any]] = {}
+    pending: List[str] = list(ids)
+    if _batch_supported(service, settings) and len(ids) > 1:
+        found, pending = _http_batch_get_metadata(service, ids, settings, excluded)
+
+    if pending:
+        found.update(_parallel_get_metadata(service, pending, settings, excluded))
+
+    # Orden original (inbox) y fuera los vacíos (excluidos/degradados)
+    return [found[mid] for mid in ids if found.get(mid)]
+
+def _fetch_chunk(service, chunk: List[str], settings: Dict[str, Any], use_batch: bool,
+                 duplicate: bool = False) -> Dict[str, Dict[str, Any]]:
+    if use_batch and len(chunk) > 1:
+        return {m["id"]: m for m in _batch_get_metadata(service, chunk, settings)}
+    found: Dict[str, Dict[str, Any]] = {}
+    for mid in chunk:
+        try:
+            meta = _get_message_metadata(service, mid, settings, single_flight=not duplicate)
+        except RetryError:
+            meta = {}
+        if meta:
+            found[mid] = meta
+    return found
+
+def iter_message_metadata(
+    service,
+    settings: Dict[str, Any],
+    base_query: Optional[str] = None,
+    *,
+    window: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Pipeline list→get en streaming: cada página de messages.list se empieza a
+    pedir (messages.get o batch HTTP) apenas llega, mientras se lista la siguiente.
+    Entrega la metadata en orden de inbox en cuanto le toca su turno.
+
+    `window` = máximo de fetches en vuelo (default 2×concurrency_get). Si el caller
+    deja de iterar (break / close()), se cancelan los fetches pendientes.
+    `stats` (opcional) acumula ids_listed / gets_issued / gets_wasted (pedidos
+    cuyo resultado nunca se entregó por el corte anticipado).
+    Con deadline de request (utils.deadline) vencido deja de pedir y termina con
+    lo ya entregado; los ids cortados quedan en el reporte del deadline.
+    Hedging (gmail.hedging): si el chunk de la cabeza lleva más que el p90 de su
+    operación (batch HTTP o get suelto), se pide el chunk completo de nuevo en el pool
+    de utils.hedging y gana la primera respuesta; el primario sigue en su worker.
+    """
+    if stats is None:
+        stats = {}
+    for k in ("ids_listed", "gets_issued", "gets_wasted"):
+        stats.setdefault(k, 0)
+
+    conc = _effective_concurrency(settings)
+    use_batch = _batch_supported(service, settings)
+    chunk_size = max(1, min(int(settings.get("batch_size", 50)), 100)) if use_batch else 1
+    max_inflight = max(1, int(window) if window else conc * 2)
+
+    pages: Optional[Iterator[List[str]]] = _iter_primary_id_pages(service, settings, base_query=base_query)
+    todo: deque = deque()      # chunks de ids aún sin pedir
+    inflight: deque = deque()  # (chunk, future) en orden de inbox
+
+    head_rest = 0              # ids de la cabeza ya bajados pero aún no entregados
+
+    ex = ThreadPoolExecutor(max_workers=conc, thread_name_prefix="gmail-get")
+    try:
+        while True:
+            if todo and deadline.expired():
+                # sin tiempo: lo que no partió no se pide (y no se listan más páginas)
+                deadline.record_cut("messages", sum(len(c) for c in todo))
+                todo.clear()
+                pages = None
+
+            while todo and len(inflight) < max_inflight:
+                chunk = todo.popleft()
+                op = HEDGE_OP_BATCH if use_batch and len(chunk) > 1 else CB_KEY_GET
+                inflight.append((chunk, submit_primary(op, ex, _fetch_chunk, service, chunk, settings, use_batch)))
+                stats["gets_issued"] += len(chunk)
+
+            # Entregamos la cabeza si ya está lista (o si no queda nada más que listar)
+            if inflight and (inflight[0][1].done() or pages is None):
+                head, fut = inflight[0]
+                op = HEDGE_OP_BATCH if use_batch and len(head) > 1 else CB_KEY_GET
+                try:
+                    found = hedged_result(
+                        op, fut,
+                        lambda: _fetch_chunk(service, head, settings, use_batch, duplicate=True),
+                        settings, units=len(head), timeout=deadline.remaining_s(),
+                    )
+                except FuturesTimeout:
+                    # deadline: cortamos con lo ya entregado; el finally cancela el resto
+                    deadline.record_cut("messages", sum(len(c) for c, _ in inflight) + sum(len(c) for c in todo))
+                    todo.clear()
+                    return
+                chunk, _ = inflight.popleft()
+                head_rest = len(chunk)
+                for mid in chunk:
+                    head_rest -= 1
+                    if found.get(mid):
+                        yield found[mid]
+                continue
+
+            if pages is not None:
+                page = next(pages, None)
+                if page is None:
+                    pages = None
+                else:
+                    stats["ids_listed"] += len(page)
+                    todo.extend(page[i:i + chunk_size] for i in range(0, len(page), chunk_size))
+                continue
+
+            if not inflight and not todo:
+                break
+    finally:
+        # Early stop: lo que no alcanzó a partir no se pide; lo que ya partió se pierde
+        stats["gets_wasted"] += head_rest
+        for chunk, fut in inflight:
+            if fut.cancel():
+                stats["gets_issued"] -= len(chunk)
+            else:
+                stats["gets_wasted"] += len(chunk)
+        ex.shutdown(wait=False, cancel_futures=True)
 
 def listar(max_results: Optional[int] = None, base_query: Optional[str] = None) -> List[Dict[str, Any]]:
     settings = config.get_gmail_settings()
     if max_results:
         settings["max_results"] = min(max_results, settings["max_results"])
     service = get_authenticated_service()
-    ids = _list_primary_message_ids(service, settings, base_query=base_query)
-    return _batch_get_metadata(service, ids, settings)
+    if base_query is None and mirror_enabled(settings, service):
+        return mirror_messages(service, settings, max_results=settings["max_results"])
+    return list(iter_message_metadata(service, settings, base_query=base_query))
 
 def _headers_dict(meta: Dict[str, Any]) -> Dict[str, str]:
     return {h["name"].lower(): h["value"] for h in meta.get("payload", {}).get("headers", [])}
@@ -207,9 +567,12 @@ def _to_contains_me(hdrs: Dict[str, str]) -> bool:
 def remitentes_hoy() -> List[str]:
     settings = config.get_gmail_settings()
     service = get_authenticated_service()
-    after = get_rfc3339_today()
-    ids = _list_primary_message_ids(service, settings, base_query=f"after:{after}")
-    metas = _batch_get_metadata(service, ids, settings)
+    if mirror_enabled(settings, service):
+        # El espejo ya tiene el inbox reciente; _is_today filtra abajo
+        metas = mirror_messages(service, settings)
+    else:
+        after = get_rfc3339_today()
+        metas = iter_message_metadata(service, settings, base_query=f"after:{after}")
     remitentes = set()
     for meta in metas:
         if meta.get("meta", {}).get("cc_only", False):
@@ -227,16 +590,68 @@ def remitentes_hoy() -> List[str]:
 def leer_ultimo() -> Dict[str, Any]:
     settings = config.get_gmail_settings()
     service = get_authenticated_service()
-    ids = _list_primary_message_ids(service, settings, base_query=None)
-    if not ids:
-        return {}
-    return _get_message_metadata(service, ids[0], settings)
+    if mirror_enabled(settings, service):
+        latest = mirror_messages(service, settings, max_results=1)
+        return latest[0] if latest else {}
+    # Sólo necesitamos el primero válido: de a un fetch y cortamos apenas aparece
+    stream = iter_message_metadata(service, settings, base_query=None, window=1)
+    try:
+        return next(stream, {})
+    finally:
+        stream.close()
+
+PRIMARY_LABEL = "CATEGORY_PERSONAL"
+
+def _unread_from_label_counter(service, settings: Dict[str, Any]) -> int:
+    """messagesUnread del label Primary (1 llamada, sin tope). Incluye no leídos archivados."""
+    def _call():
+        with lease_service(service) as svc:
+            return (
+                svc.users()
+                .labels()
+                .get(userId="me", id=PRIMARY_LABEL, fields="messagesUnread")
+                .execute()
+                or {}
+            )
+
+    resp, _ = gmail_retry_wrapper(_call, settings, units=QUOTA_UNITS["labels.get"])
+    return int(resp.get("messagesUnread", 0) or 0)
+
+def _unread_from_list_estimate(service, settings: Dict[str, Any]) -> int:
+    """resultSizeEstimate de la intersección INBOX ∩ UNREAD ∩ Primary (1 llamada)."""
+    def _call():
+        with lease_service(service) as svc:
+            return (
+                svc.users()
+                .messages()
+                .list(
+                    userId="me",
+                    labelIds=["INBOX", "UNREAD", PRIMARY_LABEL],
+                    maxResults=1,
+                    includeSpamTrash=False,
+                    fields="resultSizeEstimate",
+                )
+                .execute()
+                or {}
+            )
+
+    resp, _ = gmail_retry_wrapper(_call, settings, units=QUOTA_UNITS["messages.list"])
+    return int(resp.get("resultSizeEstimate", 0) or 0)
 
-def contar_no_leidos() -> int:
+def contar_no_leidos(accurate: bool = False) -> int:
+    """
+    No leídos de Primary. Por defecto 1 sola llamada (gmail.unread_count_mode):
+    contador del label o estimación del list. `accurate=True` (o modo "scan")
+    recorre los mensajes uno a uno: exacto, pero N+1 llamadas y tope max_results.
+    """
     settings = config.get_gmail_settings()
     service = get_authenticated_service()
-    ids = _list_primary_message_ids(service, settings, base_query="is:unread")
-    metas = _batch_get_metadata(service, ids, settings)
+    mode = "scan" if accurate else settings.get("unread_count_mode", "labels")
+    if mode == "labels":
+        return _unread_from_label_counter(service, settings)
+    if mode == "estimate":
+        return _unread_from_list_estimate(service, settings)
+    metas = iter_message_metadata(service, settings, base_query="is:unread")
     count = 0
     excluded = set(settings.get("excluded_labels", []))
     for meta in metas:
@@ -246,3 +661,38 @@ def contar_no_leidos() -> int:
         if "UNREAD" in labels:
             count += 1
     return count
+
+# Última versión vista: respaldo mientras Gmail no responde (compartida vía utils.cache)
+_VERSION_LAST_TTL_S = 3600
+
+
+def mailbox_version(max_age_s: int = 5) -> Optional[str]:
+    """
+    historyId actual del buzón (users.getProfile): cambia con cualquier alta, baja o
+    cambio de labels. Se memoiza `max_age_s` segundos para no pagar una llamada por
+    request. Va detrás del breaker de messages.list: con Gmail caído falla rápido y
+    devuelve la última versión conocida, así la cache de respuestas sigue sirviendo lo
+    que ya tiene. None sólo si nunca se obtuvo una (el caller no debe cachear nada).
+    """
+    settings = config.get_gmail_settings()
+    last_key = make_cache_key("mailbox_version_last", user="me")
+
+    def _load() -> Optional[str]:
+        service = get_authenticated_service()
+
+        def _call():
+            with lease_service(service) as svc:
+                return svc.users().getProfile(userId="me", fields="historyId").execute() or {}
+
+        try:
+            profile, _ = gmail_guarded_call(CB_KEY_LIST, _call, settings, units=QUOTA_UNITS["getProfile"])
+        except RetryError:
+            last = cache_get(last_key)
+            return str(last) if last else None
+        hid = profile.get("historyId")
+        if not hid:
+            return None
+        cache_set(last_key, str(hid), _VERSION_LAST_TTL_S)
+        return str(hid)
+
+    return cache_get_or_load(make_cache_key("mailbox_version", user="me"), _load, max(0, int(max_age_s)))
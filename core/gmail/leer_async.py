@@ -0,0 +1,290 @@
+# core/gmail/leer_async.py
+"""
+Engine asyncio para Gmail (gmail.engine = "async").
+
+En vez de un thread por messages.get en vuelo, todas las llamadas REST corren sobre
+un único event loop (thread de fondo) con un httpx.AsyncClient compartido:
+keep-alive, límite de conexiones y un semáforo de concurrency_async.
+
+Mismo contrato que el engine de threads (core/gmail/leer.py): mismos campos,
+cache in-process, message store, breaker, retries y métricas de retry. Las
+funciones públicas son síncronas (la app es Flask/sync) y puentean al loop.
+
+Requiere `httpx` (requirements-async.txt). Si falta, core.gmail vuelve a threads.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from .auth import get_credentials, get_access_token
+from .leer import CB_KEY_GET, CB_KEY_LIST, _negative_hit, _negative_put, _postprocess_metadata, _primary_query
+from . import leer as _leer
+from utils import config
+from utils.retry import gmail_retry_wrapper_async, DeadlineExceeded, RetryError
+from utils import deadline
+from utils.cache import cache_get, make_cache_key
+from utils.circuit_breaker import before_call as cb_before, after_success as cb_ok, after_failure as cb_fail, configure_from_settings as cb_conf
+from utils.message_store import store_peek, store_put
+from utils.degradation import record_skipped
+from utils.hedging import hedged_call_async
+from utils.rate_governor import QUOTA_UNITS
+
+GMAIL_API_BASE = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+T = TypeVar("T")
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+class GmailHttpError(Exception):
+    """Error HTTP de la API REST (expone .status/.reason/.retry_after para utils.retry)."""
+
+    def __init__(self, status: int, reason: str = "", retry_after: Optional[str] = None):
+        super().__init__(f"HTTP {status}: {reason}")
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ---------------- event loop / cliente ----------------
+
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    """Event loop dedicado en un thread daemon (se crea una sola vez)."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            t = threading.Thread(target=loop.run_forever, name="gmail-async-loop", daemon=True)
+            t.start()
+            _LOOP = loop
+        return _LOOP
+
+
+def _run(coro: Awaitable[T]) -> T:
+    """Ejecuta `coro` en el loop de fondo y espera el resultado.
+
+    La tarea corre con una copia del contexto del caller, así las métricas de
+    retry (contextvars) quedan en el request que la originó.
+    """
+    loop = _ensure_loop()
+    ctx = contextvars.copy_context()
+
+    async def _in_ctx() -> T:
+        return await asyncio.get_running_loop().create_task(coro, context=ctx)
+
+    return asyncio.run_coroutine_threadsafe(_in_ctx(), loop).result()
+
+
+def _client(settings: Dict[str, Any]) -> httpx.AsyncClient:
+    # Sólo se usa desde el loop de fondo: no necesita lock
+    global _CLIENT
+    if _CLIENT is None:
+        conc = int(settings.get("concurrency_async", 64))
+        _CLIENT = httpx.AsyncClient(
+            base_url=GMAIL_API_BASE,
+            limits=httpx.Limits(max_connections=conc, max_keepalive_connections=conc, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(20.0, connect=5.0),
+        )
+    return _CLIENT
+
+
+async def _token() -> str:
+    creds = await asyncio.to_thread(get_credentials)
+    if creds.valid and creds.token:
+        return str(creds.token)
+    # refresh bloqueante (red) → fuera del loop
+    return await asyncio.to_thread(get_access_token)
+
+
+def _error_reason(resp: httpx.Response) -> str:
+    try:
+        err = (resp.json() or {}).get("error", {})
+        errors = err.get("errors") or []
+        if errors and errors[0].get("reason"):
+            return f"{errors[0]['reason']} {err.get('message', '')}".strip()
+        return str(err.get("message") or resp.reason_phrase)
+    except Exception:
+        return resp.reason_phrase or ""
+
+
+async def _get_json(path: str, params: List[Tuple[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    token = await _token()
+    resp = await _client(settings).get(path, params=params, headers={"Authorization": f"Bearer {token}"})
+    if resp.status_code >= 400:
+        raise GmailHttpError(resp.status_code, _error_reason(resp), resp.headers.get("Retry-After"))
+    return resp.json() or {}
+
+
+# ---------------- list / get ----------------
+
+async def _guarded_list(params: List[Tuple[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """messages.list con retry detrás del breaker gmail:messages.list."""
+    cb_enabled = settings.get("cb_enabled", True)
+    if cb_enabled:
+        cb_conf(CB_KEY_LIST, settings)
+        allow, retry_after = cb_before(CB_KEY_LIST)
+        if not allow:
+            raise RetryError(f"Circuit breaker abierto para {CB_KEY_LIST} (retry_after={retry_after:.0f}s).",
+                             last_error_code=503, retries_by_code={}, attempts=0)
+    try:
+        resp, _ = await gmail_retry_wrapper_async(lambda: _get_json("/messages", params, settings), settings,
+                                                  units=QUOTA_UNITS["messages.list"])
+    except RetryError as e:
+        if cb_enabled:
+            cb_fail(CB_KEY_LIST, int(e.last_error_code or 429))
+        raise
+    if cb_enabled:
+        cb_ok(CB_KEY_LIST)
+    return resp
+
+
+async def _list_primary_message_ids(settings: Dict[str, Any], base_query: Optional[str] = None) -> List[str]:
+    max_results = settings["max_results"]
+    ids: List[str] = []
+    page_token: Optional[str] = None
+
+    while len(ids) < max_results:
+        params: List[Tuple[str, Any]] = [
+            ("q", _primary_query(base_query)),
+            ("labelIds", "INBOX"),
+            ("maxResults", max_results - len(ids)),
+            ("includeSpamTrash", "false"),
+            ("fields", settings["fields_list"]),
+        ]
+        if page_token:
+            params.append(("pageToken", page_token))
+
+        try:
+            resp = await _guarded_list(params, settings)
+        except DeadlineExceeded:
+            # sin tiempo para otra página: se entrega lo ya listado (sin nada, es un error)
+            if not ids:
+                raise
+            break
+        ids.extend([m["id"] for m in resp.get("messages", []) or []])
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+
+    return ids[:max_results]
+
+
+async def _get_message_metadata(msg_id: str, settings: Dict[str, Any], sem: asyncio.Semaphore) -> Dict[str, Any]:
+    fields_get = settings["fields_get"]
+    cb_enabled = settings.get("cb_enabled", True)
+
+    if _negative_hit(msg_id):
+        return {}
+
+    cache_key = make_cache_key("msg_get", id=msg_id, fields=fields_get)
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    stored = store_peek(msg_id, fields_get)
+    if stored is not None:
+        return _postprocess_metadata(stored, settings, cache_key)
+
+    if cb_enabled:
+        allow, retry_after = cb_before(CB_KEY_GET)
+        if not allow:
+            record_skipped(msg_id, "breaker_open", retry_after)
+            return {}
+
+    params: List[Tuple[str, Any]] = [("format", "metadata"), ("fields", fields_get)]
+    params.extend(("metadataHeaders", h) for h in settings["headers_get"])
+
+    async with sem:
+        try:
+            msg, _ = await gmail_retry_wrapper_async(
+                lambda: hedged_call_async(CB_KEY_GET, lambda: _get_json(f"/messages/{msg_id}", params, settings), settings),
+                settings,
+            )
+        except RetryError as e:
+            code = int(e.last_error_code or 429)
+            if cb_enabled:
+                cb_fail(CB_KEY_GET, code)
+            if isinstance(e, DeadlineExceeded):
+                record_skipped(msg_id, "deadline")
+                return {}
+            _negative_put(msg_id, f"retry_exhausted:{code}", settings)
+            return {}
+
+    if cb_enabled:
+        cb_ok(CB_KEY_GET)
+    if not msg:
+        return {}
+    store_put(msg_id, fields_get, msg)
+    return _postprocess_metadata(msg, settings, cache_key)
+
+
+async def _get_many(ids: List[str], settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if not ids:
+        return []
+    cb_conf(CB_KEY_GET, settings)
+    sem = asyncio.Semaphore(int(settings.get("concurrency_async", 64)))
+    tasks = [asyncio.ensure_future(_get_message_metadata(mid, settings, sem)) for mid in ids]
+    _, pending = await asyncio.wait(tasks, timeout=deadline.remaining_s())
+    if pending:
+        # deadline: se entrega lo que ya llegó, el resto se cancela
+        deadline.record_cut("messages", len(pending))
+        for task in pending:
+            task.cancel()
+    # orden de inbox; fuera los vacíos (excluidos/degradados/cortados)
+    return [m for m in (t.result() for t in tasks if t not in pending) if m]
+
+
+async def _list_and_get(settings: Dict[str, Any], base_query: Optional[str]) -> List[Dict[str, Any]]:
+    ids = await _list_primary_message_ids(settings, base_query=base_query)
+    return await _get_many(ids, settings)
+
+
+# ---------------- API pública (mismo contrato que leer.py) ----------------
+
+def listar(max_results: Optional[int] = None, base_query: Optional[str] = None) -> List[Dict[str, Any]]:
+    settings = config.get_gmail_settings()
+    if max_results:
+        settings["max_results"] = min(max_results, settings["max_results"])
+    if base_query is None and settings.get("mirror_enabled", False):
+        # El espejo (History API) ya evita los gets; lo sirve el engine de threads
+        return _leer.listar(max_results=max_results)
+    return _run(_list_and_get(settings, base_query))
+
+
+def leer_ultimo() -> Dict[str, Any]:
+    latest = listar(max_results=1)
+    return latest[0] if latest else {}
+
+
+def buscar(query: str, max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+    q = (query or "").strip()
+    if not q:
+        return []
+    settings = config.get_gmail_settings()
+    if max_results is not None:
+        settings["max_results"] = max(1, min(int(max_results), settings["max_results"]))
+    return _run(_list_and_get(settings, q))[: settings["max_results"]]
+
+
+def contar_no_leidos(accurate: bool = False) -> int:
+    settings = config.get_gmail_settings()
+    if not accurate and settings.get("unread_count_mode", "labels") != "scan":
+        # Una sola llamada: no gana nada con el loop async
+        return _leer.contar_no_leidos()
+    metas = _run(_list_and_get(settings, "is:unread"))
+    excluded = set(settings.get("excluded_labels", []))
+    count = 0
+    for meta in metas:
+        labels = set(meta.get("labelIds", []) or [])
+        if labels & excluded:
+            continue
+        if "UNREAD" in labels:
+            count += 1
+    return count
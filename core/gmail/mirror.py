@@ -0,0 +1,267 @@
+# core/gmail/mirror.py
+"""
+Espejo local incremental del inbox Primary usando la History API de Gmail.
+
+- Primer uso (o historyId expirado): full resync → getProfile(historyId) + list + get metadata.
+- Siguientes requests: una llamada a users.history.list desde el último historyId,
+  aplicando sólo altas, bajas y cambios de labels.
+- Cada mensaje se guarda una vez (metadata con fields_get); los cambios de labels se
+  aplican localmente sin volver a pedir el mensaje.
+- Un alta cuyo get falla (5xx, breaker, cache negativa, corte por deadline) queda en
+  `pending_ids` y se reintenta en cada sync: el historyId avanza igual, así que si no
+  se anotara no volvería a aparecer. Un full resync incompleto no fija historyId (el
+  próximo sync vuelve a listar todo).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.retry import gmail_guarded_call, gmail_retry_wrapper, RetryError
+from utils.rate_governor import QUOTA_UNITS
+from .auth import lease_service
+
+CB_KEY_HISTORY = "gmail:history.list"
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+HISTORY_FIELDS = (
+    "history(messagesAdded/message/id,messagesDeleted/message/id,"
+    "labelsAdded(message/id,labelIds),labelsRemoved(message/id,labelIds)),"
+    "historyId,nextPageToken"
+)
+
+# Estado por usuario: key -> {history_id, messages{id: meta}, pending_ids, synced_at,
+#                            full_syncs, incremental_syncs}
+_STATE: Dict[str, Dict[str, Any]] = {}
+_LOCK = threading.RLock()
+_USER_LOCKS: Dict[str, threading.Lock] = {}
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _user_lock(user_key: str) -> threading.Lock:
+    with _LOCK:
+        lk = _USER_LOCKS.get(user_key)
+        if lk is None:
+            lk = threading.Lock()
+            _USER_LOCKS[user_key] = lk
+        return lk
+
+
+def _get_state(user_key: str) -> Dict[str, Any]:
+    with _LOCK:
+        st = _STATE.get(user_key)
+        if st is None:
+            st = {"history_id": None, "messages": {}, "pending_ids": [], "synced_at": 0.0,
+                  "full_syncs": 0, "incremental_syncs": 0}
+            _STATE[user_key] = st
+        return st
+
+
+def _internal_ms(meta: Dict[str, Any]) -> int:
+    try:
+        return int(meta.get("internalDate", 0))
+    except Exception:
+        return 0
+
+
+def _belongs_to_primary(labels: Set[str], settings: Dict[str, Any]) -> bool:
+    if "INBOX" not in labels:
+        return False
+    return not (labels & set(settings.get("excluded_labels", [])))
+
+
+def _trim(st: Dict[str, Any], max_messages: int) -> None:
+    with _LOCK:
+        messages = st["messages"]
+        if len(messages) <= max_messages:
+            return
+        ordered = sorted(messages.values(), key=_internal_ms, reverse=True)
+        st["messages"] = {m["id"]: m for m in ordered[:max_messages]}
+
+
+def _fetch(service, ids: List[str], settings: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """(metas, ids fallidos): los que no volvieron y no fueron filtrados por label."""
+    from .leer import _batch_get_metadata
+
+    excluded: Set[str] = set()
+    metas = _batch_get_metadata(service, ids, settings, excluded)
+    got = {m.get("id") for m in metas}
+    return metas, [mid for mid in ids if mid not in got and mid not in excluded]
+
+
+def _full_resync(service, settings: Dict[str, Any], st: Dict[str, Any]) -> None:
+    # Import diferido: leer.py usa el espejo y el espejo reutiliza list/get de leer.py
+    from .leer import _list_primary_message_ids
+
+    # historyId ANTES de listar: cambios durante el listado se reaplican en el próximo sync
+    def _profile():
+        with lease_service(service) as svc:
+            return svc.users().getProfile(userId="me", fields="historyId").execute() or {}
+
+    profile, _ = gmail_retry_wrapper(_profile, settings, units=QUOTA_UNITS["getProfile"])
+
+    s = dict(settings)
+    s["max_results"] = int(settings.get("mirror_max_messages", 200))
+    ids = _list_primary_message_ids(service, s, base_query=None)
+    metas, failed = _fetch(service, ids, s)
+
+    with _LOCK:
+        st["messages"] = {m["id"]: m for m in metas if m.get("id")}
+        st["pending_ids"] = []
+        # incompleto: sin historyId, el próximo sync repite el full resync
+        st["history_id"] = None if failed else (str(profile.get("historyId") or "") or None)
+    st["full_syncs"] = int(st.get("full_syncs", 0)) + 1
+
+
+def _incremental_sync(service, settings: Dict[str, Any], st: Dict[str, Any]) -> None:
+    """Aplica history.list desde st['history_id']. Lanza RetryError(404) si expiró."""
+    # Trabajamos sobre una copia: los lectores concurrentes ven el estado previo completo
+    messages: Dict[str, Dict[str, Any]] = dict(st["messages"])
+    # altas de syncs anteriores cuyo get falló: se piden de nuevo junto a las nuevas
+    added: List[str] = [mid for mid in st.get("pending_ids", []) if mid not in messages]
+    page_token: Optional[str] = None
+    last_history_id = st["history_id"]
+
+    while True:
+        def _call():
+            with lease_service(service) as svc:
+                return (
+                    svc.users()
+                    .history()
+                    .list(
+                        userId="me",
+                        startHistoryId=st["history_id"],
+                        historyTypes=HISTORY_TYPES,
+                        fields=HISTORY_FIELDS,
+                        pageToken=page_token,
+                    )
+                    .execute()
+                    or {}
+                )
+
+        resp, _ = gmail_guarded_call(CB_KEY_HISTORY, _call, settings, units=QUOTA_UNITS["history.list"])
+
+        for h in resp.get("history", []) or []:
+            for it in h.get("messagesAdded", []) or []:
+                mid = (it.get("message") or {}).get("id")
+                if mid and mid not in messages and mid not in added:
+                    added.append(mid)
+            for it in h.get("messagesDeleted", []) or []:
+                mid = (it.get("message") or {}).get("id")
+                if mid:
+                    messages.pop(mid, None)
+                    if mid in added:
+                        added.remove(mid)
+            for it in h.get("labelsAdded", []) or []:
+                mid = (it.get("message") or {}).get("id")
+                new_labels = set(it.get("labelIds", []) or [])
+                if not mid:
+                    continue
+                meta = messages.get(mid)
+                if meta is None:
+                    # p.ej. un correo des-archivado: vuelve al INBOX
+                    if "INBOX" in new_labels and mid not in added:
+                        added.append(mid)
+                    continue
+                labels = set(meta.get("labelIds", []) or []) | new_labels
+                messages[mid] = dict(meta, labelIds=sorted(labels))
+                if not _belongs_to_primary(labels, settings):
+                    messages.pop(mid, None)
+            for it in h.get("labelsRemoved", []) or []:
+                mid = (it.get("message") or {}).get("id")
+                meta = messages.get(mid) if mid else None
+                if meta is None:
+                    continue
+                labels = set(meta.get("labelIds", []) or []) - set(it.get("labelIds", []) or [])
+                messages[mid] = dict(meta, labelIds=sorted(labels))
+                if not _belongs_to_primary(labels, settings):
+                    messages.pop(mid, None)
+
+        last_history_id = resp.get("historyId") or last_history_id
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+
+    failed: List[str] = []
+    if added:
+        metas, failed = _fetch(service, added, settings)
+        for meta in metas:
+            labels = set(meta.get("labelIds", []) or [])
+            if meta.get("id") and _belongs_to_primary(labels, settings):
+                messages[meta["id"]] = meta
+
+    with _LOCK:
+        st["messages"] = messages
+        st["pending_ids"] = failed
+        st["history_id"] = str(last_history_id) if last_history_id else st["history_id"]
+    st["incremental_syncs"] = int(st.get("incremental_syncs", 0)) + 1
+
+
+def sync(service, settings: Dict[str, Any], user_key: str = "me") -> Dict[str, Any]:
+    """
+    Sincroniza el espejo del usuario. Respeta gmail.mirror.sync_interval_seconds para
+    no llamar history.list en ráfagas. Cae a full resync si el historyId expiró (404).
+    """
+    st = _get_state(user_key)
+    with _user_lock(user_key):
+        interval = float(settings.get("mirror_sync_interval_s", 5))
+        if st["history_id"] and (_now() - st["synced_at"]) < interval:
+            return st
+
+        if not st["history_id"]:
+            _full_resync(service, settings, st)
+        else:
+            try:
+                _incremental_sync(service, settings, st)
+            except RetryError as e:
+                if e.last_error_code != 404:
+                    raise
+                # historyId fuera de retención → resync completo
+                _full_resync(service, settings, st)
+
+        _trim(st, int(settings.get("mirror_max_messages", 200)))
+        st["synced_at"] = _now()
+        return st
+
+
+def mirror_messages(service, settings: Dict[str, Any], max_results: Optional[int] = None,
+                    user_key: str = "me") -> List[Dict[str, Any]]:
+    """Mensajes del espejo, más recientes primero (orden inbox)."""
+    st = sync(service, settings, user_key)
+    with _LOCK:
+        ordered = sorted(st["messages"].values(), key=_internal_ms, reverse=True)
+    if max_results is not None:
+        ordered = ordered[:max(0, int(max_results))]
+    return ordered
+
+
+def mirror_status(user_key: str = "me") -> Dict[str, Any]:
+    with _LOCK:
+        st = _STATE.get(user_key)
+        if not st:
+            return {"history_id": None, "messages": 0, "pending": 0, "synced_at": 0.0,
+                    "full_syncs": 0, "incremental_syncs": 0}
+        return {
+            "history_id": st["history_id"],
+            "messages": len(st["messages"]),
+            "pending": len(st.get("pending_ids", [])),
+            "synced_at": st["synced_at"],
+            "full_syncs": st["full_syncs"],
+            "incremental_syncs": st["incremental_syncs"],
+        }
+
+
+def invalidate(user_key: Optional[str] = None) -> None:
+    """Olvida el espejo (fuerza full resync en el próximo uso)."""
+    with _LOCK:
+        if user_key is None:
+            _STATE.clear()
+        else:
+            _STATE.pop(user_key, None)
+
+
+def mirror_enabled(settings: Dict[str, Any], service) -> bool:
+    return bool(settings.get("mirror_enabled", False)) and service is not None
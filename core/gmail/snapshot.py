@@ -0,0 +1,260 @@
+# core/gmail/snapshot.py
+"""
+Snapshot del buzón reciente, compartido por todos los consumidores de un comando.
+
+utils.summarizer, utils.importance, core.alerts y core.gmail.remitentes trabajan
+sobre la misma ventana (Primary, últimos 2 días). En vez de que cada uno liste y
+baje sus mensajes, piden `get_snapshot()`:
+
+  - se lista + baja metadata una sola vez (o se toma del espejo History API)
+  - dentro de un request (consume_snapshot_stats() al inicio) todos reciben el mismo
+    snapshot; fuera de él se reutiliza por `snapshot.ttl_seconds` vía utils.cache,
+    mientras no cambie la versión del buzón (sin versión no se reutiliza)
+  - cada mensaje sabe qué campos tiene (`level`: metadata | full); quien necesita
+    cuerpos pide `with_bodies(ids)` / `full(id)` y sólo se bajan los que faltan
+    (format=full a través del message store + cache "msg_full")
+  - `records()` / `with_bodies()` entregan NormalizedMessage (utils.message_record)
+    armados una sola vez por snapshot
+
+Los dicts de Gmail (`messages()`, `full()`, `record.raw`) son compartidos: los
+consumidores no deben mutarlos.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils import config, deadline
+from utils.cache import cache_delete, cache_get_or_load, make_cache_key
+from utils.degradation import degradation_pending, record_skipped
+from utils.message_record import NormalizedMessage
+from utils.retry import RetryError, gmail_retry_wrapper
+
+# Ventana común: "hoy"/"ayer" en cualquier zona horaria + importantes de las últimas 36 h
+SNAPSHOT_QUERY = "newer_than:2d"
+FULL_FIELDS = (
+    "id,internalDate,labelIds,snippet,"
+    "payload(mimeType,body/data,parts,headers(name,value))"
+)
+LEVEL_METADATA = "metadata"
+LEVEL_FULL = "full"
+
+_snapshot_ctx: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("_snapshot_ctx", default=None)
+_LOCK = threading.Lock()
+
+
+class MailboxSnapshot:
+    """Ventana reciente del inbox: metadata de todos los ids + cuerpos bajo demanda."""
+
+    def __init__(self, service, settings: Dict[str, Any], data: Dict[str, Any]):
+        self.service = service
+        self.settings = settings
+        self.ids: List[str] = list(data.get("ids") or [])
+        self.source: str = str(data.get("source") or "list")
+        self.loaded_at: float = float(data.get("at") or time.time())
+        self._metas: Dict[str, Dict[str, Any]] = dict(data.get("metas") or {})
+        self._full: Dict[str, Dict[str, Any]] = {}
+        self._records: Optional[List[NormalizedMessage]] = None
+        self._full_records: Dict[str, NormalizedMessage] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"full_fetched": 0, "full_reused": 0, "consumers": 0}
+
+    # ---- metadata ----
+    def messages(self) -> List[Dict[str, Any]]:
+        """Metadata en orden de inbox (excluidos/degradados ya filtrados)."""
+        with self._lock:
+            self.stats["consumers"] += 1
+        return [self._metas[mid] for mid in self.ids if mid in self._metas]
+
+    def records(self) -> List[NormalizedMessage]:
+        """Igual que messages(), ya normalizados (se arman una vez por snapshot)."""
+        with self._lock:
+            self.stats["consumers"] += 1
+            if self._records is None:
+                self._records = [NormalizedMessage(self._metas[mid]) for mid in self.ids if mid in self._metas]
+            return self._records
+
+    def level(self, msg_id: str) -> Optional[str]:
+        """Campos cargados para `msg_id`: "full", "metadata" o None (fuera del snapshot)."""
+        if msg_id in self._full:
+            return LEVEL_FULL
+        return LEVEL_METADATA if msg_id in self._metas else None
+
+    def fields_loaded(self, msg_id: str) -> Optional[str]:
+        lvl = self.level(msg_id)
+        if lvl == LEVEL_FULL:
+            return FULL_FIELDS
+        return self.settings.get("fields_get") if lvl else None
+
+    # ---- cuerpos (upgrade a format=full sólo de lo que falta) ----
+    def full(self, msg_id: str) -> Dict[str, Any]:
+        with self._lock:
+            got = self._full.get(msg_id)
+            if got is not None:
+                self.stats["full_reused"] += 1
+                return got
+        msg = _get_message_full(self.service, msg_id, self.settings)
+        if msg:
+            with self._lock:
+                self._full[msg_id] = msg
+                self.stats["full_fetched"] += 1
+        return msg
+
+    def with_bodies(self, ids: Iterable[str]) -> List[NormalizedMessage]:
+        """format=full de `ids` normalizado (en paralelo, respeta el deadline); orden de entrada, sin fallidos."""
+        ids = list(ids)
+        missing = [mid for mid in ids if mid not in self._full]
+        if len(missing) > 1:
+            from .leer import _effective_concurrency, _submit_in_ctx
+            conc = _effective_concurrency(self.settings)
+            ex = ThreadPoolExecutor(max_workers=conc, thread_name_prefix="gmail-full")
+            futures = [_submit_in_ctx(ex, self._safe_full, mid) for mid in missing]
+            done = 0
+            try:
+                for fut in as_completed(futures, timeout=deadline.remaining_s()):
+                    fut.result()
+                    done += 1
+            except FuturesTimeout:
+                deadline.record_cut("messages", len(missing) - done)
+            finally:
+                ex.shutdown(wait=False, cancel_futures=True)
+        else:
+            for mid in missing:
+                self._safe_full(mid)
+        out: List[NormalizedMessage] = []
+        with self._lock:
+            for mid in ids:
+                if not self._full.get(mid):
+                    continue
+                rec = self._full_records.get(mid)
+                if rec is None:
+                    rec = self._full_records[mid] = NormalizedMessage(self._full[mid])
+                out.append(rec)
+        return out
+
+    def _safe_full(self, msg_id: str) -> None:
+        if deadline.expired():
+            deadline.record_cut("messages")
+            return
+        try:
+            self.full(msg_id)
+        except Exception:
+            record_skipped(msg_id, "error")
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"source": self.source, "messages": len(self._metas),
+                    "age_s": round(max(0.0, time.time() - self.loaded_at), 3), **self.stats}
+
+
+def _get_message_full(service, msg_id: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """format=full vía message store (contenido inmutable) + cache single-flight "msg_full"."""
+    from .auth import lease_service
+    from .leer import _fetch_label_ids
+    from utils.message_store import read_through
+
+    def _call() -> Dict[str, Any]:
+        with lease_service(service) as svc:
+            return (
+                svc.users()
+                .messages()
+                .get(userId="me", id=msg_id, format="full", fields=FULL_FIELDS)
+                .execute()
+                or {}
+            )
+
+    def _read() -> Dict[str, Any]:
+        def _load() -> Dict[str, Any]:
+            try:
+                msg, _ = gmail_retry_wrapper(_call, settings)
+            except RetryError as e:
+                record_skipped(msg_id, "deadline" if e.last_error_code == 408 else f"retry_exhausted:{e.last_error_code}")
+                return {}
+            return msg
+        return read_through(msg_id, FULL_FIELDS, _load,
+                            labels_loader=lambda: _fetch_label_ids(service, msg_id, settings))
+
+    key = make_cache_key("msg_full", id=msg_id, fields=FULL_FIELDS)
+    return cache_get_or_load(key, _read,
+                             int(settings.get("cache_ttl_seconds", 60)),
+                             int(settings.get("cache_stale_s", 0)))
+
+
+def _load_window(service, settings: Dict[str, Any], max_messages: int) -> Dict[str, Any]:
+    from .leer import _batch_get_metadata, _list_primary_message_ids
+    from .mirror import mirror_enabled, mirror_messages
+
+    s = dict(settings)
+    s["max_results"] = max_messages
+    if mirror_enabled(s, service):
+        metas = mirror_messages(service, s, max_results=max_messages)
+        source = "mirror"
+    else:
+        ids = _list_primary_message_ids(service, s, base_query=SNAPSHOT_QUERY)
+        metas = _batch_get_metadata(service, ids, s)
+        source = "list"
+    metas = [m for m in metas if m.get("id")]
+    return {"ids": [m["id"] for m in metas], "metas": {m["id"]: m for m in metas},
+            "source": source, "at": time.time()}
+
+
+def get_snapshot() -> MailboxSnapshot:
+    """Snapshot del request actual (se crea en la primera llamada; luego se reutiliza)."""
+    holder = _snapshot_ctx.get()
+    if holder is not None:
+        with _LOCK:
+            snap = holder.get("snap")
+        if snap is not None:
+            return snap
+
+    from .auth import get_authenticated_service
+    settings = config.get_gmail_settings()
+    snap_settings = config.get_snapshot_settings()
+    service = get_authenticated_service()
+    max_messages = int(snap_settings["max_messages"])
+    ttl = int(snap_settings["ttl_seconds"])
+
+    def _load() -> Dict[str, Any]:
+        return _load_window(service, settings, max_messages)
+
+    # Reutilizar entre requests sólo con la misma versión del buzón (historyId, el mismo
+    # valor memoizado que usa la cache de respuestas): un correo nuevo cambia la versión,
+    # la respuesta cacheada no sirve y el recálculo tampoco puede tomar una ventana vieja.
+    version = None
+    if ttl > 0:
+        from .leer import mailbox_version
+        version = mailbox_version(int(config.get_response_cache_settings()["version_ttl_seconds"]))
+    if ttl > 0 and version is not None:
+        key = make_cache_key("mailbox_snapshot", user=settings.get("primary_email") or "me",
+                             q=SNAPSHOT_QUERY, n=max_messages, version=version)
+        data = cache_get_or_load(key, _load, ttl)
+        if degradation_pending() or deadline.deadline_cut_pending():
+            # ventana incompleta: sirve a este request, pero no a los siguientes
+            cache_delete(key)
+    else:
+        data = _load()
+
+    snap = MailboxSnapshot(service, settings, data)
+    if holder is not None:
+        with _LOCK:
+            # dos consumidores en paralelo: gana el primero y ambos comparten ése
+            if holder.get("snap") is None:
+                holder["snap"] = snap
+            snap = holder["snap"]
+    return snap
+
+
+def consume_snapshot_stats() -> Optional[Dict[str, Any]]:
+    """
+    Resumen del snapshot del request ({source, messages, age_s, full_fetched,
+    full_reused, consumers}) o None si no se usó; abre un scope nuevo (llamar al
+    inicio y al final del request, como consume_gmail_retry_stats).
+    """
+    holder = _snapshot_ctx.get()
+    snap = holder.get("snap") if holder else None
+    _snapshot_ctx.set({"snap": None})
+    return snap.summary() if snap is not None else None
@@ -17,6 +17,8 @@ _RX_INT = {
     "resumen": re.compile(r"\b(resum[ée]me?|resumen|resume)\b", re.IGNORECASE),
     "quien_escribio": re.compile(r"qu[ií]en\s+me\s+escrib(?:i[oó]|ieron)", re.IGNORECASE),
     "contar_no_leidos": re.compile(r"(sin\s+leer|no\s+le[ií]dos)", re.IGNORECASE),
+    # "cuántos no leídos exactamente": conteo mensaje a mensaje en vez del contador
+    "exacto": re.compile(r"\bexact(?:[oa]s?|amente)\b", re.IGNORECASE),
     "leer_ultimo": re.compile(r"(leer|lee).*(\b[uú]ltim[oa]\b|m[aá]s\s+reciente)", re.IGNORECASE),
 
     # importancia / listar / buscar
@@ -87,6 +89,8 @@ def detectar_intencion(comando: str) -> Dict[str, Any]:
 
     # 3) No leídos
     if _has("contar_no_leidos", low):
+        if _has("exacto", low):
+            filtros["exacto"] = True
         return {"accion": "contar_no_leidos", "filtros": filtros}
 
     # 4) Leer último
@@ -2,10 +2,11 @@
 # Cliente LLM local (Qwen2.5-3B-Instruct GGUF vía llama-cpp)
 # Resumen en UNA oración y clasificación simple de intención
 
-from typing import Optional, Any, TYPE_CHECKING
+from typing import List, Optional, Any, Tuple, TYPE_CHECKING
 import os
 import os.path as osp
 import re
+import threading
 
 if TYPE_CHECKING:
     from llama_cpp import Llama as LlamaType  # type: ignore
@@ -17,6 +18,9 @@ try:
 except Exception:
     Llama = None  # type: ignore
 
+from utils.circuit_breaker import before_call as cb_before, after_success as cb_ok, after_failure as cb_fail, configure as cb_conf
+from utils import deadline
+
 # --- Config ---
 MODEL_PATH = os.getenv(
     "LLM_LOCAL_MODEL_PATH",
@@ -33,26 +37,131 @@ SUMMARY_MAX_CHARS   = int(os.getenv("SUMMARY_MAX_CHARS", "350"))    # cambiado d
 
 _STOP = ["</s>", "Usuario:", "Asistente:", "\n\n"]
 
+# Versión del prompt de parafrasear_una_oracion: forma parte de la key de
+# utils.summary_store. Subirla al cambiar el prompt o su post-proceso.
+PROMPT_VERSION = "resumen-v1"
+
+# Breaker propio del LLM: si el modelo falla seguido, caemos directo al fallback
+# extractivo en vez de pagar cada intento. Pocas llamadas y en serie → modo consecutivo.
+CB_KEY_LLM = "llm:complete"
+CB_THRESHOLD  = int(os.getenv("LLM_CB_THRESHOLD", "3"))
+CB_COOLDOWN_S = int(os.getenv("LLM_CB_COOLDOWN_S", "60"))
+
+# Tiempo mínimo que debe quedar del deadline del request para lanzar una generación
+MIN_REMAINING_S = float(os.getenv("LLM_MIN_REMAINING_S", "1.5"))
+
+# Cola acotada de generaciones: el summarizer resume en paralelo, pero una instancia
+# de Llama no admite llamadas concurrentes. MAX_CONCURRENCY generaciones a la vez
+# (1 = serie), cada una con su propia instancia del modelo (se cargan a demanda: con
+# N > 1 la RAM del modelo se multiplica por N), y hasta MAX_QUEUE esperando turno; con
+# la cola llena o sin tiempo para esperar el turno, el caller usa su fallback extractivo.
+MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "1")))
+MAX_QUEUE       = max(0, int(os.getenv("LLM_MAX_QUEUE", "16")))
+
 _LLM: Optional[LlamaType] = None
+_LOAD_LOCK = threading.Lock()
+_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_QUEUE_LOCK = threading.Lock()
+_admitted = 0
+
+# Instancias para los turnos concurrentes: la principal (_get_llm) + extras libres
+_POOL_LOCK = threading.Lock()
+_main_busy = False
+_EXTRA_FREE: List[LlamaType] = []
+
+def _load_model() -> LlamaType:
+    print(f"🦙 Cargando modelo local: {MODEL_PATH} (ctx={CTX}, threads={THREADS})")
+    return Llama(
+        model_path=MODEL_PATH,
+        n_ctx=CTX,
+        n_threads=THREADS,
+        verbose=False,
+    )
 
 # --- Carga única del modelo ---
 def _get_llm() -> Optional[LlamaType]:
     global _LLM
     if _LLM is None and Llama is not None:
-        print(f"🦙 Cargando modelo local: {MODEL_PATH} (ctx={CTX}, threads={THREADS})")
-        _LLM = Llama(
-            model_path=MODEL_PATH,
-            n_ctx=CTX,
-            n_threads=THREADS,
-            verbose=False,
-        )
+        with _LOAD_LOCK:
+            if _LLM is None:
+                _LLM = _load_model()
     return _LLM
 
+def _checkout(main: LlamaType) -> Tuple[Optional[LlamaType], bool]:
+    """
+    Instancia para el turno ya tomado: (llm, es_principal). Con la principal ocupada
+    por otro turno se usa (o carga) una extra; nunca hay más de MAX_CONCURRENCY.
+    """
+    global _main_busy
+    with _POOL_LOCK:
+        if not _main_busy:
+            _main_busy = True
+            return main, True
+        if _EXTRA_FREE:
+            return _EXTRA_FREE.pop(), False
+    try:
+        return _load_model(), False
+    except Exception as e:
+        print("❌ LLM error al cargar instancia extra:", e)
+        return None, False
+
+def _checkin(llm: LlamaType, is_main: bool) -> None:
+    global _main_busy
+    with _POOL_LOCK:
+        if is_main:
+            _main_busy = False
+        else:
+            _EXTRA_FREE.append(llm)
+
+def _acquire_slot() -> bool:
+    """Turno para generar (en curso + en espera ≤ MAX_CONCURRENCY + MAX_QUEUE)."""
+    global _admitted
+    with _QUEUE_LOCK:
+        if _admitted >= MAX_CONCURRENCY + MAX_QUEUE:
+            return False
+        _admitted += 1
+    rem = deadline.remaining_s()
+    if _SLOTS.acquire(timeout=None if rem is None else max(0.0, rem - MIN_REMAINING_S)):
+        return True
+    # el deadline no alcanza para esperar turno y generar
+    deadline.record_cut("llm")
+    with _QUEUE_LOCK:
+        _admitted -= 1
+    return False
+
+def _release_slot() -> None:
+    global _admitted
+    _SLOTS.release()
+    with _QUEUE_LOCK:
+        _admitted -= 1
+
 # --- Ejecutor ---
 def _complete(prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
     llm = _get_llm()
     if not llm:
         return None
+    if not _acquire_slot():
+        return None
+    try:
+        inst, is_main = _checkout(llm)
+        if inst is None:
+            return None
+        try:
+            return _complete_locked(inst, prompt, max_tokens, temperature)
+        finally:
+            _checkin(inst, is_main)
+    finally:
+        _release_slot()
+
+def _complete_locked(llm: LlamaType, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
+    # Deadline del request: sin tiempo para generar, el caller usa su fallback extractivo
+    if deadline.would_overrun(MIN_REMAINING_S):
+        deadline.record_cut("llm")
+        return None
+    cb_conf(CB_KEY_LLM, threshold=CB_THRESHOLD, cooldown_s=CB_COOLDOWN_S, mode="consecutive")
+    allow, _ = cb_before(CB_KEY_LLM)
+    if not allow:
+        return None
     try:
         if hasattr(llm, "create_completion"):
             out = llm.create_completion(
@@ -71,10 +180,13 @@ def _complete(prompt: str, max_tokens: int, temperature: float) -> Optional[str]
                 stop=_STOP,
                 echo=False,
             )
-        return (out["choices"][0]["text"] or "").strip()
+        text = (out["choices"][0]["text"] or "").strip()
     except Exception as e:
         print("❌ LLM error:", e)
+        cb_fail(CB_KEY_LLM, 500)
         return None
+    cb_ok(CB_KEY_LLM)
+    return text
 
 # --- Utilidad: detectar si copió literal ---
 def _too_similar(src: str, out: str) -> bool:
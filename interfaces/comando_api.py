@@ -9,14 +9,21 @@ from typing import Any, Dict, Tuple
 from flask import Blueprint, request, jsonify
 
 # Config / paths helpers
-from utils.config import get_fake_emails_path
+from utils.config import deadline_seconds_for, get_fake_emails_path
 import utils.config as cfg  # acceso a cfg.CONFIG
 
 # Logger (observabilidad Fase 4)
 from utils.logger import Timer, log_event, log_error
 
 # Retry (H4 — Robustez)
-from utils.retry import RetryError, consume_gmail_retry_stats
+from utils.retry import DeadlineExceeded, RetryError, consume_gmail_retry_stats
+
+# Métricas de búsqueda (opcional: requiere el backend real de Gmail importable)
+try:
+    from core.gmail.buscar import consume_buscar_stats  # type: ignore
+except Exception:
+    def consume_buscar_stats() -> Dict[str, Any] | None:
+        return None
 
 # Intent detector (única fuente de verdad)
 try:
@@ -30,6 +37,18 @@ from core.action_router import ejecutar_accion
 # Circuit Breaker (Fase 4)
 from utils.circuit_breaker import status as cb_status
 
+# Cache de respuestas (usuario, acción, filtros, día, versión del buzón)
+from utils.response_cache import cached_response
+
+# Reporte de mensajes omitidos (breaker/retries/cache negativa)
+from utils.degradation import consume_degradation_report
+
+# Deadline por request (retries, fetch y LLM lo respetan; reporta lo cortado)
+from utils.deadline import consume_deadline_report, start_deadline
+
+# Snapshot del buzón reciente compartido por los consumidores del request
+from core.gmail.snapshot import consume_snapshot_stats
+
 # Contexto (opcional, si existe en tu proyecto)
 try:
     from utils.contexto import cargar_contexto  # type: ignore
@@ -57,6 +76,8 @@ def _detectar_intencion_fallback(texto: str) -> Dict[str, Any]:
         accion = "remitentes_ayer" if "ayer" in t else "remitentes_hoy"
     elif ("sin leer" in t) or ("no leidos" in t):
         accion = "contar_no_leidos"
+        if "exact" in t:
+            filtros["exacto"] = True
     elif ("resumen" in t) or ("resume" in t):
         accion = "resumen_ayer" if "ayer" in t else "resumen_hoy"
 
@@ -122,6 +143,8 @@ _GUARDED_ACTIONS = {
     "buscar_correo",
 }
 
+_GUARDED_BREAKERS = ("gmail:messages.list", "gmail:messages.get")
+
 def _breaker_guard_or_503() -> Tuple[Dict[str, Any] | None, int | None]:
     """
     Si el breaker está abierto, devolvemos 503 con 'retry_after_s'.
@@ -134,9 +157,10 @@ def _breaker_guard_or_503() -> Tuple[Dict[str, Any] | None, int | None]:
     if not user_notice:
         return None, None
 
-    st = cb_status("gmail:messages.get")
-    if not st.get("allow", True):
-        retry = int(st.get("retry_after_s", 0))
+    # list abierto corta toda la operación; get abierto la dejaría vacía
+    blocked = [st for st in (cb_status(k) for k in _GUARDED_BREAKERS) if not st.get("allow", True)]
+    if blocked:
+        retry = int(max(st.get("retry_after_s", 0) for st in blocked))
         return {
             "ok": False,
             "degraded": True,
@@ -146,6 +170,15 @@ def _breaker_guard_or_503() -> Tuple[Dict[str, Any] | None, int | None]:
     return None, None
 
 
+class _BreakerOpen(Exception):
+    """Guard del breaker dentro del cómputo: corta sin cachear y responde 503."""
+
+    def __init__(self, payload: Dict[str, Any], code: int):
+        super().__init__(payload.get("reason", "breaker open"))
+        self.payload = payload
+        self.code = code
+
+
 # ===================== Blueprint y endpoints =====================
 
 comando_bp = Blueprint("comando_api", __name__, url_prefix="/api")
@@ -158,9 +191,26 @@ def ping() -> Any:
 
 @comando_bp.route("/comando", methods=["POST"])
 def procesar_comando() -> Any:
+    try:
+        return _procesar_comando()
+    finally:
+        # Los workers sync reusan el thread (y su contexto): sin esto, el deadline,
+        # la degradación y el snapshot de este request quedan vivos para el siguiente,
+        # incluso en endpoints que nunca llaman start_deadline (p.ej. /gmail/no_leidos)
+        consume_deadline_report()
+        consume_degradation_report()
+        consume_snapshot_stats()
+
+
+def _procesar_comando() -> Any:
     # ⏱️ métrica de duración
     t = Timer.start()
 
+    # Acumuladores por request en este contexto: los workers (copy_context) escriben aquí
+    consume_gmail_retry_stats()
+    consume_degradation_report()
+    consume_snapshot_stats()
+
     data = request.get_json(silent=True) or {}
     print("📥 JSON recibido:", data)
 
@@ -181,6 +231,9 @@ def procesar_comando() -> Any:
     intencion = _override_intencion_si_corresponde(comando, intencion)
     accion = (intencion.get("accion") or "desconocida").lower()
 
+    # Tope de tiempo total del request (config.deadlines, por acción)
+    start_deadline(deadline_seconds_for(accion))
+
     # Logs clásicos a consola (útiles en dev)
     print("🔍 Intención por reglas simples:", intencion.get("accion"))
     print("🎯 Ejecutando acción:", intencion)
@@ -191,27 +244,15 @@ def procesar_comando() -> Any:
     contexto = _make_contexto(usuario_id)
     backend = "fake" if contexto.get("USE_FAKE_GMAIL") else "real"
 
-    # ---- Circuit Breaker: aviso al usuario si está OPEN (solo para acciones intensivas)
-    if accion in _GUARDED_ACTIONS:
-        guard_payload, guard_code = _breaker_guard_or_503()
-        if guard_payload is not None:
-            # Log de evento degradado (sin golpear backend)
-            duration_ms = t.ms()
-            log_event(
-                usuario_id,
-                accion=accion,
-                backend=backend,
-                duration_ms=duration_ms,
-                ok=False,
-                items=0,
-                extra={"endpoint": "/api/comando", "breaker_open": True},
-            )
-            return jsonify(guard_payload), int(guard_code)
-
-    # Ejecutar acción y responder
-    try:
+    def _compute() -> Any:
+        # ---- Circuit Breaker: aviso al usuario si está OPEN (solo para acciones intensivas).
+        # Va dentro del cómputo: una respuesta cacheada vigente se sirve igual.
+        if accion in _GUARDED_ACTIONS:
+            guard_payload, guard_code = _breaker_guard_or_503()
+            if guard_payload is not None:
+                raise _BreakerOpen(guard_payload, int(guard_code))
         try:
-            resultado = ejecutar_accion(
+            return ejecutar_accion(
                 intencion,
                 comando=comando,
                 contexto=contexto,
@@ -219,7 +260,13 @@ def procesar_comando() -> Any:
             )
         except TypeError:
             # Compatibilidad con firma anterior
-            resultado = ejecutar_accion(intencion, comando)
+            return ejecutar_accion(intencion, comando)
+
+    # Ejecutar acción (o servir respuesta cacheada) y responder
+    try:
+        resultado, cache_meta = cached_response(
+            usuario_id, accion, intencion.get("filtros"), _compute, comando=comando,
+        )
 
         # Métricas
         duration_ms = t.ms()
@@ -227,12 +274,29 @@ def procesar_comando() -> Any:
 
         # Métricas de retry agregadas (éxitos)
         retry_stats = consume_gmail_retry_stats()
-        extra = {"endpoint": "/api/comando"}
+        extra = {"endpoint": "/api/comando", "cached": cache_meta["cached"]}
         if retry_stats.get("calls", 0) > 0:
             extra.update({
                 "retries_by_code": retry_stats.get("retries_by_code", {}),
                 "slept_ms_total": retry_stats.get("slept_ms_total", 0),
             })
+            if retry_stats.get("hedges", 0):
+                extra["hedges"] = retry_stats["hedges"]
+                extra["hedge_wins"] = retry_stats.get("hedge_wins", 0)
+            if retry_stats.get("throttled_ms_total", 0):
+                extra["throttled_ms_total"] = retry_stats["throttled_ms_total"]
+        search_stats = consume_buscar_stats()
+        if search_stats is not None:
+            extra["buscar"] = search_stats
+        degradation = consume_degradation_report()
+        if degradation["partial"]:
+            extra["degradation"] = degradation
+        deadline_report = consume_deadline_report()
+        if deadline_report["exceeded"]:
+            extra["deadline"] = deadline_report
+        snapshot_stats = consume_snapshot_stats()
+        if snapshot_stats is not None:
+            extra["snapshot"] = snapshot_stats
 
         log_event(
             usuario_id,
@@ -245,10 +309,33 @@ def procesar_comando() -> Any:
         )
         print(f"⏱️ comando_api duration_ms={duration_ms:.2f}")
 
-        # Respuesta uniforme
+        # Respuesta uniforme (+ aviso de resultado parcial si se omitieron mensajes)
+        payload: Dict[str, Any] = {"ok": True, **cache_meta}
         if isinstance(resultado, str):
-            return jsonify({"ok": True, "respuesta": resultado})
-        return jsonify({"ok": True, "data": resultado})
+            payload["respuesta"] = resultado
+        else:
+            payload["data"] = resultado
+        if degradation["partial"]:
+            payload["partial"] = True
+            payload["degradation"] = {k: degradation[k] for k in ("skipped", "ids", "reasons", "retry_after_s")}
+        if deadline_report["exceeded"]:
+            # best-effort: lo que alcanzó a llegar antes del deadline
+            payload["partial"] = True
+            payload["deadline"] = {"budget_s": deadline_report["budget_s"], "cut": deadline_report["cut"]}
+        return jsonify(payload)
+
+    except _BreakerOpen as bo:
+        # Log de evento degradado (sin golpear backend)
+        log_event(
+            usuario_id,
+            accion=accion,
+            backend=backend,
+            duration_ms=t.ms(),
+            ok=False,
+            items=0,
+            extra={"endpoint": "/api/comando", "breaker_open": True},
+        )
+        return jsonify(bo.payload), bo.code
 
     except RetryError as re:
         # Error tras reintentos: responder amable y loggear métricas de robustez
@@ -259,6 +346,9 @@ def procesar_comando() -> Any:
             "last_error": re.last_error_code,
             "attempts": re.attempts,
         }
+        deadline_report = consume_deadline_report()
+        if deadline_report["exceeded"]:
+            extra["deadline"] = deadline_report
         log_event(
             usuario_id,
             accion=accion,
@@ -269,6 +359,10 @@ def procesar_comando() -> Any:
             extra=extra,
         )
         mensaje = _mensaje_amable_por_accion(accion, re.last_error_code)
+        if isinstance(re, DeadlineExceeded):
+            # Ni la primera página alcanzó a llegar antes del deadline
+            return jsonify({"ok": False, "error": mensaje, "code": re.last_error_code,
+                            "deadline": {"budget_s": deadline_report["budget_s"], "cut": deadline_report["cut"]}}), 504
         # 503 como fallback de “servicio no disponible” (rate/5xx)
         return jsonify({"ok": False, "error": mensaje, "code": re.last_error_code}), 503
 
@@ -32,7 +32,8 @@ def http_remitentes_hoy():
 
 @gmail_bp.get("/gmail/no_leidos")
 def http_no_leidos():
-    n = contar_no_leidos()
+    exacto = (request.args.get("exacto") or "").lower() in {"1", "true", "yes"}
+    n = contar_no_leidos(accurate=exacto)
     return jsonify({"data": n}), 200
 
 
@@ -154,6 +154,57 @@ def health():
     checks["credentials_file"] = _file_state(cred)
     checks["token_file"] = _file_state(tok)
 
+    # Cache en memoria (entradas, bytes, evicciones)
+    try:
+        from utils.cache import cache_stats
+        checks["cache"] = cache_stats()
+    except Exception as ex:
+        warnings.append(f"cache: {type(ex).__name__}")
+
+    # Circuit breakers por operación (estado, transiciones, rechazos, tasa de error)
+    try:
+        from utils.circuit_breaker import breaker_metrics
+        checks["breakers"] = breaker_metrics()
+    except Exception as ex:
+        warnings.append(f"breakers: {type(ex).__name__}")
+
+    # Hedging de messages.get (duplicados lanzados / ganados / negados por presupuesto)
+    try:
+        from utils.hedging import hedge_metrics
+        checks["hedging"] = hedge_metrics()
+    except Exception as ex:
+        warnings.append(f"hedging: {type(ex).__name__}")
+
+    # Governor de cuota Gmail (tokens, pausas por 429, llamadas frenadas)
+    try:
+        from utils.rate_governor import governor_metrics
+        checks["rate_governor"] = governor_metrics()
+    except Exception as ex:
+        warnings.append(f"rate_governor: {type(ex).__name__}")
+
+    # Message store persistente (hit rate / tamaño)
+    try:
+        from utils.message_store import store_stats
+        checks["message_store"] = store_stats()
+    except Exception as ex:
+        warnings.append(f"message_store: {type(ex).__name__}")
+
+    # Resúmenes LLM persistidos (hit rate / tamaño)
+    try:
+        from utils.summary_store import summary_store_stats
+        checks["summary_store"] = summary_store_stats()
+    except Exception as ex:
+        warnings.append(f"summary_store: {type(ex).__name__}")
+
+    # Pool de servicios Gmail (utilización / esperas → tuning de concurrency_get)
+    if backend == "real":
+        try:
+            from core.gmail.auth import service_pool_stats, warmup_status
+            checks["gmail_service_pool"] = service_pool_stats()
+            checks["gmail_warmup"] = warmup_status()
+        except Exception as ex:
+            warnings.append(f"gmail_service_pool: {type(ex).__name__}")
+
     ok = len(errors) == 0
     status = 200 if ok else 503
 
@@ -84,6 +84,15 @@ app.register_blueprint(comando_bp)
 app.register_blueprint(auth_bp)
 register_health(app)  # <<< registro del /health
 
+# Warmup Gmail en segundo plano: token + cliente listos antes del primer /api/comando
+from utils.config import gmail_warmup_on_start
+if gmail_warmup_on_start():
+    try:
+        from core.gmail.auth import start_warmup
+        start_warmup(background=True)
+    except Exception as e:
+        print(f"⚠️ warmup Gmail no disponible: {e}")
+
 # Servir la interfaz visual (HTML)
 @app.route("/")
 def home():
@@ -0,0 +1,179 @@
+"""
+Fakes compartidos de la API de Gmail para los tests de core/gmail.
+
+  - FakeGmail: buzón en memoria con users().messages().list/get, getProfile y
+    history.list. Los módulos que necesitan otra forma (batch HTTP, labels.get,
+    gets colgados) heredan y sobreescriben sólo ese método.
+  - gmail_settings(**over): settings de Gmail para tests (sin cache, sin breaker, sin
+    batch, un intento). Cada módulo ajusta sus defaults sobreescribiendo el fixture
+    `gmail_settings_overrides`.
+  - gmail_env: Gmail "real" (USE_FAKE_GMAIL=0) con cache y reporte de degradación
+    limpios antes y después.
+"""
+import copy
+import threading
+
+import pytest
+
+BODY_DATA = "aG9sYQ"  # "hola" en base64url
+
+
+class HttpError(Exception):
+    """Como googleapiclient.errors.HttpError: status en .resp (y en .status)."""
+
+    def __init__(self, status, reason=""):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.resp = type("R", (), {"status": status, "reason": reason})()
+
+
+class Call:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class FakeGmail:
+    """
+    messages.list pagina de a `page_size` ids (None = todo en una página) en orden
+    internalDate desc; messages.get devuelve una copia y falla con 503 para los ids en
+    `broken`. Con `down` todas las llamadas fallan con 503.
+    """
+
+    def __init__(self, ids=(), page_size=None, excluded=(), broken=()):
+        self.mailbox = {}
+        self.page_size = page_size
+        self.broken = set(broken)
+        self.down = False
+        self.history_id = 100
+        self.pending_history = []
+        self.expired = False
+        self.calls = {"list": 0, "get": 0, "history": 0, "profile": 0}
+        self.gets = []                                   # ids pedidos a messages.get, en orden
+        self.gets_by_format = {"metadata": [], "full": []}
+        self.lock = threading.Lock()
+        excluded = set(excluded)
+        for mid in ids:
+            self.add(mid, labels=("INBOX", "SPAM") if mid in excluded else ("INBOX",))
+
+    def add(self, mid, ms=None, labels=("INBOX",), headers=None):
+        """Agrega un mensaje; sin `ms` queda más antiguo que los anteriores."""
+        if ms is None:
+            ms = 1_700_000_000_000 - len(self.mailbox) * 1000
+        if headers is None:
+            headers = [{"name": "From", "value": f"{mid}@x.cl"}]
+        self.mailbox[mid] = {"id": mid, "internalDate": str(ms), "labelIds": list(labels),
+                             "payload": {"headers": list(headers)}}
+
+    @property
+    def ids(self):
+        ordered = sorted(self.mailbox.values(), key=lambda m: int(m["internalDate"]), reverse=True)
+        return [m["id"] for m in ordered if "INBOX" in m["labelIds"]]
+
+    def _call(self, counter, fn):
+        def run():
+            with self.lock:
+                self.calls[counter] += 1
+            if self.down:
+                raise HttpError(503)
+            return fn()
+        return Call(run)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return _History(self)
+
+    def getProfile(self, userId, fields=None):
+        return self._call("profile", lambda: {"historyId": str(self.history_id)})
+
+    def list(self, userId="me", maxResults=None, pageToken=None, **kwargs):
+        def fn():
+            ids = self.ids
+            start = int(pageToken or 0)
+            size = min(self.page_size or len(ids), maxResults or len(ids))
+            end = min(start + size, len(ids))
+            resp = {"messages": [{"id": m} for m in ids[start:end]]}
+            if end < len(ids):
+                resp["nextPageToken"] = str(end)
+            return resp
+        return self._call("list", fn)
+
+    def get(self, userId, id, format="metadata", **kwargs):
+        def fn():
+            with self.lock:
+                self.gets.append(id)
+                self.gets_by_format.setdefault(format, []).append(id)
+            if id in self.broken:
+                raise HttpError(503)
+            if id not in self.mailbox:
+                raise HttpError(404)
+            msg = copy.deepcopy(self.mailbox[id])
+            if format == "full":
+                msg["payload"]["body"] = {"data": BODY_DATA}
+            return msg
+        return self._call("get", fn)
+
+
+class _History:
+    def __init__(self, svc):
+        self.svc = svc
+
+    def list(self, userId, startHistoryId, **kwargs):
+        def fn():
+            if self.svc.expired:
+                raise HttpError(404)
+            records, self.svc.pending_history = self.svc.pending_history, []
+            return {"history": records, "historyId": str(self.svc.history_id)}
+        return self.svc._call("history", fn)
+
+
+_BASE_SETTINGS = {
+    "max_results": 50,
+    "fields_list": "messages(id),nextPageToken",
+    "fields_get": "id,internalDate,labelIds,payload(headers(name,value))",
+    "headers_get": ["From"],
+    "excluded_labels": ["SPAM"],
+    "cache_ttl_seconds": 0,
+    "concurrency_get": 1,
+    "backoff_max_tries": 1,
+    "backoff_base_ms": 1,
+    "backoff_jitter_ms": 0,
+    "cb_enabled": False,
+    "hedge_enabled": False,
+    "governor_enabled": False,
+    "batch_enabled": False,
+    "mirror_enabled": False,
+}
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    """Defaults propios del módulo (sobreescribir en el test module)."""
+    return {}
+
+
+@pytest.fixture
+def gmail_settings(gmail_settings_overrides):
+    def make(**over):
+        return {**_BASE_SETTINGS, **gmail_settings_overrides, **over}
+    return make
+
+
+@pytest.fixture
+def gmail_env(monkeypatch):
+    from utils.cache import cache_clear
+    from utils.degradation import consume_degradation_report
+
+    monkeypatch.setenv("USE_FAKE_GMAIL", "0")
+    cache_clear()
+    consume_degradation_report()
+    yield
+    consume_degradation_report()
+    cache_clear()
@@ -0,0 +1,129 @@
+import pytest
+
+import utils.cache as cache
+
+
+@pytest.fixture(autouse=True)
+def _small_cache():
+    cache.cache_configure(max_entries=3, max_bytes=1024 * 1024)
+    yield
+    cache.cache_configure(max_entries=cache.DEFAULT_MAX_ENTRIES, max_bytes=cache.DEFAULT_MAX_BYTES)
+
+
+def test_lru_evicts_least_recently_used():
+    for k in ("a", "b", "c"):
+        cache.cache_set(k, k, 60)
+    assert cache.cache_get("a") == "a"  # "a" pasa a ser el más reciente
+    cache.cache_set("d", "d", 60)
+
+    assert cache.cache_get("b") is None
+    assert [cache.cache_get(k) for k in ("a", "c", "d")] == ["a", "c", "d"]
+    stats = cache.cache_stats()
+    assert stats["entries"] == 3 and stats["evicted_entries"] == 1
+
+
+def test_byte_budget_evicts_and_rejects_oversized():
+    cache.cache_configure(max_entries=100, max_bytes=20_000)
+    for i in range(10):
+        cache.cache_set(i, "x" * 5_000, 60)
+    stats = cache.cache_stats()
+    assert stats["bytes"] <= 20_000 and stats["evicted_bytes"] > 0
+    assert cache.cache_get(9) is not None
+
+    cache.cache_set("huge", "x" * 50_000, 60)
+    assert cache.cache_get("huge") is None
+    assert cache.cache_get(9) is not None
+
+
+def test_expired_entries_are_reclaimed_without_reads(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "_now", lambda: now[0])
+    cache.cache_set("old", 1, 5)
+    cache.cache_set("old2", 2, 5)
+    now[0] += 10
+    cache.cache_set("new", 3, 60)
+
+    stats = cache.cache_stats()
+    assert stats["entries"] == 1 and stats["expired"] == 2
+
+
+def test_clear_by_prefix_keeps_api():
+    k1 = cache.make_cache_key("msg_get", id="1", fields="id")
+    k2 = cache.make_cache_key("other", id="1")
+    cache.cache_set(k1, {"id": "1"}, 60)
+    cache.cache_set(k2, {"id": "1"}, 60)
+    assert cache.cache_clear("msg_get") == 1
+    assert cache.cache_get(k1) is None and cache.cache_get(k2) is not None
+
+
+def test_get_or_load_single_flight_shares_one_load():
+    import threading, time
+
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return {"id": "x"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.cache_get_or_load("k", loader, 60)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"id": "x"}] * 8
+    assert cache.cache_stats()["loads"] == 1
+
+
+def test_get_or_load_serves_stale_and_refreshes_in_background(monkeypatch):
+    import threading
+
+    now = [1000.0]
+    monkeypatch.setattr(cache, "_now", lambda: now[0])
+    refreshed = threading.Event()
+    cache.cache_get_or_load("k", lambda: "v1", 10, stale_ttl=30)
+
+    def reload():
+        refreshed.set()
+        return "v2"
+
+    now[0] += 15  # vencida pero dentro de la ventana stale
+    assert cache.cache_get_or_load("k", reload, 10, stale_ttl=30) == "v1"
+    assert refreshed.wait(2)
+    cache._refresh_pool().submit(lambda: None).result()  # deja terminar el refresco
+    assert cache.cache_get_or_load("k", lambda: "nope", 10, stale_ttl=30) == "v2"
+
+    now[0] += 100  # fuera de la ventana → carga síncrona
+    assert cache.cache_get_or_load("k", lambda: "v3", 10, stale_ttl=30) == "v3"
+
+
+def test_get_or_load_does_not_cache_empty_or_errors():
+    assert cache.cache_get_or_load("k", dict, 60) == {}
+    with pytest.raises(RuntimeError):
+        cache.cache_get_or_load("k", lambda: (_ for _ in ()).throw(RuntimeError("x")), 60)
+    assert cache.cache_get_or_load("k", lambda: {"ok": 1}, 60) == {"ok": 1}
+
+
+def test_sharded_cache_aggregates_and_clears_across_shards():
+    cache.cache_configure(max_entries=10_000, max_bytes=1024 * 1024, shards=16)
+    keys = [cache.make_cache_key("msg_get", id=str(i), fields="id") for i in range(200)]
+    for k in keys:
+        cache.cache_set(k, {"id": k}, 60)
+    assert all(cache.cache_get(k) == {"id": k} for k in keys)
+
+    stats = cache.cache_stats()
+    assert stats["shards"] == 16
+    assert stats["entries"] == 200 and stats["hits"] == 200
+    assert stats["max_entries"] <= 10_000
+    assert cache.cache_clear("msg_get") == 200
+    assert cache.cache_stats()["entries"] == 0
+
+
+def test_small_budget_keeps_a_single_shard():
+    assert cache.cache_stats()["shards"] == 1
@@ -0,0 +1,124 @@
+import pytest
+
+import utils.circuit_breaker as cb
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(cb, "_now", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def key(request):
+    k = f"test:{request.node.name}"
+    yield k
+    cb.reset(k)
+
+
+def _rate(key, **kw):
+    params = dict(threshold=3, cooldown_s=30, mode="rate", window_s=10, min_requests=10,
+                  error_rate=0.5, max_probes=2)
+    params.update(kw)
+    cb.configure(key, **params)
+
+
+def test_rate_mode_ignores_isolated_failures(clock, key):
+    _rate(key)
+    for i in range(40):
+        if i % 5 == 0:
+            cb.after_failure(key, 503)   # ~33% < 50%, incluso con fallos "seguidos" entre threads
+            cb.after_failure(key, 503)
+        else:
+            cb.after_success(key)
+    assert cb.before_call(key) == (True, 0.0)
+
+
+def test_rate_mode_needs_min_volume_then_trips(clock, key):
+    _rate(key)
+    for _ in range(9):
+        cb.after_failure(key, 503)
+    assert cb.before_call(key)[0] is True      # 9 < min_requests
+    cb.after_failure(key, 503)
+    allow, retry_after = cb.before_call(key)
+    assert allow is False and retry_after == pytest.approx(30)
+
+
+def test_window_slides(clock, key):
+    _rate(key)
+    for _ in range(9):
+        cb.after_failure(key, 503)
+    clock[0] += 11                              # esos fallos salen de la ventana
+    cb.after_failure(key, 503)
+    assert cb.before_call(key)[0] is True
+
+
+def test_half_open_admits_bounded_probes(clock, key):
+    _rate(key, min_requests=1)
+    cb.after_failure(key, 503)
+    clock[0] += 31
+    admitted = [cb.before_call(key)[0] for _ in range(5)]
+    assert admitted == [True, True, False, False, False]
+
+    cb.after_success(key)                       # una prueba OK cierra
+    assert cb.before_call(key) == (True, 0.0)
+    m = cb.breaker_metrics()[key]
+    assert m["transitions"] == {"closed->open": 1, "open->half": 1, "half->closed": 1}
+    assert m["rejected"] == 3
+
+
+def test_failed_probe_reopens(clock, key):
+    _rate(key, min_requests=1)
+    cb.after_failure(key, 503)
+    clock[0] += 31
+    assert cb.before_call(key)[0] is True
+    cb.after_failure(key, 503)
+    assert cb.before_call(key)[0] is False
+    assert cb.breaker_metrics()[key]["transitions"]["half->open"] == 1
+
+
+def test_closing_from_half_open_starts_a_fresh_window(clock, key):
+    _rate(key, window_s=60, cooldown_s=30, min_requests=10)
+    for _ in range(10):
+        cb.after_failure(key, 503)
+    assert cb.before_call(key)[0] is False
+    clock[0] += 31
+    assert cb.before_call(key)[0] is True       # prueba
+    cb.after_success(key)                       # cierra
+    cb.after_success(key)
+    cb.after_failure(key, 503)                  # 1 de 2 en la ventana nueva: no reabre
+    assert cb.before_call(key) == (True, 0.0)
+    assert cb.breaker_metrics()[key]["transitions"].get("half->open", 0) == 0
+
+
+def test_uncounted_error_releases_probe_slot(clock, key):
+    _rate(key, min_requests=1, max_probes=1)
+    cb.after_failure(key, 503)
+    clock[0] += 31
+    assert cb.before_call(key)[0] is True
+    assert cb.before_call(key)[0] is False
+    cb.after_failure(key, 404)                  # no cuenta, pero la prueba terminó
+    assert cb.before_call(key)[0] is True
+
+
+def test_consecutive_mode_unchanged(clock, key):
+    cb.configure(key, threshold=2, cooldown_s=30, mode="consecutive")
+    cb.after_failure(key, 429)
+    cb.after_success(key)
+    cb.after_failure(key, 429)
+    assert cb.before_call(key)[0] is True
+    cb.after_failure(key, 429)
+    assert cb.before_call(key)[0] is False
+
+
+def test_operation_keys_are_independent(clock):
+    cb.configure("gmail:messages.list:t", threshold=1, cooldown_s=30)
+    cb.configure("gmail:messages.get:t", threshold=1, cooldown_s=30)
+    try:
+        cb.after_failure("gmail:messages.list:t", 503)
+        assert cb.before_call("gmail:messages.list:t")[0] is False
+        assert cb.before_call("gmail:messages.get:t")[0] is True
+    finally:
+        cb.reset("gmail:messages.list:t")
+        cb.reset("gmail:messages.get:t")
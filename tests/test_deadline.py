@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from utils import deadline
+from utils.cache import cache_clear
+from utils.retry import DeadlineExceeded, run_with_retry_gmail
+
+
+class _Http503(Exception):
+    status = 503
+    reason = "backendError"
+
+
+@pytest.fixture(autouse=True)
+def _clean(monkeypatch):
+    monkeypatch.setenv("USE_FAKE_GMAIL", "0")
+    cache_clear()
+    yield
+    deadline.consume_deadline_report()
+    cache_clear()
+
+
+def test_no_deadline_is_a_noop():
+    assert deadline.remaining_s() is None
+    assert not deadline.expired() and not deadline.would_overrun(1e9)
+    deadline.record_cut("llm")          # sin deadline activo no se anota nada
+    assert deadline.consume_deadline_report() == {"exceeded": False, "budget_s": None, "cut": {}}
+
+
+def test_retry_skips_backoff_that_would_overrun():
+    deadline.start_deadline(0.5)
+    calls, slept = [], []
+
+    def call():
+        calls.append(1)
+        raise _Http503()
+
+    with pytest.raises(DeadlineExceeded) as ei:
+        run_with_retry_gmail(call, max_tries=5, base_ms=2000, jitter_ms=0, sleep_fn=slept.append)
+    assert calls == [1] and slept == []
+    assert ei.value.last_error_code == 408
+    assert deadline.consume_deadline_report()["cut"] == {"retry_sleep": 1}
+
+
+def test_expired_deadline_does_not_call_gmail():
+    deadline.start_deadline(0.01)
+    time.sleep(0.02)
+    calls = []
+    with pytest.raises(DeadlineExceeded):
+        run_with_retry_gmail(lambda: calls.append(1), max_tries=3, base_ms=10, jitter_ms=0)
+    assert calls == []
+    report = deadline.consume_deadline_report()
+    assert report["exceeded"] and report["cut"] == {"gmail_call": 1} and report["budget_s"] == 0.01
+
+
+def test_parallel_fetch_returns_what_arrived_before_deadline(gmail_settings):
+    pytest.importorskip("googleapiclient")
+    import core.gmail.leer as leer
+    from conftest import Call, FakeGmail
+
+    release = threading.Event()
+
+    class _Service(FakeGmail):
+        def get(self, userId, id, **kwargs):
+            call = super().get(userId, id, **kwargs)
+            if id != "slow":
+                return call
+
+            def fn():
+                release.wait(2.0)
+                return call.execute()
+            return Call(fn)
+
+    settings = gmail_settings(excluded_labels=[], concurrency_get=4)
+    deadline.start_deadline(0.3)
+    t0 = time.monotonic()
+    found = leer._parallel_get_metadata(_Service(["a", "slow", "b"]), ["a", "slow", "b"], settings)
+    assert time.monotonic() - t0 < 1.0
+    release.set()
+    assert set(found) == {"a", "b"}
+    assert deadline.consume_deadline_report()["cut"] == {"messages": 1}
+
+
+def test_llm_skips_generation_without_time(monkeypatch):
+    import core.llm.llm_client as llm_client
+
+    class _LLM:
+        calls = 0
+
+        def create_completion(self, **kwargs):
+            _LLM.calls += 1
+            return {"choices": [{"text": "ok"}]}
+
+    monkeypatch.setattr(llm_client, "_get_llm", lambda: _LLM())
+    deadline.start_deadline(llm_client.MIN_REMAINING_S / 2)
+    assert llm_client._complete("hola", 10, 0.0) is None
+    assert _LLM.calls == 0
+    assert deadline.consume_deadline_report()["cut"] == {"llm": 1}
+
+    deadline.start_deadline(30)
+    assert llm_client._complete("hola", 10, 0.0) == "ok"
+
+
+def test_cut_responses_are_not_cached(monkeypatch):
+    from utils import response_cache
+
+    monkeypatch.setattr(response_cache, "_mailbox_version", lambda max_age_s: "v1")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        deadline.record_cut("messages", 3)
+        return ["parcial"]
+
+    deadline.start_deadline(10)
+    response_cache.cached_response("u1", "resumen_hoy", {}, compute)
+    deadline.start_deadline(10)
+    _, meta = response_cache.cached_response("u1", "resumen_hoy", {}, compute)
+    assert meta["cached"] is False and len(calls) == 2
+
+
+def test_comando_clears_deadline_on_error_paths(monkeypatch):
+    flask = pytest.importorskip("flask")
+    import interfaces.comando_api as api
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(api, "ejecutar_accion", boom)
+    monkeypatch.setattr(api, "deadline_seconds_for", lambda accion: 0.01)
+    app = flask.Flask(__name__)
+    app.register_blueprint(api.comando_bp)
+
+    resp = app.test_client().post("/api/comando", json={"comando": "¿Tengo correos sin leer?"})
+    assert resp.status_code >= 500
+    # el thread sigue sin deadline: el próximo request (que no lo fija) no nace vencido
+    time.sleep(0.02)
+    assert deadline.remaining_s() is None and not deadline.expired()
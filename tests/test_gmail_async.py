@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from utils.retry import RetryError, consume_gmail_retry_stats, gmail_retry_wrapper_async
+
+
+class _HttpErr(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+_SETTINGS = {"backoff_max_tries": 3, "backoff_base_ms": 1, "backoff_jitter_ms": 0}
+
+
+def test_async_retry_recovers_and_records_stats():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _HttpErr(503)
+        return {"ok": True}
+
+    consume_gmail_retry_stats()  # resetea el acumulador
+    out, meta = asyncio.run(gmail_retry_wrapper_async(call, _SETTINGS))
+    assert out == {"ok": True}
+    assert meta["attempts"] == 3 and meta["retries_by_code"] == {"503": 2}
+    assert consume_gmail_retry_stats()["retries_by_code"] == {"503": 2}
+
+
+def test_async_retry_does_not_retry_404():
+    async def call():
+        raise _HttpErr(404)
+
+    with pytest.raises(RetryError) as ei:
+        asyncio.run(gmail_retry_wrapper_async(call, _SETTINGS))
+    assert ei.value.last_error_code == 404 and ei.value.attempts == 1
+
+
+def test_async_engine_lists_and_gets_in_inbox_order(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    import core.gmail.leer_async as la
+    from utils.cache import cache_clear
+
+    def handler(request):
+        if request.url.path.endswith("/messages"):
+            return httpx.Response(200, json={"messages": [{"id": "a"}, {"id": "b"}, {"id": "c"}]})
+        mid = request.url.path.rsplit("/", 1)[-1]
+        if mid == "b":
+            return httpx.Response(404, json={"error": {"message": "not found"}})
+        return httpx.Response(200, json={"id": mid, "labelIds": ["INBOX"], "payload": {"headers": []}})
+
+    settings = {
+        "max_results": 10, "fields_list": "messages(id)", "fields_get": "id,labelIds",
+        "headers_get": ["From"], "excluded_labels": [], "cache_ttl_seconds": 0,
+        "cb_enabled": False, "concurrency_async": 4, **_SETTINGS,
+    }
+    cache_clear()
+    monkeypatch.setattr(la, "_CLIENT", httpx.AsyncClient(base_url=la.GMAIL_API_BASE, transport=httpx.MockTransport(handler)))
+
+    async def _tok():
+        return "t"
+
+    monkeypatch.setattr(la, "_token", _tok)
+    monkeypatch.setattr(la, "store_peek", lambda *a: None)
+    monkeypatch.setattr(la, "store_put", lambda *a: None)
+
+    out = la._run(la._list_and_get(settings, None))
+    assert [m["id"] for m in out] == ["a", "c"]
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.leer as leer
+import utils.hedging as hedging
+from conftest import FakeGmail, HttpError
+from utils.circuit_breaker import reset as cb_reset
+
+
+class _Batch:
+    def __init__(self, svc, callback):
+        self.svc = svc
+        self.callback = callback
+        self.items = []
+
+    def add(self, req, request_id):
+        self.items.append((request_id, req))
+
+    def execute(self):
+        self.svc.batch_sizes.append(len(self.items))
+        for rid, req in self.items:
+            if rid in self.svc.fail_in_batch:
+                self.callback(rid, None, HttpError(429, "rateLimitExceeded"))
+            else:
+                self.callback(rid, self.svc.mailbox[rid], None)
+
+
+class _BatchService(FakeGmail):
+    """Batch HTTP: las sub-requests de `fail_in_batch` fallan con 429; `gets` = gets sueltos."""
+
+    def __init__(self, ids, fail_in_batch=(), excluded=()):
+        super().__init__()
+        self.fail_in_batch = set(fail_in_batch)
+        self.batch_sizes = []
+        for mid in ids:
+            self.add(mid, labels=("INBOX", "SPAM") if mid in excluded else ("INBOX",),
+                     headers=[{"name": "From", "value": f"{mid}@x.cl"}, {"name": "X-Other", "value": "1"}])
+
+    def new_batch_http_request(self, callback):
+        return _Batch(self, callback)
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    return {
+        "fields_get": "id,labelIds,payload(headers(name,value))",
+        "headers_get": ["From", "Subject"],
+        "backoff_base_ms": 50,
+        "cb_enabled": True,
+        "batch_enabled": True,
+        "batch_size": 2,
+    }
+
+
+@pytest.fixture(autouse=True)
+def _clean(gmail_env):
+    cb_reset(leer.CB_KEY_GET)
+    yield
+    cb_reset(leer.CB_KEY_GET)
+
+
+def test_batch_groups_ids_and_keeps_order(gmail_settings):
+    ids = ["a", "b", "c", "d", "e"]
+    svc = _BatchService(ids)
+    out = leer._batch_get_metadata(svc, ids, gmail_settings())
+    assert [m["id"] for m in out] == ids
+    assert svc.batch_sizes == [2, 2, 1]
+    assert svc.gets == []
+    assert all(len(m["payload"]["headers"]) == 1 for m in out)
+
+
+def test_batch_failed_subrequests_fall_back_to_single_get(gmail_settings):
+    ids = ["a", "b", "c"]
+    svc = _BatchService(ids, fail_in_batch={"b"}, excluded={"c"})
+    out = leer._batch_get_metadata(svc, ids, gmail_settings(batch_size=10))
+    assert [m["id"] for m in out] == ["a", "b"]
+    assert svc.gets == ["b"]
+
+
+class _SlowFirstBatch(_BatchService):
+    """Una página de messages.list; el primer batch queda colgado hasta `release`."""
+
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.release = threading.Event()
+        self.batch_threads = []
+
+    def new_batch_http_request(self, callback):
+        batch = _Batch(self, callback)
+        run = batch.execute
+
+        def execute():
+            self.batch_threads.append(threading.current_thread().name)
+            if len(self.batch_threads) == 1:
+                self.release.wait(2.0)
+            run()
+
+        batch.execute = execute
+        return batch
+
+
+def test_slow_batch_chunk_is_hedged_from_the_stream(gmail_settings):
+    hedging._reset_for_tests()
+    for _ in range(40):
+        hedging.record_latency(leer.HEDGE_OP_BATCH, 0.01)
+    hedging._BUDGET["tokens"] = 2.0
+    svc = _SlowFirstBatch(["a", "b"])
+    settings = gmail_settings(max_results=2, cb_enabled=False, hedge_enabled=True, hedge_budget_ratio=0.05,
+                              hedge_percentile=0.9, hedge_min_samples=20, hedge_min_delay_ms=0)
+    try:
+        out = [m["id"] for m in leer.iter_message_metadata(svc, settings)]
+        assert out == ["a", "b"]
+        # primario en el worker del stream; sólo el duplicado del chunk va al pool de hedging
+        assert svc.batch_threads[0].startswith("gmail-get")
+        assert svc.batch_threads[1].startswith("gmail-hedge")
+        m = hedging.hedge_metrics()["ops"][leer.HEDGE_OP_BATCH]
+        assert m["hedges"] == 1 and m["wins"] == 1
+    finally:
+        svc.release.set()
+        hedging._reset_for_tests()
@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.leer as leer
+from conftest import FakeGmail
+from utils.cache import cache_clear
+from utils.degradation import consume_degradation_report
+
+pytestmark = pytest.mark.usefixtures("gmail_env")
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    return {"fields_get": "id,labelIds,payload/headers", "headers_get": [], "negative_ttl_s": 30}
+
+
+def test_failed_id_is_negative_cached_and_reported(gmail_settings):
+    svc = FakeGmail(["ok1", "ok2"], broken={"bad"})
+    settings = gmail_settings()
+
+    metas = leer._batch_get_metadata(svc, ["ok1", "bad", "ok2"], settings)
+    assert [m["id"] for m in metas] == ["ok1", "ok2"]
+    report = consume_degradation_report()
+    assert report["partial"] and report["ids"] == ["bad"]
+    assert report["reasons"] == {"retry_exhausted": 1} and report["retry_after_s"] == 30
+
+    # Segundo request: el id roto no vuelve a gastar cuota
+    svc.gets.clear()
+    leer._batch_get_metadata(svc, ["ok1", "bad"], settings)
+    assert "bad" not in svc.gets
+    assert consume_degradation_report()["reasons"] == {"negative_cache": 1}
+
+
+def test_breaker_open_is_reported_with_retry_after(gmail_settings, monkeypatch):
+    monkeypatch.setattr(leer, "cb_before", lambda key: (False, 12.0))
+    settings = gmail_settings(cb_enabled=True)
+
+    assert leer._get_message_metadata(FakeGmail(["m1"]), "m1", settings) == {}
+    report = consume_degradation_report()
+    assert report["reasons"] == {"breaker_open": 1} and report["retry_after_s"] == 12.0
+
+
+def test_clean_request_reports_nothing(gmail_settings):
+    leer._batch_get_metadata(FakeGmail(["a", "b"]), ["a", "b"], gmail_settings())
+    assert consume_degradation_report()["partial"] is False
+
+
+def test_mailbox_version_fails_fast_and_keeps_last_known(gmail_settings, monkeypatch):
+    from utils import circuit_breaker
+
+    svc = FakeGmail()
+    svc.history_id = 777
+    settings = gmail_settings(cb_enabled=True, cb_threshold=1, cb_cooldown_s=60)
+    monkeypatch.setattr(leer, "get_authenticated_service", lambda: svc)
+    monkeypatch.setattr(leer.config, "get_gmail_settings", lambda: settings)
+    cache_clear()
+    circuit_breaker.reset(leer.CB_KEY_LIST)
+    try:
+        assert leer.mailbox_version(0) == "777"
+        svc.down = True
+        # Gmail caído: última versión conocida (la cache de respuestas sigue sirviendo)
+        assert leer.mailbox_version(0) == "777"
+        calls = svc.calls["profile"]
+        # breaker abierto: ni siquiera se llama a Gmail
+        assert leer.mailbox_version(0) == "777"
+        assert svc.calls["profile"] == calls
+        cache_clear()
+        assert leer.mailbox_version(0) is None
+    finally:
+        circuit_breaker.reset(leer.CB_KEY_LIST)
+        cache_clear()
@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.mirror as mirror
+from conftest import FakeGmail
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    return {
+        "max_results": 10,
+        "excluded_labels": ["SPAM", "TRASH", "CATEGORY_PROMOTIONS"],
+        "mirror_enabled": True,
+        "mirror_max_messages": 50,
+        "mirror_sync_interval_s": 0,
+    }
+
+
+@pytest.fixture
+def settings(gmail_settings):
+    return gmail_settings()
+
+
+@pytest.fixture(autouse=True)
+def _clean(gmail_env):
+    mirror.invalidate()
+    yield
+    mirror.invalidate()
+
+
+def test_mirror_applies_history_without_refetching(settings):
+    svc = FakeGmail()
+    svc.add("a", 1000)
+    svc.add("b", 2000)
+
+    assert [m["id"] for m in mirror.mirror_messages(svc, settings)] == ["b", "a"]
+    gets_after_full = svc.calls["get"]
+
+    svc.add("c", 3000)
+    svc.history_id = 101
+    svc.pending_history = [
+        {"messagesAdded": [{"message": {"id": "c"}}]},
+        {"messagesDeleted": [{"message": {"id": "a"}}]},
+        {"labelsAdded": [{"message": {"id": "b"}, "labelIds": ["UNREAD"]}]},
+    ]
+    out = mirror.mirror_messages(svc, settings)
+
+    assert [m["id"] for m in out] == ["c", "b"]
+    assert "UNREAD" in out[1]["labelIds"]
+    assert svc.calls["get"] == gets_after_full + 1
+    assert svc.calls["list"] == 1
+    assert mirror.mirror_status()["history_id"] == "101"
+
+
+def test_mirror_drops_messages_leaving_primary(settings):
+    svc = FakeGmail()
+    svc.add("a", 1000)
+    svc.add("b", 2000)
+    mirror.mirror_messages(svc, settings)
+
+    svc.pending_history = [
+        {"labelsRemoved": [{"message": {"id": "a"}, "labelIds": ["INBOX"]}]},
+        {"labelsAdded": [{"message": {"id": "b"}, "labelIds": ["CATEGORY_PROMOTIONS"]}]},
+    ]
+    assert mirror.mirror_messages(svc, settings) == []
+
+
+def test_mirror_full_resync_when_history_expired(settings):
+    svc = FakeGmail()
+    svc.add("a", 1000)
+    mirror.mirror_messages(svc, settings)
+
+    svc.expired = True
+    svc.add("z", 5000)
+    out = mirror.mirror_messages(svc, settings)
+
+    assert [m["id"] for m in out] == ["z", "a"]
+    assert mirror.mirror_status()["full_syncs"] == 2
+
+
+def test_failed_get_is_retried_on_next_sync(settings):
+    svc = FakeGmail()
+    svc.add("a", 1000)
+    settings = dict(settings, negative_ttl_s=0)
+    mirror.mirror_messages(svc, settings)
+
+    svc.add("c", 3000)
+    svc.history_id = 101
+    svc.pending_history = [{"messagesAdded": [{"message": {"id": "c"}}]}]
+    svc.broken = {"c"}
+    assert [m["id"] for m in mirror.mirror_messages(svc, settings)] == ["a"]
+    assert mirror.mirror_status()["pending"] == 1
+    assert mirror.mirror_status()["history_id"] == "101"
+
+    svc.broken.clear()
+    # Gmail sano y sin historial nuevo: el alta pendiente entra igual
+    assert [m["id"] for m in mirror.mirror_messages(svc, settings)] == ["c", "a"]
+    assert mirror.mirror_status()["pending"] == 0
+
+
+def test_incomplete_full_resync_keeps_no_history_id(settings):
+    svc = FakeGmail()
+    svc.add("a", 1000)
+    svc.add("b", 2000)
+    settings = dict(settings, negative_ttl_s=0)
+    svc.broken = {"b"}
+    assert [m["id"] for m in mirror.mirror_messages(svc, settings)] == ["a"]
+    assert mirror.mirror_status()["history_id"] is None
+
+    svc.broken.clear()
+
+    assert [m["id"] for m in mirror.mirror_messages(svc, settings)] == ["b", "a"]
+    assert mirror.mirror_status()["history_id"] == "100"
+    assert mirror.mirror_status()["full_syncs"] == 2
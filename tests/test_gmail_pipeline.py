@@ -0,0 +1,59 @@
+import importlib
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.leer as leer
+from conftest import FakeGmail
+
+pytestmark = pytest.mark.usefixtures("gmail_env")
+
+
+def _svc(n, page_size, excluded=()):
+    """messages.list paginado (page_size ids por página); los `excluded` vienen con SPAM."""
+    return FakeGmail([f"m{i}" for i in range(n)], page_size=page_size, excluded=excluded)
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    return {"concurrency_get": 4}
+
+
+def test_pipeline_yields_in_inbox_order_across_pages(gmail_settings):
+    svc = _svc(23, page_size=5, excluded={"m3", "m17"})
+    out = [m["id"] for m in leer.iter_message_metadata(svc, gmail_settings())]
+    assert out == [m for m in svc.ids if m not in {"m3", "m17"}]
+
+
+def test_pipeline_respects_max_results(gmail_settings):
+    svc = _svc(23, page_size=5)
+    out = list(leer.iter_message_metadata(svc, gmail_settings(max_results=7)))
+    assert [m["id"] for m in out] == svc.ids[:7]
+
+
+def test_pipeline_early_stop_cancels_outstanding_gets(gmail_settings):
+    svc = _svc(40, page_size=10, excluded={"m0"})
+    stream = leer.iter_message_metadata(svc, gmail_settings(), window=1)
+    first = next(stream)
+    stream.close()
+    assert first["id"] == "m1"
+    assert svc.gets == ["m0", "m1"]
+
+
+def test_buscar_stops_early_and_reports_stats(gmail_settings, monkeypatch):
+    # core.gmail re-exporta la función `buscar`, que tapa el submódulo
+    buscar_mod = importlib.import_module("core.gmail.buscar")
+
+    svc = _svc(40, page_size=10, excluded={"m1"})
+    monkeypatch.setattr(buscar_mod, "get_authenticated_service", lambda: svc)
+    monkeypatch.setattr(buscar_mod.config, "get_gmail_settings", lambda: gmail_settings(max_results=10, concurrency_get=2))
+
+    out = buscar_mod.buscar("from:x", max_results=3)
+    stats = buscar_mod.consume_buscar_stats()
+
+    assert [m["id"] for m in out] == ["m0", "m2", "m3"]
+    assert stats["results"] == 3 and stats["ids_listed"] == 6
+    assert stats["gets_issued"] <= 4 + 2
+    assert stats["gets_issued"] - stats["gets_wasted"] == 4
+    assert buscar_mod.consume_buscar_stats() is None
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.auth as auth
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    primary = object()
+    built = []
+
+    def _build():
+        svc = object()
+        built.append(svc)
+        return svc
+
+    monkeypatch.setattr(auth, "_SERVICE", primary)
+    monkeypatch.setattr(auth, "_build_pooled_service", _build)
+    monkeypatch.setattr(auth, "_pool_max_size", lambda: 2)
+    auth._reset_pool_for_tests()
+    yield primary, built
+    auth._reset_pool_for_tests()
+
+
+def test_lease_passes_through_foreign_services(pool):
+    fake = object()
+    with auth.lease_service(fake) as svc:
+        assert svc is fake
+    with auth.lease_service(None) as svc:
+        assert svc is None
+    assert auth.service_pool_stats()["checkouts"] == 0
+
+
+def test_pool_bounds_size_and_never_shares_a_service(pool):
+    primary, built = pool
+    active = set()
+    lock = threading.Lock()
+    shared = []
+
+    def worker():
+        for _ in range(5):
+            with auth.lease_service(primary) as svc:
+                assert svc is not primary
+                with lock:
+                    if svc in active:
+                        shared.append(svc)
+                    active.add(svc)
+                time.sleep(0.002)
+                with lock:
+                    active.discard(svc)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = auth.service_pool_stats()
+    assert not shared
+    assert len(built) == stats["builds"] == 2
+    assert stats["checkouts"] == 30 and stats["in_use"] == 0
+    assert stats["peak_in_use"] == 2 and stats["waits"] > 0
+
+
+def test_warmup_skips_without_token(monkeypatch, tmp_path):
+    monkeypatch.setenv("USE_FAKE_GMAIL", "0")
+    monkeypatch.setattr(auth, "_credentials_paths", lambda: (tmp_path / "credentials.json", tmp_path / "token.json"))
+    assert auth.start_warmup(background=False) is False
+    assert auth.warmup_status()["status"] == "skipped"
+
+
+def test_warmup_builds_client_before_first_request(monkeypatch, tmp_path, pool):
+    primary, built = pool
+    (tmp_path / "token.json").write_text("{}")
+    monkeypatch.setenv("USE_FAKE_GMAIL", "0")
+    monkeypatch.setattr(auth, "_credentials_paths", lambda: (tmp_path / "credentials.json", tmp_path / "token.json"))
+    monkeypatch.setattr(auth, "get_access_token", lambda: "t")
+
+    assert auth.start_warmup(background=False) is True
+    assert auth.warmup_status()["status"] == "done"
+    assert len(built) == 1 and auth.service_pool_stats()["in_use"] == 0
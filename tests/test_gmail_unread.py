@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.leer as leer
+from conftest import Call, FakeGmail
+
+
+class _UnreadService(FakeGmail):
+    """labels.get con messagesUnread y messages.list con resultSizeEstimate; anota cada llamada."""
+
+    def __init__(self):
+        super().__init__()
+        self.log = []
+
+    def labels(self):
+        return self
+
+    def get(self, userId, id, fields=None, **kwargs):
+        def fn():
+            self.log.append(("get", id))
+            if id == leer.PRIMARY_LABEL:
+                return {"messagesUnread": 1234}
+            return {"id": id, "labelIds": ["INBOX", "UNREAD"]}
+        return Call(fn)
+
+    def list(self, userId, labelIds=None, fields=None, **kwargs):
+        def fn():
+            self.log.append(("list", tuple(labelIds or ())))
+            if fields == "resultSizeEstimate":
+                return {"resultSizeEstimate": 57}
+            return {"messages": [{"id": "a"}, {"id": "b"}]}
+        return Call(fn)
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    return {"max_results": 10, "fields_get": "id,labelIds", "headers_get": [], "backoff_base_ms": 50}
+
+
+@pytest.fixture
+def svc(gmail_env, monkeypatch):
+    service = _UnreadService()
+    monkeypatch.setattr(leer, "get_authenticated_service", lambda: service)
+    return service
+
+
+@pytest.mark.parametrize("mode,expected,call", [
+    ("labels", 1234, ("get", "CATEGORY_PERSONAL")),
+    ("estimate", 57, ("list", ("INBOX", "UNREAD", "CATEGORY_PERSONAL"))),
+])
+def test_unread_count_costs_one_call(svc, gmail_settings, monkeypatch, mode, expected, call):
+    monkeypatch.setattr(leer.config, "get_gmail_settings", lambda: gmail_settings(unread_count_mode=mode))
+    assert leer.contar_no_leidos() == expected
+    assert svc.log == [call]
+
+
+def test_unread_count_accurate_mode_scans(svc, gmail_settings, monkeypatch):
+    monkeypatch.setattr(leer.config, "get_gmail_settings", lambda: gmail_settings(unread_count_mode="labels"))
+    assert leer.contar_no_leidos(accurate=True) == 2
+    assert ("get", "a") in svc.log and ("get", "b") in svc.log
+
+
+def test_accurate_is_forwarded_through_facade_and_router(svc, gmail_settings, monkeypatch):
+    import core.action_router as router
+    import core.gmail as gmail
+    from core.intent_detector import detectar_intencion
+
+    monkeypatch.setattr(leer.config, "get_gmail_settings", lambda: gmail_settings(unread_count_mode="labels"))
+    monkeypatch.setattr(gmail, "_contar_no_leidos", leer.contar_no_leidos)
+
+    assert gmail.contar_no_leidos() == 1234
+    assert gmail.contar_no_leidos(accurate=True) == 2
+
+    intencion = detectar_intencion("¿cuántos no leídos tengo exactamente?")
+    assert intencion == {"accion": "contar_no_leidos", "filtros": {"exacto": True}}
+    svc.log.clear()
+    assert router.ejecutar_accion(intencion, filtros=intencion["filtros"]) == 2
+    assert ("get", "a") in svc.log
+    assert router.ejecutar_accion(detectar_intencion("cuántos sin leer")) == 1234
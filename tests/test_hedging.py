@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils.hedging as hedging
+import utils.rate_governor as rate_governor
+from utils.retry import consume_gmail_retry_stats
+
+OP = "test:get"
+SETTINGS = {"hedge_enabled": True, "hedge_budget_ratio": 0.05, "hedge_percentile": 0.9,
+            "hedge_min_samples": 20, "hedge_min_delay_ms": 0}
+
+
+@pytest.fixture(autouse=True)
+def _fresh(monkeypatch):
+    monkeypatch.setenv("USE_FAKE_GMAIL", "0")
+    hedging._reset_for_tests()
+    rate_governor.reset()
+    consume_gmail_retry_stats()
+    yield
+    hedging._reset_for_tests()
+
+
+def _warm(latency_s=0.01, n=40):
+    for _ in range(n):
+        hedging.record_latency(OP, latency_s)
+
+
+@pytest.fixture
+def caller_pool():
+    ex = ThreadPoolExecutor(max_workers=1, thread_name_prefix="caller")
+    yield ex
+    ex.shutdown(wait=False)
+
+
+def _hedged(ex, call, **kw):
+    return hedging.hedged_result(OP, hedging.submit_primary(OP, ex, call), call, SETTINGS, **kw)
+
+
+def test_no_hedge_without_samples(caller_pool):
+    calls = []
+    assert _hedged(caller_pool, lambda: calls.append(1) or "ok") == "ok"
+    assert calls == [1]
+    assert hedging.hedge_delay_s(OP, SETTINGS) is None
+
+
+def test_slow_primary_is_hedged_and_duplicate_wins(caller_pool):
+    _warm()
+    hedging._BUDGET["tokens"] = 1.0
+    release = threading.Event()
+    n = {"calls": 0}
+    threads = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            n["calls"] += 1
+            first = n["calls"] == 1
+            threads.append(threading.current_thread().name)
+        if first:
+            release.wait(2.0)       # primario colgado en la cola
+            return "slow"
+        return "fast"
+
+    t0 = time.monotonic()
+    assert _hedged(caller_pool, call) == "fast"
+    assert time.monotonic() - t0 < 1.0
+    release.set()
+    # el primario corre en el pool del caller; sólo el duplicado usa el de hedging
+    assert threads[0].startswith("caller") and threads[1].startswith("gmail-hedge")
+
+    stats = consume_gmail_retry_stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+    assert hedging.hedge_metrics()["ops"][OP]["wins"] == 1
+
+
+def test_queue_time_in_caller_pool_does_not_trigger_hedge(caller_pool):
+    _warm()
+    hedging._BUDGET["tokens"] = 1.0
+    blocker = caller_pool.submit(time.sleep, 0.1)      # el único worker está ocupado
+    calls = []
+
+    def call():
+        calls.append(1)
+        return "ok"
+
+    assert _hedged(caller_pool, call) == "ok"
+    assert blocker.done() and calls == [1]
+    assert consume_gmail_retry_stats()["hedges"] == 0
+    assert max(hedging._LATENCIES[OP]) < 0.05          # la cola no entra al percentil
+
+
+def test_budget_caps_extra_requests(caller_pool):
+    _warm(latency_s=0.001)
+    started = {"n": 0}
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            started["n"] += 1
+        time.sleep(0.01)            # todas más lentas que el p90 → todas candidatas
+        return "ok"
+
+    for _ in range(100):
+        _hedged(caller_pool, call)
+
+    m = hedging.hedge_metrics()["ops"][OP]
+    assert m["calls"] == 100
+    assert m["hedges"] <= 5         # 5% de 100 primarias
+    assert 100 <= started["n"] <= 100 + m["hedges"]
+
+
+def test_chunk_hedge_spends_its_gets_from_the_budget(caller_pool):
+    _warm()
+    hedging._BUDGET["tokens"] = 3.0
+
+    def call():
+        time.sleep(0.05)
+        return "ok"
+
+    assert _hedged(caller_pool, call, units=4) == "ok"
+    assert hedging.hedge_metrics()["ops"][OP]["hedges"] == 0     # 4 gets > 3 tokens
+    hedging._BUDGET["tokens"] = 4.0
+    assert _hedged(caller_pool, call, units=4) == "ok"
+    assert hedging.hedge_metrics()["ops"][OP]["hedges"] == 1
+
+
+def test_both_fail_propagates_first_error(caller_pool):
+    _warm()
+    hedging._BUDGET["tokens"] = 1.0
+
+    def call():
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        _hedged(caller_pool, call)
+    assert consume_gmail_retry_stats()["hedges"] == 1
+
+
+def test_async_hedge_cancels_loser():
+    _warm()
+    hedging._BUDGET["tokens"] = 1.0
+    state = {"calls": 0, "cancelled": False}
+
+    async def call():
+        state["calls"] += 1
+        if state["calls"] == 1:
+            try:
+                await asyncio.sleep(2.0)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+            return "slow"
+        return "fast"
+
+    async def main():
+        res = await hedging.hedged_call_async(OP, call, SETTINGS)
+        await asyncio.sleep(0)
+        return res
+
+    assert asyncio.run(main()) == "fast"
+    assert state["cancelled"] is True
+    assert consume_gmail_retry_stats()["hedge_wins"] == 1
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+import pytest
+
+from utils import importance as imp
+from utils.fake_gmail import listar
+
+
+def _metadata_only(msg):
+    meta = {k: v for k, v in msg.items() if k != "body"}
+    payload = dict(msg.get("payload") or {})
+    meta["payload"] = {"headers": payload.get("headers", [])}
+    return meta
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    msgs = listar()
+    assert msgs
+    return msgs
+
+
+@pytest.fixture(scope="module")
+def now(fixtures):
+    latest = max(imp._msg_datetime_local(m) for m in fixtures)
+    return latest + timedelta(hours=2)
+
+
+@pytest.mark.parametrize("top_n", [1, 2, 3, 5, 12])
+@pytest.mark.parametrize("min_score", [0, 25, 60])
+def test_full_fetch_matches_full_ranking(fixtures, now, top_n, min_score):
+    by_id = {m["id"]: m for m in fixtures}
+    expected = imp.seleccionar_importantes(fixtures, top_n=top_n, min_score=min_score, now=now)
+
+    stats = {}
+    got = imp.seleccionar_importantes_completos(
+        [_metadata_only(m) for m in fixtures],
+        lambda meta: by_id[meta["id"]],
+        top_n=top_n, min_score=min_score, now=now, stats=stats,
+    )
+
+    assert [(m["id"], sc) for m, sc in got] == [(m["id"], sc) for m, sc in expected]
+    assert stats["full_fetched"] <= stats["candidates"]
+
+
+def test_excluded_labels_are_not_fetched(fixtures, now):
+    metas = [_metadata_only(m) for m in fixtures]
+    metas[0] = dict(metas[0], labelIds=["INBOX", "SPAM"])
+    fetched = []
+    by_id = {m["id"]: m for m in fixtures}
+
+    def load(meta):
+        fetched.append(meta["id"])
+        return by_id[meta["id"]]
+
+    imp.seleccionar_importantes_completos(metas, load, top_n=3, min_score=0, now=now)
+    assert metas[0]["id"] not in fetched and len(fetched) == len(metas) - 1
+
+
+def test_failed_full_fetch_drops_the_message(fixtures, now):
+    expected = imp.seleccionar_importantes(fixtures, top_n=12, min_score=0, now=now)
+    top_id = expected[0][0]["id"]
+    by_id = {m["id"]: m for m in fixtures if m["id"] != top_id}
+
+    got = imp.seleccionar_importantes_completos(
+        [_metadata_only(m) for m in fixtures],
+        lambda meta: by_id.get(meta["id"], {}),
+        top_n=2, min_score=0, now=now,
+    )
+    rest = imp.seleccionar_importantes(list(by_id.values()), top_n=2, min_score=0, now=now)
+    assert [m["id"] for m, _ in got] == [m["id"] for m, _ in rest]
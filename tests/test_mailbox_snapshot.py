@@ -0,0 +1,103 @@
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import core.gmail.auth as auth
+import core.gmail.leer as leer
+import core.gmail.snapshot as snapshot
+from conftest import BODY_DATA, FakeGmail
+from utils import config
+from utils.degradation import consume_degradation_report
+
+
+@pytest.fixture
+def gmail_settings_overrides():
+    return {"excluded_labels": [], "concurrency_get": 4}
+
+
+@pytest.fixture
+def service(gmail_env, gmail_settings, monkeypatch):
+    svc = FakeGmail(["a", "b", "c"])
+    monkeypatch.setattr(auth, "get_authenticated_service", lambda: svc)
+    monkeypatch.setattr(config, "get_gmail_settings", gmail_settings)
+    svc.version = "100"
+    monkeypatch.setattr(leer, "mailbox_version", lambda max_age_s=5: svc.version)
+    snapshot.consume_snapshot_stats()
+    yield svc
+    snapshot.consume_snapshot_stats()
+
+
+def test_consumers_share_one_listing_per_request(service, monkeypatch):
+    monkeypatch.setattr(config, "get_snapshot_settings", lambda: {"ttl_seconds": 0, "max_messages": 50})
+    first = snapshot.get_snapshot()
+    assert snapshot.get_snapshot() is first
+    assert [m["id"] for m in first.messages()] == ["a", "b", "c"]
+    assert first.records() is first.records()
+    assert service.calls["list"] == 1 and sorted(service.gets_by_format["metadata"]) == ["a", "b", "c"]
+
+    stats = snapshot.consume_snapshot_stats()
+    assert stats["source"] == "list" and stats["messages"] == 3 and stats["consumers"] == 3
+    # request nuevo sin TTL: se vuelve a listar
+    snapshot.get_snapshot()
+    assert service.calls["list"] == 2
+
+
+def test_bodies_are_upgraded_only_when_missing(service, gmail_settings, monkeypatch):
+    monkeypatch.setattr(config, "get_snapshot_settings", lambda: {"ttl_seconds": 0, "max_messages": 50})
+    snap = snapshot.get_snapshot()
+    assert snap.level("a") == snapshot.LEVEL_METADATA
+    assert snap.fields_loaded("a") == gmail_settings()["fields_get"]
+    assert snap.level("zzz") is None
+
+    fulls = snap.with_bodies(["c", "a"])
+    assert [r.id for r in fulls] == ["c", "a"]
+    assert fulls[1].sender == "a@x.cl" and fulls[1].body_text == "hola"
+    assert snap.level("a") == snapshot.LEVEL_FULL and snap.fields_loaded("a") == snapshot.FULL_FIELDS
+    assert snap.full("a")["payload"]["body"]["data"] == BODY_DATA
+    snap.with_bodies(["a", "b"])
+    assert sorted(service.gets_by_format["full"]) == ["a", "b", "c"]
+    stats = snapshot.consume_snapshot_stats()
+    assert stats["full_fetched"] == 3 and stats["full_reused"] == 1
+
+
+def test_snapshot_is_reused_across_requests_within_ttl(service, monkeypatch):
+    monkeypatch.setattr(config, "get_snapshot_settings", lambda: {"ttl_seconds": 30, "max_messages": 50})
+    snapshot.get_snapshot()
+    snapshot.consume_snapshot_stats()
+    snap = snapshot.get_snapshot()
+    assert service.calls["list"] == 1 and len(service.gets_by_format["metadata"]) == 3
+    assert snap.ids == ["a", "b", "c"]
+
+
+def test_degraded_window_is_not_cached(service, monkeypatch):
+    from utils.degradation import record_skipped
+
+    monkeypatch.setattr(config, "get_snapshot_settings", lambda: {"ttl_seconds": 30, "max_messages": 50})
+    real_load = snapshot._load_window
+
+    def _partial(*args, **kwargs):
+        record_skipped("b", "retry_exhausted:503")
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(snapshot, "_load_window", _partial)
+    snapshot.get_snapshot()
+    snapshot.consume_snapshot_stats()
+    consume_degradation_report()
+    snapshot.get_snapshot()
+    assert service.calls["list"] == 2
+
+
+def test_new_mailbox_version_is_not_served_an_old_window(service, monkeypatch):
+    monkeypatch.setattr(config, "get_snapshot_settings", lambda: {"ttl_seconds": 30, "max_messages": 50})
+    snapshot.get_snapshot()
+    snapshot.consume_snapshot_stats()
+    # llega un correo: historyId nuevo → la ventana cacheada no sirve
+    service.add("nuevo", ms=1_800_000_000_000)
+    service.version = "101"
+    snap = snapshot.get_snapshot()
+    assert service.calls["list"] == 2 and snap.ids[0] == "nuevo"
+    # Gmail sin versión (degradado): tampoco se reutiliza entre requests
+    snapshot.consume_snapshot_stats()
+    service.version = None
+    snapshot.get_snapshot()
+    assert service.calls["list"] == 3
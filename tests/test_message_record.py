@@ -0,0 +1,58 @@
+from datetime import date
+
+from utils import importance as imp
+from utils.message_record import NormalizedMessage, as_record, label_bit, label_mask
+
+
+def _gmail(**kw):
+    msg = {
+        "id": "m1",
+        "internalDate": "1755864900000",
+        "labelIds": ["INBOX", "CATEGORY_PERSONAL"],
+        "snippet": "  Pago   pendiente ",
+        "payload": {
+            "headers": [
+                {"name": "From", "value": "ceo@home.cl"},
+                {"name": "Subject", "value": "URGENTE: cierre"},
+                {"name": "Date", "value": "Fri, 22 Aug 2025 08:15:00 -0400"},
+                {"name": "To", "value": "Carolina <carolina@home.cl>"},
+            ],
+            "mimeType": "text/html",
+            "body": {"text": "<p>Vence <b>hoy</b> a las 18:00</p>"},
+        },
+    }
+    msg.update(kw)
+    return msg
+
+
+def test_fields_are_parsed_once_at_construction():
+    rec = NormalizedMessage(_gmail())
+    assert rec.id == "m1" and rec.sender == "ceo@home.cl" and rec.subject == "URGENTE: cierre"
+    assert rec.epoch_ms == 1755864900000
+    assert rec.local_date == date(2025, 8, 22)
+    assert rec.to_me and not rec.cc_only
+    assert rec.has_any_label(label_bit("INBOX")) and not rec.has_any_label(label_mask(["SPAM", "TRASH"]))
+    assert sorted(rec.labels) == ["CATEGORY_PERSONAL", "INBOX"]
+    assert as_record(rec) is rec
+    # mismo remitente en dos mensajes: un solo string
+    assert NormalizedMessage(_gmail(id="m2")).sender is rec.sender
+
+
+def test_body_is_decoded_lazily_and_cached():
+    rec = NormalizedMessage(_gmail())
+    assert rec._body is None and rec._search is None
+    assert rec.body_text == "Vence hoy a las 18:00"
+    assert rec.search_text == "urgente: cierre pago pendiente vence hoy a las 18:00"
+    assert rec.search_text is rec.search_text
+    # fakes con cuerpo top-level y sin payload.body
+    fake = NormalizedMessage({"id": "f", "payload": {"headers": []}, "body": "texto"})
+    assert fake.body_text == "texto" and fake.ts is None and fake.local_date is None
+
+
+def test_importance_accepts_dicts_and_records_alike():
+    msg = _gmail()
+    rec = NormalizedMessage(msg)
+    now = rec.local_dt
+    assert imp.compute_importance_score(msg, now) == imp.compute_importance_score(rec, now) > 0
+    ranked = imp.seleccionar_importantes([rec], top_n=1, min_score=0, now=now)
+    assert ranked[0][0] is msg
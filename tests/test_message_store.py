@@ -0,0 +1,68 @@
+import pytest
+
+import utils.config as cfg
+import utils.message_store as store
+
+
+@pytest.fixture(autouse=True)
+def _store(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "CONFIG", {
+        "message_store": {
+            "enabled": True,
+            "path": str(tmp_path / "ms.sqlite3"),
+            "max_mb": 1,
+            "labels_ttl_seconds": 60,
+        }
+    })
+    store._reset_for_tests()
+    yield
+    store._reset_for_tests()
+
+
+def _msg(mid, body="hola"):
+    return {"id": mid, "labelIds": ["INBOX", "UNREAD"], "snippet": body}
+
+
+def test_read_through_caches_content_and_labels():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return _msg("a")
+
+    first = store.read_through("a", "full", loader)
+    second = store.read_through("a", "full", loader)
+
+    assert first == second == _msg("a")
+    assert len(calls) == 1
+    stats = store.store_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["entries"] == 1 and stats["size_bytes"] > 0
+
+
+def test_stale_labels_refresh_without_refetching_content(monkeypatch):
+    store.read_through("a", "full", lambda: _msg("a"))
+    monkeypatch.setattr(cfg, "CONFIG", dict(cfg.CONFIG, message_store=dict(cfg.CONFIG["message_store"], labels_ttl_seconds=0)))
+    monkeypatch.setattr(store, "_now", lambda: 1e12)
+
+    def loader():
+        raise AssertionError("no debería volver a bajar el contenido")
+
+    out = store.read_through("a", "full", loader, labels_loader=lambda: ["INBOX"])
+    assert out["labelIds"] == ["INBOX"]
+    assert store.store_stats()["label_refreshes"] == 1
+
+
+def test_failed_load_is_not_stored():
+    assert store.read_through("x", "full", lambda: {}) == {}
+    assert store.store_peek("x", "full") is None
+
+
+def test_size_based_eviction_keeps_under_budget():
+    big = "x" * 200_000
+    for i in range(10):
+        store.store_put(f"m{i}", "full", _msg(f"m{i}", body=big))
+    stats = store.store_stats()
+    assert stats["evictions"] > 0
+    assert stats["size_bytes"] <= 1024 * 1024
+    assert store.store_peek("m9", "full") is not None
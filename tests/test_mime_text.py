@@ -0,0 +1,103 @@
+import base64
+
+from utils import mime_text
+from utils.message_record import NormalizedMessage
+from utils.mime_text import HtmlTextStream, extract_text, strip_html
+
+
+def _b64(s: str) -> str:
+    return base64.urlsafe_b64encode(s.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+HTML = (
+    "<html><head><style>td{color:red}</style><script>var a = '<p>';</script></head>"
+    "<body><h1>Ofertas &amp; envío</h1><p>Hasta 40%&nbsp;de   descuento<br/>Válido hoy</p>"
+    "<table><tr><td>Uno</td><td>Dos</td></tr></table></body></html>"
+)
+EXPECTED = "Ofertas & envío Hasta 40%\xa0de descuento\nVálido hoy\n Uno Dos"
+
+
+def test_strip_html_matches_previous_rules():
+    assert strip_html(HTML) == EXPECTED
+    assert strip_html("a < b y c > d") == "a d"          # "<...>" sigue siendo tag, como antes
+    assert strip_html("<p>x</p>\n\n\n<p>y</p>") == "x\n y"
+    assert strip_html("") == ""
+
+
+def test_stream_is_independent_of_chunk_boundaries():
+    for size in (1, 2, 3, 5, 7, 16, 64):
+        stream = HtmlTextStream()
+        for i in range(0, len(HTML), size):
+            stream.feed(HTML[i:i + size])
+        assert stream.close() == EXPECTED, size
+
+
+def test_budget_stops_early_and_truncates():
+    stream = HtmlTextStream(10)
+    stream.feed(HTML)
+    assert stream.full
+    assert stream.close() == EXPECTED[:10]
+    assert strip_html(HTML, 10) == EXPECTED[:10]
+
+
+def test_ampersand_inside_tag_is_not_held_as_entity():
+    doc = "<p>Hola</p><a href='https://x.com/?a=1&b=2'>ver</a> fin"
+    assert extract_text({"mimeType": "text/html", "body": {"text": doc}}) == "Hola\n ver fin"
+    assert strip_html("a<bAT&T</div>") == "a"
+    assert strip_html("<p>x</p><img src='https://t.x.com/o.gif?u=3&id=9'>") == "x"
+    for size in (1, 3, 7, 16):
+        stream = HtmlTextStream()
+        for i in range(0, len(doc), size):
+            stream.feed(doc[i:i + size])
+        assert stream.close() == "Hola\n ver fin", size
+
+
+def test_ampersand_in_href_across_window_and_block_boundaries():
+    tail = "<a href='https://x.com/?a=1&b=2&c=3'>ver</a> &amp; fin<img src=p.gif?u=3&v=4>"
+    # strip_html corta en ventanas de 8192 caracteres; el base64, en bloques de 6144 bytes
+    for boundary in (mime_text._HTML_WINDOW, mime_text._B64_BLOCK // 4 * 3):
+        for k in range(boundary - 60, boundary + 4):
+            doc = "<p>" + "a" * k + "</p>" + tail
+            expected = "a" * k + "\n ver & fin"
+            assert strip_html(doc) == expected, k
+            assert extract_text({"mimeType": "text/html", "body": {"data": _b64(doc)}}) == expected, k
+
+
+def test_extract_prefers_plain_and_decodes_in_blocks(monkeypatch):
+    monkeypatch.setattr(mime_text, "_B64_BLOCK", 8)   # fuerza varios bloques y UTF-8 partido
+    payload = {
+        "mimeType": "multipart/alternative",
+        "parts": [
+            {"mimeType": "text/plain", "body": {"data": _b64("  Señor, ñandú y acción  ")}},
+            {"mimeType": "text/html", "body": {"data": _b64(HTML)}},
+        ],
+    }
+    assert extract_text(payload) == "Señor, ñandú y acción"
+    assert extract_text(payload, 5) == "Señor"
+    del payload["parts"][0]
+    assert extract_text(payload) == EXPECTED
+    assert extract_text(payload, 7) == "Ofertas"
+
+
+def test_plain_with_tags_and_bad_base64_fall_back_like_before():
+    assert extract_text({"mimeType": "text/plain", "body": {"text": "<b>hola</b> mundo"}}) == "hola mundo"
+    # no es base64: se toma como texto
+    assert extract_text({"mimeType": "text/plain", "body": {"data": "hola mundo!"}}) == "hola mundo!"
+    assert extract_text({}) == "" and extract_text(None) == ""
+
+
+def test_record_reuses_body_within_budget(monkeypatch):
+    calls = []
+    real = extract_text
+
+    def _spy(payload, max_chars=None):
+        calls.append(max_chars)
+        return real(payload, max_chars)
+
+    monkeypatch.setattr("utils.message_record.extract_text", _spy)
+    rec = NormalizedMessage({"id": "m", "payload": {"mimeType": "text/html", "body": {"data": _b64(HTML)}}})
+    assert rec.body_head(7) == "Ofertas"
+    assert rec.body_head(3) == "Ofe"
+    assert rec.body_text == EXPECTED            # presupuesto mayor: se vuelve a extraer
+    assert rec.body_head(2000) == EXPECTED      # cuerpo ya completo: no
+    assert len(calls) == 2
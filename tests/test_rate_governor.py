@@ -0,0 +1,129 @@
+import pytest
+
+import utils.rate_governor as gov
+from utils.retry import _extract_retry_after_s, consume_gmail_retry_stats, run_with_retry_gmail
+
+KEY = "test@governor"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(gov, "_now", lambda: now[0])
+    monkeypatch.setenv("USE_FAKE_GMAIL", "0")
+    gov.reset(KEY)
+    consume_gmail_retry_stats()
+    yield now
+    gov.reset(KEY)
+
+
+def _sleeper(now, log):
+    def sleep(s):
+        log.append(s)
+        now[0] += s
+    return sleep
+
+
+class _Http429(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429")
+        self.status = 429
+        self.reason = "rateLimitExceeded"
+        self.retry_after = retry_after
+
+
+def test_bucket_gates_by_quota_units(clock):
+    gov.configure(KEY, units_per_s=10, max_pause_s=60)
+    slept = []
+    assert gov.acquire(KEY, 5, _sleeper(clock, slept)) == 0.0
+    assert gov.acquire(KEY, 5, _sleeper(clock, slept)) == 0.0
+    # bucket vacío: 5 unidades a 10/s → 0.5 s
+    assert gov.acquire(KEY, 5, _sleeper(clock, slept)) == pytest.approx(0.5)
+    # 2 unidades (history.list) pagan menos que un get
+    assert gov.acquire(KEY, 2, _sleeper(clock, slept)) == pytest.approx(0.2)
+
+
+def test_429_with_retry_after_pauses_every_caller(clock):
+    gov.configure(KEY, units_per_s=250, max_pause_s=60)
+    slept = []
+    attempts = {"n": 0}
+
+    def call():
+        attempts["n"] += 1
+        if attempts["n"] == 1:
+            raise _Http429(retry_after="3")
+        return "ok"
+
+    res, meta = run_with_retry_gmail(call, max_tries=3, base_ms=100, jitter_ms=0,
+                                     sleep_fn=_sleeper(clock, slept), quota_key=KEY, units=5)
+    assert res == "ok"
+    assert meta["retries_by_code"] == {"429": 1}
+    # backoff propio (0.1 s) + resto de la pausa de Retry-After
+    assert sum(slept) == pytest.approx(3.0, abs=0.05)
+    assert meta["throttled_ms_total"] >= 2800
+    assert consume_gmail_retry_stats()["throttled_ms_total"] == meta["throttled_ms_total"]
+    assert gov.governor_metrics()[KEY]["pauses"] == 1
+
+
+def test_pause_reaches_callers_already_waiting(clock):
+    gov.configure(KEY, units_per_s=10, max_pause_s=60)
+    gov.acquire(KEY, 10, _sleeper(clock, []))         # vacía el bucket
+    slept = []
+
+    def sleep(s):
+        slept.append(s)
+        clock[0] += s
+        if len(slept) == 1:
+            gov.pause(KEY, 5)                          # otro thread recibe 429 mientras esperamos
+
+    waited = gov.acquire(KEY, 5, sleep)
+    assert waited == pytest.approx(0.5 + 5.0)
+
+
+def test_pause_is_capped_and_try_acquire_respects_it(clock):
+    gov.configure(KEY, units_per_s=250, max_pause_s=10)
+    assert gov.pause(KEY, 3600) == 10
+    assert gov.try_acquire(KEY, 5) is False
+    clock[0] += 11
+    assert gov.try_acquire(KEY, 5) is True
+
+
+def test_retry_after_parsing():
+    class Resp(dict):
+        status = 429
+
+    class HttpError(Exception):
+        def __init__(self, hdrs):
+            super().__init__("x")
+            self.resp = Resp(hdrs)
+
+    assert _extract_retry_after_s(HttpError({"retry-after": "7"})) == 7.0
+    assert _extract_retry_after_s(HttpError({})) is None
+    assert _extract_retry_after_s(_Http429(retry_after="Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+
+
+def test_wait_that_overruns_deadline_gives_back_units(clock):
+    from utils import deadline
+    from utils.retry import DeadlineExceeded
+
+    gov.configure(KEY, units_per_s=10, max_pause_s=60)
+    gov.acquire(KEY, 10, _sleeper(clock, []))         # vacía el bucket
+    slept = []
+    deadline.start_deadline(1.0)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            gov.acquire(KEY, 50, _sleeper(clock, slept))   # 5 s de bucket > 1 s de deadline
+        assert slept == []
+        assert gov.governor_metrics()[KEY]["tokens"] == pytest.approx(0.0)
+
+        def sleep(s):
+            slept.append(s)
+            clock[0] += s
+            gov.pause(KEY, 5)                          # pausa nueva mientras esperábamos
+
+        with pytest.raises(DeadlineExceeded):
+            gov.acquire(KEY, 5, sleep)
+        assert slept == [pytest.approx(0.5)]
+        assert deadline.consume_deadline_report()["cut"] == {"gmail_call": 2}
+    finally:
+        deadline.start_deadline(None)
@@ -0,0 +1,124 @@
+import pytest
+
+import utils.cache as cache
+import utils.response_cache as rc
+
+
+@pytest.fixture
+def version(monkeypatch):
+    current = {"v": "100"}
+    monkeypatch.setattr(rc, "_mailbox_version", lambda max_age_s: current["v"])
+    monkeypatch.setattr(rc.config, "get_response_cache_settings",
+                        lambda: {"enabled": True, "ttl_seconds": 300, "version_ttl_seconds": 5})
+    cache.cache_clear("comando")
+    yield current
+    cache.cache_clear("comando")
+
+
+def _counter():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return f"resumen #{len(calls)}"
+    return calls, compute
+
+
+def test_repeat_query_is_served_from_cache(version):
+    calls, compute = _counter()
+    first, meta1 = rc.cached_response("1", "resumen_hoy", {}, compute)
+    second, meta2 = rc.cached_response("1", "resumen_hoy", {}, compute)
+
+    assert first == second == "resumen #1" and len(calls) == 1
+    assert meta1 == {"cached": False, "age_s": 0.0}
+    assert meta2["cached"] is True and meta2["age_s"] >= 0
+
+
+def test_mailbox_change_and_key_parts_invalidate(version):
+    calls, compute = _counter()
+    rc.cached_response("1", "resumen_hoy", {}, compute)
+    rc.cached_response("2", "resumen_hoy", {}, compute)             # otro usuario
+    rc.cached_response("1", "resumen_ayer", {}, compute)            # otra acción
+    rc.cached_response("1", "resumen_hoy", {"max": 5}, compute)     # otros filtros
+    version["v"] = "101"                                            # buzón cambió
+    rc.cached_response("1", "resumen_hoy", {}, compute)
+    assert len(calls) == 5
+
+
+def test_filters_are_normalized(version):
+    calls, compute = _counter()
+    rc.cached_response("1", "buscar_correo", {"query": "Reunión  Lunes", "max": None}, compute)
+    rc.cached_response("1", "buscar_correo", {"query": "reunion lunes"}, compute)
+    assert len(calls) == 1
+
+
+def test_free_text_search_keys_on_command(version):
+    calls, compute = _counter()
+    rc.cached_response("1", "buscar_correo", {}, compute, comando="busca factura")
+    rc.cached_response("1", "buscar_correo", {}, compute, comando="busca contrato")
+    assert len(calls) == 2
+
+
+def test_no_version_or_error_is_not_cached(version):
+    calls, compute = _counter()
+    version["v"] = None
+    rc.cached_response("1", "resumen_hoy", {}, compute)
+    rc.cached_response("1", "resumen_hoy", {}, compute)
+    assert len(calls) == 2
+
+    version["v"] = "200"
+    with pytest.raises(RuntimeError):
+        rc.cached_response("1", "resumen_hoy", {}, lambda: (_ for _ in ()).throw(RuntimeError("x")))
+    assert rc.cached_response("1", "resumen_hoy", {}, compute)[1]["cached"] is False
+
+
+def test_partial_result_is_not_cached(version):
+    from utils.degradation import consume_degradation_report, record_skipped
+
+    consume_degradation_report()
+    calls = []
+
+    def partial():
+        calls.append(1)
+        record_skipped("m1", "breaker_open", 10)
+        return "parcial"
+
+    rc.cached_response("1", "resumen_hoy", {}, partial)
+    consume_degradation_report()
+    rc.cached_response("1", "resumen_hoy", {}, lambda: calls.append(1) or "completo")
+    assert len(calls) == 2
+
+
+def test_follower_of_partial_leader_gets_partial_flag(version):
+    import threading
+
+    from utils.degradation import consume_degradation_report, record_skipped
+
+    started, release = threading.Event(), threading.Event()
+    out = {}
+
+    def partial():
+        started.set()
+        release.wait(2.0)
+        record_skipped("m1", "breaker_open", 10)
+        return "parcial"
+
+    def leader():
+        consume_degradation_report()
+        out["leader"] = rc.cached_response("1", "resumen_hoy", {}, partial)
+
+    def follower():
+        out["follower"] = rc.cached_response("1", "resumen_hoy", {}, lambda: "no debería correr")
+
+    t1 = threading.Thread(target=leader)
+    t1.start()
+    started.wait(2.0)
+    t2 = threading.Thread(target=follower)
+    t2.start()
+    t2.join(0.1)                        # el follower queda esperando el single-flight
+    release.set()
+    t1.join()
+    t2.join()
+
+    assert out["follower"] == ("parcial", {"cached": False, "age_s": 0.0, "partial": True})
+    assert out["leader"][1]["partial"] is True
@@ -0,0 +1,68 @@
+import pytest
+
+import utils.cache as cache
+import utils.circuit_breaker as cb
+from utils import shared_state
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    settings = {"backend": "sqlite", "sqlite_path": str(tmp_path / "shared.sqlite3")}
+    monkeypatch.setattr(shared_state, "get_cache_settings", lambda: settings)
+    shared_state._reset_for_tests()
+    yield settings
+    shared_state._reset_for_tests()
+    cache.cache_configure(max_entries=cache.DEFAULT_MAX_ENTRIES, max_bytes=cache.DEFAULT_MAX_BYTES)
+
+
+def test_sqlite_cache_is_shared_between_workers(shared):
+    # Dos instancias = dos workers apuntando al mismo archivo
+    worker_a = cache._SQLiteCache(1000, 1024 * 1024)
+    worker_b = cache._SQLiteCache(1000, 1024 * 1024)
+    key = cache.make_cache_key("msg_get", id="m1", fields="id,labelIds")
+
+    worker_a.set(key, {"id": "m1", "labelIds": ["INBOX"]}, 60)
+    assert worker_b.get(key) == {"id": "m1", "labelIds": ["INBOX"]}
+    assert worker_b.get_or_load(key, lambda: pytest.fail("no debería cargar"), 60) == {"id": "m1", "labelIds": ["INBOX"]}
+
+    assert worker_b.clear("msg_get") == 1
+    assert worker_a.get(key) is None
+
+
+def test_sqlite_cache_evicts_over_budget(shared):
+    c = cache._SQLiteCache(max_entries=10, max_bytes=1024 * 1024)
+    for i in range(c._EVICT_EVERY):
+        c.set(("k", i), {"i": i}, 60)
+    stats = c.stats()
+    assert stats["entries"] <= 10 and stats["evicted_entries"] > 0
+    assert c.get(("k", c._EVICT_EVERY - 1)) == {"i": c._EVICT_EVERY - 1}
+
+
+def test_breaker_opened_by_one_worker_blocks_the_others(shared, monkeypatch):
+    key = "gmail:messages.get:test"
+    cb.configure(key, threshold=2, cooldown_s=30)
+    cb.after_failure(key, 429)
+    cb.after_failure(key, 429)
+
+    cb._STATE.clear()  # otro worker: sin estado en memoria
+    allow, retry_after = cb.before_call(key)
+    assert not allow and retry_after > 0
+    assert cb.status(key)["shared"] is True
+
+    # vencido el cooldown, la prueba half-open de cualquier worker cierra para todos
+    real_now = cb._now
+    monkeypatch.setattr(cb, "_now", lambda: real_now() + 31)
+    assert cb.before_call(key)[0] is True
+    cb._STATE.clear()
+    cb.after_success(key)
+    assert cb.before_call(key) == (True, 0.0)
+
+
+def test_memory_backend_keeps_breaker_local(monkeypatch):
+    monkeypatch.setattr(shared_state, "get_cache_settings", lambda: {"backend": "memory"})
+    key = "gmail:messages.get:local"
+    cb.configure(key, threshold=1, cooldown_s=30)
+    cb.after_failure(key, 503)
+    assert cb.before_call(key)[0] is False
+    assert key in cb._STATE
+    cb.reset(key)
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from core.llm import llm_client
+from utils import deadline
+from utils import summarizer as sm
+from utils.message_record import NormalizedMessage
+
+
+def _rec(i: int) -> NormalizedMessage:
+    return NormalizedMessage({
+        "id": f"m{i}",
+        "internalDate": str(1755864900000 + i),
+        "payload": {
+            "headers": [{"name": "From", "value": f"s{i}@home.cl"}, {"name": "Subject", "value": f"Asunto {i}"}],
+            "mimeType": "text/plain",
+            "body": {"text": f"Reunión número {i} confirmada para mañana a las diez en la sala grande."},
+        },
+    })
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    """LLM local que tarda 0.2 s por generación y anota cuántas corren a la vez."""
+    state = {"active": 0, "peak": 0, "calls": 0}
+    lock = threading.Lock()
+
+    def _fake(texto, max_chars=220):
+        with lock:
+            state["active"] += 1
+            state["calls"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.2)
+        with lock:
+            state["active"] -= 1
+        return "Se confirma la reunión " + texto.split()[2] + " con el equipo"
+
+    monkeypatch.setattr(sm, "LLM_MODE", "local")
+    monkeypatch.setattr(sm, "parafrasear_una_oracion", _fake)
+    return state
+
+
+def test_items_run_in_parallel_and_keep_inbox_order(slow_llm):
+    items = [_rec(i) for i in range(6)]
+    t0 = time.perf_counter()
+    out = sm._format_list(items, parallelism=6)
+    elapsed = time.perf_counter() - t0
+
+    lines = out.split("\n-----\n")
+    assert [line.split(" | ")[0] for line in lines] == [f"De: s{i}@home.cl" for i in range(6)]
+    assert all("Se confirma la reunión" in line for line in lines)
+    assert slow_llm["peak"] == 6
+    assert elapsed < 0.2 * 6 / 2          # ~ el más lento, no la suma
+
+
+def test_parallelism_limit_is_per_request(slow_llm):
+    sm._format_list([_rec(i) for i in range(4)], parallelism=2)
+    assert slow_llm["peak"] == 2
+    assert sm._format_list([_rec(0)], parallelism=1) == sm._format_list([_rec(0)])
+    assert sm._format_list([]) == "No hay correos para la fecha indicada."
+
+
+class _FakeLlama:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def create_completion(self, prompt, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self._lock:
+            self.active -= 1
+        return {"choices": [{"text": "ok"}]}
+
+
+@pytest.fixture
+def fake_llama(monkeypatch):
+    llm = _FakeLlama()
+    monkeypatch.setattr(llm_client, "_get_llm", lambda: llm)
+    monkeypatch.setattr(llm_client, "_SLOTS", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(llm_client, "MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(llm_client, "_admitted", 0)
+    monkeypatch.setattr(llm_client, "cb_before", lambda key: (True, None))
+    monkeypatch.setattr(llm_client, "cb_ok", lambda key: None)
+    return llm
+
+
+def _run_parallel(n):
+    results = [None] * n
+
+    def _one(i):
+        results[i] = llm_client._complete("p", 8, 0.0)
+
+    threads = [threading.Thread(target=_one, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_llm_queue_serializes_generations(fake_llama, monkeypatch):
+    monkeypatch.setattr(llm_client, "MAX_QUEUE", 8)
+    assert _run_parallel(4) == ["ok"] * 4
+    assert fake_llama.peak == 1 and llm_client._admitted == 0
+
+
+def test_each_concurrent_generation_gets_its_own_instance(fake_llama, monkeypatch):
+    extras = []
+
+    def _load():
+        extras.append(_FakeLlama())
+        return extras[-1]
+
+    monkeypatch.setattr(llm_client, "_load_model", _load)
+    monkeypatch.setattr(llm_client, "_EXTRA_FREE", [])
+    monkeypatch.setattr(llm_client, "_SLOTS", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(llm_client, "MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(llm_client, "MAX_QUEUE", 8)
+    assert _run_parallel(6) == ["ok"] * 6
+    # una Llama nunca genera dos veces a la vez; a lo más una instancia extra
+    assert len(extras) == 1
+    assert fake_llama.peak == 1 and extras[0].peak == 1
+    assert llm_client._EXTRA_FREE == extras and llm_client._main_busy is False
+
+
+def test_full_llm_queue_falls_back(fake_llama, monkeypatch):
+    monkeypatch.setattr(llm_client, "MAX_QUEUE", 0)
+    results = _run_parallel(4)
+    assert "ok" in results and None in results      # los que no caben: fallback extractivo
+    assert llm_client._admitted == 0
+
+
+def test_llm_queue_wait_respects_deadline(fake_llama, monkeypatch):
+    monkeypatch.setattr(llm_client, "MIN_REMAINING_S", 0.0)
+    llm_client._SLOTS.acquire()                     # otra generación ocupa el turno
+    try:
+        deadline.start_deadline(0.05)
+        assert llm_client._complete("p", 8, 0.0) is None
+        assert deadline.consume_deadline_report()["cut"] == {"llm": 1}
+    finally:
+        llm_client._SLOTS.release()
+    assert llm_client._admitted == 0
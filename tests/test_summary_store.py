@@ -0,0 +1,100 @@
+import pytest
+
+import utils.config as cfg
+import utils.summary_store as store
+from utils import summarizer as sm
+from utils.message_record import NormalizedMessage
+
+
+@pytest.fixture(autouse=True)
+def _store(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "CONFIG", {
+        "summary_store": {"enabled": True, "path": str(tmp_path / "ss.sqlite3"), "max_mb": 1}
+    })
+    store._reset_for_tests()
+    yield
+    store._reset_for_tests()
+
+
+def test_key_changes_with_text_model_prompt_and_budget():
+    base = store.summary_key("m1", "texto", "q.gguf", "v1", 200)
+    assert base == store.summary_key("m1", "texto", "q.gguf", "v1", 200)
+    assert len({
+        base,
+        store.summary_key("m2", "texto", "q.gguf", "v1", 200),
+        store.summary_key("m1", "texto 2", "q.gguf", "v1", 200),
+        store.summary_key("m1", "texto", "otro.gguf", "v1", 200),
+        store.summary_key("m1", "texto", "q.gguf", "v2", 200),
+        store.summary_key("m1", "texto", "q.gguf", "v1", 180),
+    }) == 6
+
+
+def test_get_put_survives_restart_and_counts():
+    key = store.summary_key("m1", "texto", "q.gguf", "v1", 200)
+    assert store.summary_get(key) is None
+    store.summary_put(key, "m1", "Resumen corto.")
+    store._reset_for_tests()                      # "reinicio": conexión y métricas nuevas
+    assert store.summary_get(key) == "Resumen corto."
+    stats = store.summary_store_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 0 and stats["entries"] == 1
+
+
+def test_evicts_least_recently_used_over_max_mb(monkeypatch):
+    clock = iter(range(1, 10_000))
+    monkeypatch.setattr(store, "_now", lambda: float(next(clock)) * 100)
+    big = "x" * 300_000
+    for i in range(5):
+        store.summary_put(f"k{i}", f"m{i}", big)
+    stats = store.summary_store_stats()
+    assert stats["evictions"] >= 2 and stats["size_bytes"] <= 1024 * 1024
+    assert store.summary_get("k0") is None and store.summary_get("k4") == big
+
+
+def test_disabled_store_is_passthrough(monkeypatch):
+    monkeypatch.setattr(cfg, "CONFIG", {"summary_store": {"enabled": False}})
+    store.summary_put("k", "m", "r")
+    assert store.summary_get("k") is None
+    assert store.summary_store_stats()["enabled"] is False
+
+
+def _rec(body: str) -> NormalizedMessage:
+    return NormalizedMessage({
+        "id": "m1",
+        "payload": {
+            "headers": [{"name": "From", "value": "ceo@home.cl"}, {"name": "Subject", "value": "Cierre"}],
+            "mimeType": "text/plain",
+            "body": {"text": body},
+        },
+    })
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+
+    def _fake(texto, max_chars=220):
+        calls.append(texto)
+        return None if "falla" in texto else "El directorio aprobó el presupuesto anual"
+
+    monkeypatch.setattr(sm, "LLM_MODE", "local")
+    monkeypatch.setattr(sm, "parafrasear_una_oracion", _fake)
+    return calls
+
+
+def test_summarizer_reuses_llm_summary_across_requests(llm):
+    body = "Les cuento que ayer se votó y quedó confirmado el presupuesto para todo el próximo año."
+    first = sm._format_list([_rec(body)])
+    second = sm._format_list([_rec(body)])
+    assert first == second and "aprobó el presupuesto" in first
+    assert len(llm) == 1
+    # otro texto para el mismo id: resumen nuevo
+    sm._format_list([_rec(body + " Saludos.")])
+    assert len(llm) == 2
+
+
+def test_fallback_summary_is_not_stored(llm):
+    body = "Este texto falla en el modelo y termina en el resumen extractivo de siempre."
+    sm._format_list([_rec(body)])
+    sm._format_list([_rec(body)])
+    assert len(llm) == 2
+    assert store.summary_store_stats()["puts"] == 0
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Micro-benchmark de utils/cache.py: throughput get/set según threads y shards.
+
+Cada thread hace OPS operaciones (90% cache_get, 10% cache_set) sobre un working
+set de llaves estilo msg_get, como los fetch threads de varios requests a la vez.
+
+    python tools/benchmark_cache.py                # threads 1,2,4,8,16 × shards 1,16
+    BENCH_OPS=50000 BENCH_SHARDS=1,4,16 python tools/benchmark_cache.py
+"""
+from __future__ import annotations
+import os
+import random
+import threading
+import time
+
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import cache
+
+OPS = int(os.getenv("BENCH_OPS", "20000"))
+KEYS = int(os.getenv("BENCH_KEYS", "5000"))
+THREADS = [int(x) for x in os.getenv("BENCH_THREADS", "1,2,4,8,16").split(",")]
+SHARDS = [int(x) for x in os.getenv("BENCH_SHARDS", "1,16").split(",")]
+
+
+def _worker(keys, barrier: threading.Barrier, seed: int) -> None:
+    rnd = random.Random(seed)
+    value = {"id": "x", "labelIds": ["INBOX"], "snippet": "hola " * 20}
+    barrier.wait()
+    for _ in range(OPS):
+        k = keys[rnd.randrange(len(keys))]
+        if rnd.random() < 0.1:
+            cache.cache_set(k, value, 60)
+        elif cache.cache_get(k) is None:
+            cache.cache_set(k, value, 60)
+
+
+def run(threads: int, shards: int) -> float:
+    """ops/s agregados con `threads` threads y `shards` shards."""
+    cache.cache_configure(max_entries=KEYS * 2, max_bytes=cache.DEFAULT_MAX_BYTES, shards=shards)
+    keys = [cache.make_cache_key("msg_get", id=f"m{i}", fields="id,labelIds,snippet") for i in range(KEYS)]
+    barrier = threading.Barrier(threads + 1)
+    ts = [threading.Thread(target=_worker, args=(keys, barrier, i)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in ts:
+        t.join()
+    return threads * OPS / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python={sys.version.split()[0]} gil={'on' if gil else 'off'} ops_per_thread={OPS} keys={KEYS}")
+    print("threads\t" + "\t".join(f"shards={s} ops/s" for s in SHARDS))
+    for n in THREADS:
+        row = [run(n, s) for s in SHARDS]
+        print(f"{n}\t" + "\t".join(f"{r:,.0f}" for r in row))
+    cache.cache_configure(max_entries=cache.DEFAULT_MAX_ENTRIES, max_bytes=cache.DEFAULT_MAX_BYTES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Micro-benchmark de utils/mime_text.py contra la extracción anterior (walk recursivo + 6 regex).
+
+Arma un newsletter HTML grande (tablas anidadas, estilos inline, script/style,
+entidades) en base64-url dentro de un multipart/alternative sin text/plain, que
+es el caso que dominaba `_format_list`, y mide ms por mensaje:
+
+  - legacy: _walk_payload + _strip_html de antes (todo el cuerpo)
+  - stream: extract_text sin tope (mismo resultado)
+  - stream@N: extract_text(max_chars=N) — lo que pide el summarizer
+
+    python tools/benchmark_mime_text.py                    # 50, 200 y 800 KB
+    BENCH_KB=1000 BENCH_REPEAT=20 BENCH_BUDGETS=1200,20000 python tools/benchmark_mime_text.py
+"""
+from __future__ import annotations
+import base64
+import html
+import os
+import re
+import time
+
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils.mime_text import extract_text
+
+SIZES_KB = [int(x) for x in os.getenv("BENCH_KB", "50,200,800").split(",")]
+REPEAT = int(os.getenv("BENCH_REPEAT", "10"))
+BUDGETS = [int(x) for x in os.getenv("BENCH_BUDGETS", "1200,20000").split(",")]
+
+
+# ---------------- implementación anterior (referencia) ----------------
+
+def _legacy_b64(data) -> bytes:
+    try:
+        s = data.encode("ascii")
+        s += b"=" * ((4 - len(s) % 4) % 4)
+        return base64.urlsafe_b64decode(s)
+    except Exception:
+        return data.encode("utf-8", errors="ignore")
+
+
+def _legacy_strip_html(s: str) -> str:
+    s = re.sub(r"(?is)<(script|style)[^>]*>.*?</\1\s*>", " ", s)
+    s = re.sub(r"(?is)<br\s*/?>", "\n", s)
+    s = re.sub(r"(?is)</p\s*>", "\n", s)
+    s = re.sub(r"(?is)<[^>]+>", " ", s)
+    s = html.unescape(s)
+    s = re.sub(r"[ \t]+", " ", s)
+    s = re.sub(r"\n{2,}", "\n", s)
+    return s.strip()
+
+
+def _legacy_walk(part):
+    plain_acc, html_acc = "", ""
+    mime = (part.get("mimeType") or "").lower()
+    body = part.get("body") or {}
+    if "data" in body:
+        text = _legacy_b64(body["data"]).decode(errors="ignore")
+        if mime.startswith("text/html"):
+            html_acc += text
+        else:
+            plain_acc += text
+    for sp in (part.get("parts") or []):
+        p_plain, p_html = _legacy_walk(sp)
+        plain_acc += p_plain
+        html_acc += p_html
+    return plain_acc, html_acc
+
+
+def legacy_extract(payload) -> str:
+    plain, html_raw = _legacy_walk(payload)
+    if plain.strip():
+        return plain.strip()
+    return _legacy_strip_html(html_raw)
+
+
+# ---------------- datos ----------------
+
+def newsletter(kb: int) -> dict:
+    head = ("<html><head><style>td{font-family:Arial}.btn{color:#fff}</style>"
+            "<script>window.dataLayer=[{'<p>':1}];</script></head><body>")
+    block = ("<table width='600' cellpadding='0' style='border:0;margin:0 auto'><tr>"
+             "<td class='hero' style='padding:12px 24px;background:#f4f4f4'>"
+             "<img src='https://cdn.example.com/x.png' alt='Oferta' width='560'/>"
+             "<h2 style='font-size:22px'>¡Ofertas de la semana &amp; envío gratis!</h2>"
+             "<p style='line-height:1.4'>Hasta 40%&nbsp;de descuento en tecnología, hogar y más."
+             "<br/>Válido hasta el domingo.</p>"
+             "<a class='btn' href='https://t.example.com/c?u=1&amp;id=2'>Comprar ahora</a>"
+             "</td></tr></table>\n")
+    body = head
+    while len(body) < kb * 1024:
+        body += block
+    body += "</body></html>"
+    data = base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii").rstrip("=")
+    return {"mimeType": "multipart/alternative",
+            "parts": [{"mimeType": "text/html", "body": {"data": data}}]}
+
+
+def bench(fn, payload) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(payload)
+    return (time.perf_counter() - t0) * 1000.0 / REPEAT
+
+
+def main() -> None:
+    print(f"python={sys.version.split()[0]} repeat={REPEAT}")
+    cols = ["legacy", "stream"] + [f"stream@{b}" for b in BUDGETS]
+    print("kb\t" + "\t".join(f"{c} ms" for c in cols))
+    for kb in SIZES_KB:
+        payload = newsletter(kb)
+        assert extract_text(payload) == legacy_extract(payload)
+        row = [bench(legacy_extract, payload), bench(extract_text, payload)]
+        row += [bench(lambda p, b=b: extract_text(p, b), payload) for b in BUDGETS]
+        print(f"{kb}\t" + "\t".join(f"{r:.2f}" for r in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Vendoriza el discovery document de Gmail v1 en core/gmail/discovery/gmail.v1.json.
+
+Con el archivo presente, core.gmail.auth construye el cliente con build_from_document
+(sin red al arrancar y con una versión fija de la API revisada en el repo).
+
+Uso:
+  python tools/update_gmail_discovery.py            # copia estática de google-api-python-client
+  python tools/update_gmail_discovery.py --online   # descarga la versión vigente
+"""
+from __future__ import annotations
+import json
+import pathlib
+import sys
+import urllib.request
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from core.gmail.auth import DISCOVERY_PATH
+
+DISCOVERY_URL = "https://gmail.googleapis.com/$discovery/rest?version=v1"
+
+
+def _static_doc() -> str:
+    from googleapiclient.discovery_cache import get_static_doc
+    doc = get_static_doc("gmail", "v1")
+    if not doc:
+        raise SystemExit("google-api-python-client no trae discovery estático (requiere >= 2.0); usa --online")
+    return doc
+
+
+def _online_doc() -> str:
+    with urllib.request.urlopen(DISCOVERY_URL, timeout=30) as resp:
+        return resp.read().decode("utf-8")
+
+
+def main() -> None:
+    raw = _online_doc() if "--online" in sys.argv[1:] else _static_doc()
+    doc = json.loads(raw)  # valida antes de escribir
+    DISCOVERY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    DISCOVERY_PATH.write_text(json.dumps(doc, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"✅ {DISCOVERY_PATH} revision={doc.get('revision')} bytes={DISCOVERY_PATH.stat().st_size}")
+
+
+if __name__ == "__main__":
+    main()
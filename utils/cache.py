@@ -1,12 +1,44 @@
 # utils/cache.py
+"""
+Cache TTL en memoria, acotada:
+  - LRU con tope de entradas (cache.max_entries) y de bytes aproximados (cache.max_mb)
+  - heap de expiración: las entradas vencidas se liberan en cada escritura, aunque
+    nadie vuelva a leer esa llave
+  - contadores de hits/misses/evicciones (cache_stats)
+  - lock striping: N shards (cache.shards) con lock propio, elegidos por hash de la
+    llave; los fetch threads de distintos requests ya no se serializan en un lock
+  - backend enchufable (cache.backend): "memory" (default, por proceso) o "sqlite"
+    (utils/shared_state.py: un archivo compartido por todos los workers del host;
+    los valores se guardan como JSON)
+  - cache_get_or_load: single-flight (una sola carga por llave, el resto espera) y
+    stale-while-revalidate (entrada vencida pero dentro de stale_ttl se sirve al
+    instante y se refresca en segundo plano)
+
+API estable: make_cache_key, cache_get, cache_set, cache_clear.
+"""
 from __future__ import annotations
+import contextvars
+import heapq
+import itertools
+import json
+import sqlite3
+import sys
 import time
 import threading
-from typing import Any, Dict, Tuple, Hashable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple, Hashable, Optional
+
+from utils.sqlite_wal import TOUCH_EVERY_S
 
-# Estructura interna: key -> (expires_at_epoch_sec, value)
-_STORE: Dict[Hashable, Tuple[float, Any]] = {}
-_LOCK = threading.RLock()
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SHARDS = 16
+# Un shard con muy pocas entradas desvirtúa el LRU: cada shard conserva al menos esto
+_MIN_ENTRIES_PER_SHARD = 256
+_SUM_STATS = ("hits", "misses", "sets", "expired", "evicted_entries", "evicted_bytes",
+              "stale_hits", "loads", "load_waits", "refreshes", "entries", "bytes",
+              "max_entries", "max_bytes")
 
 def _now() -> float:
     return time.time()
@@ -19,47 +51,548 @@ def make_cache_key(prefix: str, **parts: Any) -> Hashable:
     items = tuple(sorted(parts.items()))
     return (prefix, items)
 
-def cache_get(key: Hashable) -> Any | None:
-    with _LOCK:
-        entry = _STORE.get(key)
-        if not entry:
-            return None
-        exp, val = entry
-        if exp < _now():
+def _approx_size(value: Any, _depth: int = 0) -> int:
+    """Tamaño aproximado en bytes (recorre dict/list/tuple hasta 6 niveles)."""
+    size = sys.getsizeof(value)
+    if _depth >= 6:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _approx_size(k, _depth + 1) + _approx_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += _approx_size(v, _depth + 1)
+    return size
+
+
+class _SingleFlightMixin:
+    """
+    get_or_load compartido por los backends: single-flight por llave y
+    stale-while-revalidate sobre `_lookup` / `set` de cada uno. Requiere `_lock`,
+    `_stats` (con hits/misses/stale_hits/refreshes/loads/load_waits) e `_inflight`.
+    """
+
+    _lock: Any
+    _stats: Dict[str, int]
+    _inflight: Dict[Hashable, "_Flight"]
+
+    def _single_flight(self, key: Hashable, lookup: Callable[[], Tuple[str, Any]],
+                       loader: Callable[[], Any], ttl: float, stale_ttl: float) -> Any:
+        """`lookup()` corre con `_lock` tomado y devuelve ("fresh"|"stale"|"miss", valor)."""
+        with self._lock:
+            state, value = lookup()
+            if state == "fresh":
+                self._stats["hits"] += 1
+                return value
+            if state == "stale":
+                self._stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    flight = self._inflight[key] = _Flight()
+                    self._stats["refreshes"] += 1
+                    # contexto vacío: el refresco no es parte del request que lo gatilló
+                    # (sus retries/omisiones no deben contarse en ese request)
+                    _refresh_pool().submit(contextvars.Context().run,
+                                           self._load, key, loader, ttl, stale_ttl, flight)
+                return value
+            self._stats["misses"] += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._stats["load_waits"] += 1
+        if leader:
+            return self._load(key, loader, ttl, stale_ttl, flight)
+        return flight.wait()
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: float, flight: "_Flight") -> Any:
+        try:
+            value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+            # Vacío/None = fallo o degradado: se entrega, pero no se cachea
+            if ttl > 0 and value is not None and value != {} and value != [] and value != "":
+                self.set(key, value, ttl, stale_ttl)
+            return value
+        finally:
+            with self._lock:
+                self._stats["loads"] += 1
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.done.set()
+
+
+class _LRUCache(_SingleFlightMixin):
+    """LRU + TTL con presupuesto de entradas/bytes. Thread-safe (un lock por instancia)."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        # key -> (expires_at, value, size_bytes, fresh_until); orden = LRU → MRU
+        # expires_at = fresh_until + stale_ttl: entre ambos la entrada está "stale"
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int, float]]" = OrderedDict()
+        # (expires_at, seq, key): puede tener restos de llaves reescritas/borradas
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats: Dict[str, int] = {
+            "hits": 0, "misses": 0, "sets": 0,
+            "expired": 0, "evicted_entries": 0, "evicted_bytes": 0,
+            "stale_hits": 0, "loads": 0, "load_waits": 0, "refreshes": 0,
+        }
+        self._inflight: Dict[Hashable, "_Flight"] = {}
+
+    # ---- internos (llamar con lock tomado) ----
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _purge_expired(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] < now:
+            exp, _, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            # sólo si el heap apunta a la versión vigente de la llave
+            if entry is not None and entry[0] == exp:
+                self._remove(key)
+                self._stats["expired"] += 1
+        # compacta restos de reescrituras para que el heap no crezca sin límite
+        if len(heap) > 2 * len(self._data) + 64:
+            self._heap = [(e[0], next(self._seq), k) for k, e in self._data.items()]
+            heapq.heapify(self._heap)
+
+    def _evict_over_budget(self) -> None:
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            reason = "evicted_entries" if len(self._data) > self.max_entries else "evicted_bytes"
+            key, _ = next(iter(self._data.items()))
+            self._remove(key)
+            self._stats[reason] += 1
+
+    # ---- API ----
+    def _lookup(self, key: Hashable, now: float) -> Tuple[str, Any]:
+        """("fresh"|"stale"|"miss", valor). Llamar con lock tomado."""
+        entry = self._data.get(key)
+        if entry is None:
+            return "miss", None
+        if entry[0] < now:
             # expirado → limpiar y miss
+            self._remove(key)
+            self._stats["expired"] += 1
+            return "miss", None
+        self._data.move_to_end(key)
+        return ("fresh" if now < entry[3] else "stale"), entry[1]
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            state, value = self._lookup(key, _now())
+            if state != "fresh":
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float, stale_ttl: float = 0) -> None:
+        now = _now()
+        fresh_until = now + ttl_seconds
+        exp = fresh_until + max(0.0, stale_ttl)
+        size = _approx_size(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                # nunca cabría: no desalojamos toda la cache por una sola entrada
+                self._stats["evicted_bytes"] += 1
+                return
+            self._data[key] = (exp, value, size, fresh_until)
+            self._bytes += size
+            heapq.heappush(self._heap, (exp, next(self._seq), key))
+            self._stats["sets"] += 1
+            self._purge_expired(now)
+            self._evict_over_budget()
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            found = key in self._data
+            self._remove(key)
+            return found
+
+    def clear(self, prefix: str | None = None) -> int:
+        with self._lock:
+            if prefix is None:
+                removed = len(self._data)
+                self._data.clear()
+                self._heap.clear()
+                self._bytes = 0
+                return removed
+            to_del = [k for k in self._data if isinstance(k, tuple) and len(k) >= 1 and k[0] == prefix]
+            for k in to_del:
+                self._remove(k)
+            return len(to_del)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: float = 0) -> Any:
+        # lookup y registro del vuelo bajo el mismo lock (RLock): sin carga duplicada
+        return self._single_flight(key, lambda: self._lookup(key, _now()), loader, ttl, stale_ttl)
+
+    def sweep(self) -> None:
+        with self._lock:
+            self._purge_expired(_now())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out.update(entries=len(self._data), bytes=self._bytes,
+                       max_entries=self.max_entries, max_bytes=self.max_bytes)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+        return out
+
+
+class _ShardedCache:
+    """
+    Misma interfaz que _LRUCache repartida en N shards independientes (lock, LRU,
+    heap y presupuesto propios = total / N). Una llave siempre cae en el mismo
+    shard, así el single-flight de get_or_load sigue siendo por llave.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 shards: int = DEFAULT_SHARDS):
+        max_entries = max(1, int(max_entries))
+        n = max(1, min(int(shards), max_entries // _MIN_ENTRIES_PER_SHARD))
+        self._shards: Tuple[_LRUCache, ...] = tuple(
+            _LRUCache(max_entries // n, max(1, int(max_bytes)) // n) for _ in range(n)
+        )
+
+    def _shard(self, key: Hashable) -> _LRUCache:
+        shards = self._shards
+        return shards[hash(key) % len(shards)] if len(shards) > 1 else shards[0]
+
+    def get(self, key: Hashable) -> Any | None:
+        return self._shard(key).get(key)
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float, stale_ttl: float = 0) -> None:
+        self._shard(key).set(key, value, ttl_seconds, stale_ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: float = 0) -> Any:
+        return self._shard(key).get_or_load(key, loader, ttl, stale_ttl)
+
+    def delete(self, key: Hashable) -> bool:
+        return self._shard(key).delete(key)
+
+    def clear(self, prefix: str | None = None) -> int:
+        return sum(sh.clear(prefix) for sh in self._shards)
+
+    def sweep(self) -> None:
+        for sh in self._shards:
+            sh.sweep()
+
+    def stats(self) -> Dict[str, Any]:
+        per = [sh.stats() for sh in self._shards]
+        out: Dict[str, Any] = {k: sum(p[k] for p in per) for k in _SUM_STATS}
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+        out["shards"] = len(per)
+        out["backend"] = "memory"
+        return out
+
+
+class _SQLiteCache(_SingleFlightMixin):
+    """
+    Backend compartido entre procesos (tabla `cache` de utils/shared_state).
+    Misma interfaz que _ShardedCache. El single-flight es por proceso (entre workers
+    puede haber una carga duplicada, no más). Valores no serializables a JSON no se
+    guardan. Si SQLite falla, sigue con una cache en memoria.
+    """
+
+    # Re-tocar last_access sólo si pasó este tiempo (evita un write por cada hit)
+    _TOUCH_EVERY_S = TOUCH_EVERY_S
+    # Chequeo de presupuesto cada N escrituras (COUNT/SUM sobre la tabla)
+    _EVICT_EVERY = 64
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 fallback: Optional[_ShardedCache] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._fallback = fallback or _ShardedCache(max_entries, max_bytes)
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._sets_since_evict = 0
+        self._stats: Dict[str, int] = {
+            "hits": 0, "misses": 0, "sets": 0,
+            "expired": 0, "evicted_entries": 0, "evicted_bytes": 0,
+            "stale_hits": 0, "loads": 0, "load_waits": 0, "refreshes": 0,
+            "unserializable": 0,
+        }
+
+    @staticmethod
+    def _skey(key: Hashable) -> Tuple[str, Optional[str]]:
+        prefix = key[0] if isinstance(key, tuple) and key and isinstance(key[0], str) else None
+        return repr(key), prefix
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def _shared(self) -> bool:
+        from utils import shared_state
+        return shared_state.available()
+
+    def _lookup(self, key: Hashable) -> Tuple[str, Any]:
+        from utils import shared_state
+        skey, _ = self._skey(key)
+        now = _now()
+        c = shared_state.conn()
+        row = c.execute(
+            "SELECT value, fresh_until, expires_at, last_access FROM cache WHERE key = ?", (skey,)
+        ).fetchone()
+        if row is None:
+            return "miss", None
+        if float(row[2]) < now:
+            c.execute("DELETE FROM cache WHERE key = ? AND expires_at < ?", (skey, now))
+            self._count("expired")
+            return "miss", None
+        if now - float(row[3]) >= self._TOUCH_EVERY_S:
+            c.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, skey))
+        return ("fresh" if now < float(row[1]) else "stale"), json.loads(row[0])
+
+    def get(self, key: Hashable) -> Any | None:
+        if not self._shared():
+            return self._fallback.get(key)
+        try:
+            state, value = self._lookup(key)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return self._fallback.get(key)
+        self._count("hits" if state == "fresh" else "misses")
+        return value if state == "fresh" else None
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float, stale_ttl: float = 0) -> None:
+        if not self._shared():
+            return self._fallback.set(key, value, ttl_seconds, stale_ttl)
+        from utils import shared_state
+        try:
+            body = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            self._count("unserializable")
+            return
+        size = len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            self._count("evicted_bytes")
+            return
+        now = _now()
+        fresh_until = now + ttl_seconds
+        skey, prefix = self._skey(key)
+        try:
+            shared_state.conn().execute(
+                "INSERT OR REPLACE INTO cache (key, prefix, value, size, fresh_until, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (skey, prefix, body, size, fresh_until, fresh_until + max(0.0, stale_ttl), now),
+            )
+        except sqlite3.Error as e:
+            self._disable(e)
+            return self._fallback.set(key, value, ttl_seconds, stale_ttl)
+        with self._lock:
+            self._stats["sets"] += 1
+            self._sets_since_evict += 1
+            due = self._sets_since_evict >= self._EVICT_EVERY
+            if due:
+                self._sets_since_evict = 0
+        if due:
+            self.sweep()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: float = 0) -> Any:
+        if not self._shared():
+            return self._fallback.get_or_load(key, loader, ttl, stale_ttl)
+        try:
+            state, value = self._lookup(key)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return self._fallback.get_or_load(key, loader, ttl, stale_ttl)
+        # el SELECT queda fuera del lock: sólo se registra el vuelo con el lock tomado
+        return self._single_flight(key, lambda: (state, value), loader, ttl, stale_ttl)
+
+    def delete(self, key: Hashable) -> bool:
+        found = self._fallback.delete(key)
+        if not self._shared():
+            return found
+        from utils import shared_state
+        try:
+            cur = shared_state.conn().execute("DELETE FROM cache WHERE key = ?", (self._skey(key)[0],))
+            return found or bool(cur.rowcount)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return found
+
+    def clear(self, prefix: str | None = None) -> int:
+        removed = self._fallback.clear(prefix)
+        if not self._shared():
+            return removed
+        from utils import shared_state
+        try:
+            c = shared_state.conn()
+            if prefix is None:
+                cur = c.execute("DELETE FROM cache")
+            else:
+                cur = c.execute("DELETE FROM cache WHERE prefix = ?", (prefix,))
+            return removed + int(cur.rowcount or 0)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return removed
+
+    def sweep(self) -> None:
+        """Borra vencidas y, si se pasa del presupuesto, las menos usadas (hasta el 90%)."""
+        self._fallback.sweep()
+        if not self._shared():
+            return
+        from utils import shared_state
+        try:
+            with shared_state.immediate() as c:
+                cur = c.execute("DELETE FROM cache WHERE expires_at < ?", (_now(),))
+                expired = int(cur.rowcount or 0)
+                entries, size = c.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+                entries, size = int(entries), int(size)
+                evicted_e = evicted_b = 0
+                if entries > self.max_entries or size > self.max_bytes:
+                    target_e, target_b = int(self.max_entries * 0.9), int(self.max_bytes * 0.9)
+                    rows = c.execute("SELECT key, size FROM cache ORDER BY last_access ASC").fetchall()
+                    for skey, sz in rows:
+                        if entries <= target_e and size <= target_b:
+                            break
+                        c.execute("DELETE FROM cache WHERE key = ?", (skey,))
+                        if entries > target_e:
+                            evicted_e += 1
+                        else:
+                            evicted_b += 1
+                        entries -= 1
+                        size -= int(sz)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return
+        with self._lock:
+            self._stats["expired"] += expired
+            self._stats["evicted_entries"] += evicted_e
+            self._stats["evicted_bytes"] += evicted_b
+
+    def stats(self) -> Dict[str, Any]:
+        from utils import shared_state
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out.update(backend="sqlite", max_entries=self.max_entries, max_bytes=self.max_bytes,
+                   entries=None, bytes=None, disabled_reason=shared_state.disabled_reason())
+        if self._shared():
             try:
-                del _STORE[key]
-            except Exception:
+                entries, size = shared_state.conn().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+                out.update(entries=int(entries), bytes=int(size), path=str(shared_state.db_path()))
+            except sqlite3.Error:
                 pass
-            return None
-        return val
+        else:
+            out["fallback"] = self._fallback.stats()
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+        return out
+
+    @staticmethod
+    def _disable(exc: Exception) -> None:
+        from utils import shared_state
+        shared_state.disable(exc)
+
+
+class _Flight:
+    """Carga en curso de una llave: los demás callers esperan su resultado."""
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
 
-def cache_set(key: Hashable, value: Any, ttl_seconds: int) -> None:
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+_REFRESH_POOL: Optional[ThreadPoolExecutor] = None
+
+def _refresh_pool() -> ThreadPoolExecutor:
+    # Refrescos stale-while-revalidate en segundo plano (1 por llave gracias al single-flight)
+    global _REFRESH_POOL
+    if _REFRESH_POOL is None:
+        with _INIT_LOCK:
+            if _REFRESH_POOL is None:
+                _REFRESH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+    return _REFRESH_POOL
+
+
+_CACHE: Optional[_ShardedCache | _SQLiteCache] = None
+_INIT_LOCK = threading.Lock()
+
+def _build(max_entries: int, max_bytes: int, shards: int, backend: str = "memory") -> _ShardedCache | _SQLiteCache:
+    memory = _ShardedCache(max_entries, max_bytes, shards)
+    if backend == "sqlite":
+        return _SQLiteCache(max_entries, max_bytes, fallback=memory)
+    return memory
+
+def _cache() -> _ShardedCache | _SQLiteCache:
+    global _CACHE
+    if _CACHE is None:
+        with _INIT_LOCK:
+            if _CACHE is None:
+                try:
+                    from utils.config import get_cache_settings
+                    s = get_cache_settings()
+                    _CACHE = _build(s["max_entries"], s["max_mb"] * 1024 * 1024, s["shards"], s["backend"])
+                except Exception:
+                    _CACHE = _ShardedCache()
+    return _CACHE
+
+def cache_configure(*, max_entries: int, max_bytes: int, shards: int = DEFAULT_SHARDS,
+                    backend: str = "memory") -> None:
+    """Reemplaza la cache por una vacía con otro presupuesto/backend (tests/tuning/benchmarks)."""
+    global _CACHE
+    with _INIT_LOCK:
+        _CACHE = _build(max_entries, max_bytes, shards, backend)
+
+def cache_get(key: Hashable) -> Any | None:
+    return _cache().get(key)
+
+def cache_set(key: Hashable, value: Any, ttl_seconds: int, stale_ttl: int = 0) -> None:
     if ttl_seconds <= 0:
         return
-    with _LOCK:
-        _STORE[key] = (_now() + ttl_seconds, value)
+    _cache().set(key, value, ttl_seconds, stale_ttl)
+
+def cache_get_or_load(key: Hashable, loader: Callable[[], Any], ttl: int, stale_ttl: int = 0) -> Any:
+    """
+    Valor de `key`, cargándolo con `loader()` si falta:
+      - single-flight: con varios misses concurrentes, sólo uno llama a `loader`;
+        el resto espera su resultado (o su excepción)
+      - stale-while-revalidate: vencida hace menos de `stale_ttl` s → se devuelve al
+        tiro y se refresca en segundo plano
+    Resultados vacíos ({}, [], "", None) no se cachean. ttl <= 0 → sin cache (pero
+    igual con single-flight).
+    """
+    return _cache().get_or_load(key, loader, ttl, stale_ttl)
+
+def cache_delete(key: Hashable) -> bool:
+    """Borra una llave. True si existía."""
+    return _cache().delete(key)
 
 def cache_clear(prefix: str | None = None) -> int:
     """
     Limpia toda la cache o solo las llaves que matcheen el prefix.
     Retorna cuántas entradas se eliminaron.
     """
-    removed = 0
-    with _LOCK:
-        if prefix is None:
-            removed = len(_STORE)
-            _STORE.clear()
-            return removed
+    return _cache().clear(prefix)
 
-        to_del = []
-        for k in _STORE.keys():
-            if isinstance(k, tuple) and len(k) >= 1 and k[0] == prefix:
-                to_del.append(k)
-        for k in to_del:
-            try:
-                del _STORE[k]
-                removed += 1
-            except Exception:
-                pass
-    return removed
+def cache_sweep() -> None:
+    """Libera ya las entradas vencidas (también ocurre en cada cache_set)."""
+    _cache().sweep()
+
+def cache_stats() -> Dict[str, Any]:
+    """Entradas, bytes aproximados, hit rate y contadores de expiración/evicción (suma de shards)."""
+    return _cache().stats()
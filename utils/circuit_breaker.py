@@ -1,90 +1,339 @@
 # utils/circuit_breaker.py
+"""
+Circuit breaker por clave (op): gmail:messages.list, gmail:messages.get,
+gmail:history.list, llm:complete, ...
+
+Modos (gmail.circuit_breaker.mode):
+  - consecutive: abre tras `threshold` fallos contados seguidos
+  - rate: abre cuando, en una ventana deslizante de `window_s`, hubo al menos
+    `min_requests` llamadas y la fracción de fallos llega a `error_rate`.
+    No "aletea" con un fallo aislado entre muchos éxitos concurrentes.
+Half-open: sólo `max_probes` llamadas de prueba simultáneas; el resto sigue
+rechazado hasta que una prueba cierre (éxito) o reabra (fallo) el breaker.
+
+Con `cache.backend = "sqlite"` el estado vive en utils/shared_state (tabla
+`breakers`): si un worker abre el breaker, los demás workers del host también dejan
+de llamar a Gmail. Las lecturas no toman lock de escritura; sólo las transiciones
+hacen una transacción IMMEDIATE. La ventana de tasa de error es por proceso.
+
+Métricas de transiciones (closed→open, open→half, ...) y rechazos: breaker_metrics().
+"""
 from __future__ import annotations
+import json
+import sqlite3
 import time
 import threading
-from typing import Dict, Any, Tuple
+from collections import deque
+from typing import Callable, Deque, Dict, Any, List, Optional, Tuple, TypeVar
+
+from utils import shared_state
+
+T = TypeVar("T")
 
 # Estado por clave (op): closed | open | half
-# Estructura: key -> {state, fail_count, opened_at, cooldown_s, threshold}
+# Estructura: key -> {state, fail_count, opened_at, cooldown_s, threshold, mode,
+#                     window_s, min_requests, error_rate, max_probes, probes, half_at}
 _STATE: Dict[str, Dict[str, Any]] = {}
 _LOCK = threading.RLock()
 
+# Ventana deslizante por clave (local al proceso): buckets de 1 s [segundo, total, fallos]
+_WINDOWS: Dict[str, Deque[List[int]]] = {}
+# Métricas por clave (local al proceso)
+_METRICS: Dict[str, Dict[str, Any]] = {}
+
 DEFAULT_THRESHOLD = 3
 DEFAULT_COOLDOWN_S = 30
+DEFAULT_WINDOW_S = 30
+DEFAULT_MIN_REQUESTS = 10
+DEFAULT_ERROR_RATE = 0.5
+DEFAULT_MAX_PROBES = 1
 DEFAULT_CODES = {429, 500, 502, 503, 504}
 
 def _now() -> float:
     return time.time()
 
+def _default() -> Dict[str, Any]:
+    return {"state": "closed", "fail_count": 0, "opened_at": 0.0,
+            "cooldown_s": DEFAULT_COOLDOWN_S, "threshold": DEFAULT_THRESHOLD,
+            "mode": "consecutive", "window_s": DEFAULT_WINDOW_S,
+            "min_requests": DEFAULT_MIN_REQUESTS, "error_rate": DEFAULT_ERROR_RATE,
+            "max_probes": DEFAULT_MAX_PROBES, "probes": 0, "half_at": 0.0}
+
 def _get(key: str) -> Dict[str, Any]:
     with _LOCK:
         st = _STATE.get(key)
         if not st:
-            st = {"state": "closed", "fail_count": 0, "opened_at": 0.0,
-                  "cooldown_s": DEFAULT_COOLDOWN_S, "threshold": DEFAULT_THRESHOLD}
+            st = _default()
             _STATE[key] = st
         return st
 
-def configure(key: str, *, threshold: int, cooldown_s: int) -> None:
+def _read_shared(conn: sqlite3.Connection, key: str) -> Dict[str, Any]:
+    row = conn.execute("SELECT state FROM breakers WHERE key = ?", (key,)).fetchone()
+    st = _default()
+    if row:
+        st.update(json.loads(row[0]))
+    return st
+
+# ---------------- métricas ----------------
+
+def _metrics(key: str) -> Dict[str, Any]:
+    m = _METRICS.get(key)
+    if m is None:
+        m = _METRICS[key] = {"transitions": {}, "rejected": 0, "last_transition": None,
+                             "last_transition_at": 0.0}
+    return m
+
+def _record_transition(key: str, before: str, after: str) -> None:
+    name = f"{before}->{after}"
     with _LOCK:
-        st = _get(key)
-        st["threshold"] = max(1, int(threshold))
-        st["cooldown_s"] = max(1, int(cooldown_s))
+        m = _metrics(key)
+        m["transitions"][name] = m["transitions"].get(name, 0) + 1
+        m["last_transition"] = name
+        m["last_transition_at"] = _now()
+    print(f"⚡ breaker {key}: {name}")
 
-def reset(key: str) -> None:
+def breaker_metrics() -> Dict[str, Dict[str, Any]]:
+    """Por clave: estado actual, transiciones contadas, rechazos y tasa de error de la ventana."""
+    with _LOCK:
+        keys = set(_METRICS) | set(_STATE) | set(_WINDOWS)
+    out: Dict[str, Dict[str, Any]] = {}
+    for key in sorted(keys):
+        st = _mutate(key, lambda st: (dict(st), False))
+        with _LOCK:
+            m = _metrics(key)
+            total, fails = _window_counts(key, int(st.get("window_s", DEFAULT_WINDOW_S)))
+            out[key] = {
+                "state": st["state"],
+                "mode": st.get("mode", "consecutive"),
+                "transitions": dict(m["transitions"]),
+                "rejected": m["rejected"],
+                "last_transition": m["last_transition"],
+                "last_transition_at": m["last_transition_at"],
+                "window_requests": total,
+                "window_error_rate": round(fails / total, 3) if total else None,
+            }
+    return out
+
+# ---------------- ventana deslizante ----------------
+
+def _window_add(key: str, window_s: int, failed: bool) -> Tuple[int, int]:
+    """Suma una llamada a la ventana y devuelve (total, fallos) vigentes."""
+    sec = int(_now())
+    with _LOCK:
+        buckets = _WINDOWS.setdefault(key, deque())
+        if buckets and buckets[-1][0] == sec:
+            buckets[-1][1] += 1
+            buckets[-1][2] += int(failed)
+        else:
+            buckets.append([sec, 1, int(failed)])
+        return _window_counts(key, window_s)
+
+def _window_counts(key: str, window_s: int) -> Tuple[int, int]:
+    cutoff = int(_now()) - int(window_s)
+    with _LOCK:
+        buckets = _WINDOWS.get(key)
+        if not buckets:
+            return 0, 0
+        while buckets and buckets[0][0] <= cutoff:
+            buckets.popleft()
+        return sum(b[1] for b in buckets), sum(b[2] for b in buckets)
+
+def _window_reset(key: str) -> None:
+    with _LOCK:
+        _WINDOWS.pop(key, None)
+
+# ---------------- estado ----------------
+
+def _mutate(key: str, fn: Callable[[Dict[str, Any]], Tuple[T, bool]]) -> T:
+    """
+    Aplica fn(estado) -> (resultado, cambió) sobre el estado de `key`.
+    Compartido: primero prueba sobre una lectura sin lock; si fn cambia algo, repite
+    dentro de una transacción IMMEDIATE (otro worker pudo haberlo movido) y guarda.
+    Registra la transición si cambió `state`.
+    """
+    if shared_state.shared_enabled():
+        try:
+            result, changed = fn(_read_shared(shared_state.conn(), key))
+            if not changed:
+                return result
+            with shared_state.immediate() as conn:
+                st = _read_shared(conn, key)
+                before = st["state"]
+                result, changed = fn(st)
+                if changed:
+                    conn.execute("INSERT OR REPLACE INTO breakers (key, state) VALUES (?, ?)",
+                                 (key, json.dumps(st)))
+            if st["state"] != before:
+                _record_transition(key, before, st["state"])
+            return result
+        except sqlite3.Error as e:
+            shared_state.disable(e)
     with _LOCK:
         st = _get(key)
+        before = st["state"]
+        result, _ = fn(st)
+        after = st["state"]
+    if after != before:
+        _record_transition(key, before, after)
+    return result
+
+def configure(
+    key: str,
+    *,
+    threshold: int,
+    cooldown_s: int,
+    mode: Optional[str] = None,
+    window_s: Optional[int] = None,
+    min_requests: Optional[int] = None,
+    error_rate: Optional[float] = None,
+    max_probes: Optional[int] = None,
+) -> None:
+    wanted: Dict[str, Any] = {"threshold": max(1, int(threshold)), "cooldown_s": max(1, int(cooldown_s))}
+    if mode is not None:
+        wanted["mode"] = "rate" if mode == "rate" else "consecutive"
+    if window_s is not None:
+        wanted["window_s"] = max(1, int(window_s))
+    if min_requests is not None:
+        wanted["min_requests"] = max(1, int(min_requests))
+    if error_rate is not None:
+        wanted["error_rate"] = min(1.0, max(0.01, float(error_rate)))
+    if max_probes is not None:
+        wanted["max_probes"] = max(1, int(max_probes))
+
+    def fn(st: Dict[str, Any]) -> Tuple[None, bool]:
+        changed = any(st.get(k) != v for k, v in wanted.items())
+        st.update(wanted)
+        return None, changed
+
+    _mutate(key, fn)
+
+def configure_from_settings(key: str, settings: Dict[str, Any]) -> None:
+    """configure() con las llaves cb_* de utils.config.get_gmail_settings() (idempotente y barato)."""
+    configure(
+        key,
+        threshold=int(settings.get("cb_threshold", DEFAULT_THRESHOLD)),
+        cooldown_s=int(settings.get("cb_cooldown_s", DEFAULT_COOLDOWN_S)),
+        mode=settings.get("cb_mode"),
+        window_s=settings.get("cb_window_s"),
+        min_requests=settings.get("cb_min_requests"),
+        error_rate=settings.get("cb_error_rate"),
+        max_probes=settings.get("cb_half_open_probes"),
+    )
+
+def reset(key: str) -> None:
+    def fn(st: Dict[str, Any]) -> Tuple[None, bool]:
+        changed = st["state"] != "closed" or st["fail_count"] != 0 or st.get("probes", 0) != 0
         st["state"] = "closed"
         st["fail_count"] = 0
         st["opened_at"] = 0.0
+        st["probes"] = 0
+        return None, changed
+
+    _mutate(key, fn)
+    _window_reset(key)
 
 def before_call(key: str) -> Tuple[bool, float]:
     """
     Devuelve (allow, retry_after_s).
     - closed  -> (True, 0)
-    - open    -> (False, remaining)
-    - half    -> (True, 0)  (probamos una)
+    - open    -> (False, remaining); vencido el cooldown pasa a half y deja pasar una prueba
+    - half    -> (True, 0) mientras haya cupo de pruebas; si no (False, ~1s)
     """
-    with _LOCK:
-        st = _get(key)
+    def fn(st: Dict[str, Any]) -> Tuple[Tuple[bool, float], bool]:
+        now = _now()
         if st["state"] == "closed":
-            return True, 0.0
+            return (True, 0.0), False
         if st["state"] == "open":
-            elapsed = _now() - st["opened_at"]
+            elapsed = now - st["opened_at"]
             if elapsed >= st["cooldown_s"]:
                 st["state"] = "half"
-                return True, 0.0
-            return False, max(0.0, st["cooldown_s"] - elapsed)
-        # half-open
-        return True, 0.0
+                st["probes"] = 1
+                st["half_at"] = now
+                return (True, 0.0), True
+            return (False, max(0.0, st["cooldown_s"] - elapsed)), False
+        # half-open: cupo acotado de pruebas simultáneas. Si una prueba nunca reportó
+        # (p.ej. el proceso murió) el cupo se libera tras un cooldown.
+        if now - float(st.get("half_at", 0.0)) >= st["cooldown_s"]:
+            st["probes"] = 0
+            st["half_at"] = now
+        if int(st.get("probes", 0)) < int(st.get("max_probes", DEFAULT_MAX_PROBES)):
+            st["probes"] = int(st.get("probes", 0)) + 1
+            return (True, 0.0), True
+        return (False, 1.0), False
+
+    allow, retry_after = _mutate(key, fn)
+    if not allow:
+        with _LOCK:
+            _metrics(key)["rejected"] += 1
+    return allow, retry_after
 
 def after_success(key: str) -> None:
-    # Cierra y resetea contadores
-    reset(key)
+    def fn(st: Dict[str, Any]) -> Tuple[bool, bool]:
+        if st["state"] == "half":
+            # Prueba OK → cerrar
+            st.update(state="closed", fail_count=0, opened_at=0.0, probes=0)
+            return True, True
+        if st["state"] == "closed" and st["fail_count"] != 0:
+            st["fail_count"] = 0
+            return False, True
+        return False, False
+
+    st_mode = _mutate(key, lambda st: ((st.get("mode"), st.get("window_s", DEFAULT_WINDOW_S)), False))
+    if st_mode[0] == "rate":
+        _window_add(key, int(st_mode[1]), failed=False)
+    if _mutate(key, fn):
+        # cerrado desde half: los fallos que lo abrieron no cuentan contra el circuito nuevo
+        _window_reset(key)
 
 def after_failure(key: str, code: int, *, watched_codes = DEFAULT_CODES) -> None:
-    with _LOCK:
-        st = _get(key)
-        if code not in watched_codes:
-            # No cuenta para el breaker; mantenemos estado
-            return
+    if code not in watched_codes:
+        # No cuenta para el breaker; si era una prueba half-open, libera su cupo
+        def release(st: Dict[str, Any]) -> Tuple[None, bool]:
+            if st["state"] == "half" and int(st.get("probes", 0)) > 0:
+                st["probes"] = int(st["probes"]) - 1
+                return None, True
+            return None, False
+        _mutate(key, release)
+        return
+
+    mode, window_s = _mutate(key, lambda st: ((st.get("mode"), st.get("window_s", DEFAULT_WINDOW_S)), False))
+    total, fails = _window_add(key, int(window_s), failed=True) if mode == "rate" else (0, 0)
+
+    def fn(st: Dict[str, Any]) -> Tuple[bool, bool]:
         if st["state"] == "half":
             # Prueba falló → abrir de nuevo
-            st["state"] = "open"
-            st["opened_at"] = _now()
-            st["fail_count"] = max(st["threshold"], 1)
-            return
-        # closed u open (durante ventana ya debería estar bloqueando)
+            st.update(state="open", opened_at=_now(), probes=0,
+                      fail_count=max(int(st["threshold"]), 1))
+            return True, True
+        if st["state"] == "open":
+            # respuesta tardía de una llamada previa a la apertura
+            return False, False
         st["fail_count"] = int(st["fail_count"]) + 1
-        if st["fail_count"] >= int(st["threshold"]):
+        if st.get("mode") == "rate":
+            trip = total >= int(st["min_requests"]) and fails / total >= float(st["error_rate"])
+        else:
+            trip = st["fail_count"] >= int(st["threshold"])
+        if trip:
             st["state"] = "open"
             st["opened_at"] = _now()
+        return trip, True
+
+    if _mutate(key, fn):
+        # abierto: la ventana vuelve a contar desde cero (la decide la prueba half-open)
+        _window_reset(key)
 
 def status(key: str) -> Dict[str, Any]:
-    with _LOCK:
-        st = dict(_get(key))
-    # Enriquecer con retry_after
-    allow, retry_after = before_call(key)
+    st = _mutate(key, lambda st: (dict(st), False))
+    # Enriquecer con retry_after (sin consumir cupo de prueba half-open)
+    if st["state"] == "open":
+        remaining = max(0.0, st["cooldown_s"] - (_now() - st["opened_at"]))
+        allow, retry_after = remaining <= 0, remaining
+    elif st["state"] == "half":
+        allow = int(st.get("probes", 0)) < int(st.get("max_probes", DEFAULT_MAX_PROBES))
+        retry_after = 0.0 if allow else 1.0
+    else:
+        allow, retry_after = True, 0.0
     st["allow"] = allow
     st["retry_after_s"] = retry_after
+    st["shared"] = shared_state.shared_enabled()
     return st
@@ -65,6 +65,8 @@ def _ensure_legacy_env_from_CONFIG(cfg: Dict[str, Any]) -> None:
 
     _setenv_if_missing("LLM_MODE", llm.get("mode", "off"))
     _setenv_if_missing("LLM_MODEL_PATH", llm.get("local_model_path", ""))
+    _setenv_if_missing("LLM_MAX_CONCURRENCY", llm.get("max_concurrency", 1))
+    _setenv_if_missing("LLM_MAX_QUEUE", llm.get("max_queue", 16))
 
     scopes = gmail.get("scopes")
     if isinstance(scopes, list):
@@ -107,6 +109,7 @@ def _ensure_legacy_env_from_CONFIG(cfg: Dict[str, Any]) -> None:
     _setenv_if_missing("SUMMARY_CHUNK_OVERLAP", summary.get("chunk_overlap", 200))
     _setenv_if_missing("SUMMARY_MAX_CHARS", summary.get("max_chars", 280))
     _setenv_if_missing("SUMMARY_FORCE_ONE_SENTENCE", "1" if summary.get("force_one_sentence", True) else "0")
+    _setenv_if_missing("SUMMARY_EXTRACT_MAX_CHARS", summary.get("extract_max_chars", 20000))
 
     kw = importance.get("keyword_weights")
     if isinstance(kw, dict):
@@ -220,6 +223,24 @@ def gmail_cache_ttl_seconds(cfg: Dict[str, Any] | None = None) -> int:
     except Exception:
         return 60
 
+def gmail_cache_stale_seconds(cfg: Dict[str, Any] | None = None) -> int:
+    """Ventana stale-while-revalidate tras el TTL (0 = desactivada)."""
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        val = int(cfg.get("gmail", {}).get("cache_stale_seconds", 30))
+        return max(0, min(val, 600))
+    except Exception:
+        return 30
+
+def gmail_negative_cache_seconds(cfg: Dict[str, Any] | None = None) -> int:
+    """TTL de la cache negativa de ids que fallaron (0 = desactivada)."""
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        val = int(cfg.get("gmail", {}).get("negative_cache_seconds", 30))
+        return max(0, min(val, 600))
+    except Exception:
+        return 30
+
 # --- Circuit Breaker getters ---
 def gmail_cb_enabled(cfg: Dict[str, Any] | None = None) -> bool:
     cfg = CONFIG if cfg is None else cfg
@@ -239,6 +260,161 @@ def gmail_cb_cooldown_s(cfg: Dict[str, Any] | None = None) -> int:
     except Exception:
         return 30
 
+CB_MODES = ("consecutive", "rate")
+
+def gmail_cb_mode(cfg: Dict[str, Any] | None = None) -> str:
+    """consecutive: N fallos seguidos; rate: tasa de error en ventana deslizante."""
+    cfg = CONFIG if cfg is None else cfg
+    val = str(cfg.get("gmail", {}).get("circuit_breaker", {}).get("mode", "consecutive")).strip().lower()
+    return val if val in CB_MODES else "consecutive"
+
+def gmail_cb_window_s(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "circuit_breaker", "window_seconds"], min_value=5, max_value=600)
+    except Exception:
+        return 30
+
+def gmail_cb_min_requests(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "circuit_breaker", "min_requests"], min_value=1, max_value=1000)
+    except Exception:
+        return 10
+
+def gmail_cb_error_rate(cfg: Dict[str, Any] | None = None) -> float:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        val = float(cfg.get("gmail", {}).get("circuit_breaker", {}).get("error_rate", 0.5))
+        return min(1.0, max(0.01, val))
+    except Exception:
+        return 0.5
+
+def gmail_cb_half_open_probes(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "circuit_breaker", "half_open_max_probes"], min_value=1, max_value=16)
+    except Exception:
+        return 1
+
+# --- Hedging de messages.get (cola de latencia) ---
+def gmail_hedge_enabled(cfg: Dict[str, Any] | None = None) -> bool:
+    cfg = CONFIG if cfg is None else cfg
+    return bool(cfg.get("gmail", {}).get("hedging", {}).get("enabled", False))
+
+def gmail_hedge_budget_ratio(cfg: Dict[str, Any] | None = None) -> float:
+    """Máximo de requests extra por hedging (fracción de las llamadas primarias)."""
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        val = float(cfg.get("gmail", {}).get("hedging", {}).get("budget_ratio", 0.05))
+        return min(0.5, max(0.0, val))
+    except Exception:
+        return 0.05
+
+def gmail_hedge_percentile(cfg: Dict[str, Any] | None = None) -> float:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        val = float(cfg.get("gmail", {}).get("hedging", {}).get("percentile", 0.9))
+        return min(0.99, max(0.5, val))
+    except Exception:
+        return 0.9
+
+def gmail_hedge_min_samples(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "hedging", "min_samples"], min_value=5, max_value=1000)
+    except Exception:
+        return 20
+
+def gmail_hedge_min_delay_ms(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "hedging", "min_delay_ms"], min_value=0, max_value=10000)
+    except Exception:
+        return 50
+
+# --- Governor de cuota (token bucket en quota units + pausa por 429) ---
+def gmail_governor_enabled(cfg: Dict[str, Any] | None = None) -> bool:
+    cfg = CONFIG if cfg is None else cfg
+    return bool(cfg.get("gmail", {}).get("rate_governor", {}).get("enabled", True))
+
+def gmail_governor_units_per_s(cfg: Dict[str, Any] | None = None) -> int:
+    """Quota units/s por usuario (Gmail: 250)."""
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "rate_governor", "quota_units_per_second"], min_value=10, max_value=250)
+    except Exception:
+        return 250
+
+def gmail_governor_max_pause_s(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "rate_governor", "max_pause_seconds"], min_value=1, max_value=300)
+    except Exception:
+        return 60
+
+# --- Batch HTTP (messages.get agrupados) ---
+def gmail_batch_enabled(cfg: Dict[str, Any] | None = None) -> bool:
+    cfg = CONFIG if cfg is None else cfg
+    return bool(cfg.get("gmail", {}).get("batch", {}).get("enabled", False))
+
+def gmail_batch_size(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "batch", "size"], min_value=1, max_value=100)
+    except Exception:
+        return 50
+
+# --- Espejo incremental (History API) ---
+def gmail_mirror_enabled(cfg: Dict[str, Any] | None = None) -> bool:
+    cfg = CONFIG if cfg is None else cfg
+    return bool(cfg.get("gmail", {}).get("mirror", {}).get("enabled", False))
+
+def gmail_mirror_max_messages(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "mirror", "max_messages"], min_value=10, max_value=2000)
+    except Exception:
+        return 200
+
+def gmail_mirror_sync_interval_s(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "mirror", "sync_interval_seconds"], min_value=0, max_value=300)
+    except Exception:
+        return 5
+
+# --- Engine de I/O (threads | async) ---
+GMAIL_ENGINES = ("threads", "async")
+
+def gmail_engine(cfg: Dict[str, Any] | None = None) -> str:
+    cfg = CONFIG if cfg is None else cfg
+    val = str(cfg.get("gmail", {}).get("engine", "threads")).strip().lower()
+    return val if val in GMAIL_ENGINES else "threads"
+
+def gmail_concurrency_async(cfg: Dict[str, Any] | None = None) -> int:
+    cfg = CONFIG if cfg is None else cfg
+    try:
+        return _require_int(cfg, ["gmail", "concurrency_async"], min_value=1, max_value=512)
+    except Exception:
+        return 64
+
+# --- Conteo de no leídos ---
+# labels: contador messagesUnread de CATEGORY_PERSONAL (1 llamada)
+# estimate: resultSizeEstimate de messages.list INBOX+UNREAD+CATEGORY_PERSONAL (1 llamada)
+# scan: lista + get por mensaje (exacto, N+1 llamadas, tope max_results)
+UNREAD_COUNT_MODES = ("labels", "estimate", "scan")
+
+def gmail_unread_count_mode(cfg: Dict[str, Any] | None = None) -> str:
+    cfg = CONFIG if cfg is None else cfg
+    val = str(cfg.get("gmail", {}).get("unread_count_mode", "labels")).strip().lower()
+    return val if val in UNREAD_COUNT_MODES else "labels"
+
+# --- Warmup de arranque (credenciales + cliente antes del primer request) ---
+def gmail_warmup_on_start(cfg: Dict[str, Any] | None = None) -> bool:
+    cfg = CONFIG if cfg is None else cfg
+    return bool(cfg.get("gmail", {}).get("warmup_on_start", True))
+
 def get_gmail_settings() -> Dict[str, Any]:
     return {
         "max_results": gmail_max_results(),
@@ -255,10 +431,39 @@ def get_gmail_settings() -> Dict[str, Any]:
         "calendar_scopes": gmail_calendar_scopes(),
         "concurrency_get": gmail_concurrency_get(),
         "cache_ttl_seconds": gmail_cache_ttl_seconds(),
+        "cache_stale_s": gmail_cache_stale_seconds(),
+        "negative_ttl_s": gmail_negative_cache_seconds(),
         # Breaker:
         "cb_enabled": gmail_cb_enabled(),
         "cb_threshold": gmail_cb_threshold(),
         "cb_cooldown_s": gmail_cb_cooldown_s(),
+        "cb_mode": gmail_cb_mode(),
+        "cb_window_s": gmail_cb_window_s(),
+        "cb_min_requests": gmail_cb_min_requests(),
+        "cb_error_rate": gmail_cb_error_rate(),
+        "cb_half_open_probes": gmail_cb_half_open_probes(),
+        # Hedging:
+        "hedge_enabled": gmail_hedge_enabled(),
+        "hedge_budget_ratio": gmail_hedge_budget_ratio(),
+        "hedge_percentile": gmail_hedge_percentile(),
+        "hedge_min_samples": gmail_hedge_min_samples(),
+        "hedge_min_delay_ms": gmail_hedge_min_delay_ms(),
+        # Governor de cuota:
+        "governor_enabled": gmail_governor_enabled(),
+        "governor_units_per_s": gmail_governor_units_per_s(),
+        "governor_max_pause_s": gmail_governor_max_pause_s(),
+        # Batch HTTP:
+        "batch_enabled": gmail_batch_enabled(),
+        "batch_size": gmail_batch_size(),
+        # Espejo incremental:
+        "mirror_enabled": gmail_mirror_enabled(),
+        "mirror_max_messages": gmail_mirror_max_messages(),
+        "mirror_sync_interval_s": gmail_mirror_sync_interval_s(),
+        # Engine de I/O:
+        "engine": gmail_engine(),
+        "concurrency_async": gmail_concurrency_async(),
+        # Conteo de no leídos:
+        "unread_count_mode": gmail_unread_count_mode(),
     }
 
 def get_summary_settings() -> Dict[str, Any]:
@@ -268,6 +473,118 @@ def get_summary_settings() -> Dict[str, Any]:
         "chunk_overlap": int(s_cfg.get("chunk_overlap", os.getenv("SUMMARY_CHUNK_OVERLAP", 200))),
         "max_chars": int(s_cfg.get("max_chars", os.getenv("SUMMARY_MAX_CHARS", 280))),
         "force_one_sentence": bool(s_cfg.get("force_one_sentence", (os.getenv("SUMMARY_FORCE_ONE_SENTENCE", "1") == "1"))),
+        # tope de texto que se extrae del cuerpo por mensaje (utils/mime_text.py)
+        "extract_max_chars": int(s_cfg.get("extract_max_chars", os.getenv("SUMMARY_EXTRACT_MAX_CHARS", 20000))),
+        # mensajes que se resumen en paralelo dentro de un request (_format_list)
+        "parallelism": max(1, min(32, int(s_cfg.get("parallelism", os.getenv("SUMMARY_PARALLELISM", 4))))),
+    }
+
+# memory: por proceso; sqlite: archivo compartido por los workers del host (cache + breaker)
+CACHE_BACKENDS = ("memory", "sqlite")
+
+def get_cache_settings() -> Dict[str, Any]:
+    """Presupuesto de la cache en memoria (utils/cache.py)."""
+    c = CONFIG.get("cache", {}) if isinstance(CONFIG.get("cache", {}), dict) else {}
+    try:
+        max_entries = max(100, int(c.get("max_entries", 10000)))
+    except Exception:
+        max_entries = 10000
+    try:
+        max_mb = max(1, int(c.get("max_mb", 64)))
+    except Exception:
+        max_mb = 64
+    try:
+        shards = max(1, min(256, int(c.get("shards", 16))))
+    except Exception:
+        shards = 16
+    backend = str(c.get("backend", "memory")).strip().lower()
+    if backend not in CACHE_BACKENDS:
+        backend = "memory"
+    return {
+        "max_entries": max_entries,
+        "max_mb": max_mb,
+        "shards": shards,
+        "backend": backend,
+        "sqlite_path": str(c.get("sqlite_path") or "data/shared_cache.sqlite3"),
+    }
+
+def get_response_cache_settings() -> Dict[str, Any]:
+    """Cache de respuestas de /api/comando (utils/response_cache.py)."""
+    rc = CONFIG.get("response_cache", {}) if isinstance(CONFIG.get("response_cache", {}), dict) else {}
+    try:
+        ttl = max(0, min(3600, int(rc.get("ttl_seconds", 300))))
+    except Exception:
+        ttl = 300
+    try:
+        version_ttl = max(0, min(60, int(rc.get("version_ttl_seconds", 5))))
+    except Exception:
+        version_ttl = 5
+    return {"enabled": bool(rc.get("enabled", True)), "ttl_seconds": ttl, "version_ttl_seconds": version_ttl}
+
+def get_deadline_settings() -> Dict[str, Any]:
+    """Deadline por request de /api/comando (utils/deadline.py): default + override por acción."""
+    dl = CONFIG.get("deadlines", {}) if isinstance(CONFIG.get("deadlines", {}), dict) else {}
+    try:
+        default_s = max(0.0, min(120.0, float(dl.get("default_seconds", 20))))
+    except Exception:
+        default_s = 20.0
+    actions: Dict[str, float] = {}
+    for accion, val in (dl.get("actions") or {}).items():
+        try:
+            actions[str(accion).lower()] = max(0.0, min(120.0, float(val)))
+        except Exception:
+            continue
+    return {"enabled": bool(dl.get("enabled", True)), "default_seconds": default_s, "actions": actions}
+
+def deadline_seconds_for(accion: str) -> float | None:
+    """Segundos de deadline para `accion` (None = sin tope)."""
+    settings = get_deadline_settings()
+    if not settings["enabled"]:
+        return None
+    val = settings["actions"].get((accion or "").lower(), settings["default_seconds"])
+    return val or None
+
+def get_snapshot_settings() -> Dict[str, Any]:
+    """Snapshot del buzón reciente compartido por request (core/gmail/snapshot.py)."""
+    sn = CONFIG.get("snapshot", {}) if isinstance(CONFIG.get("snapshot", {}), dict) else {}
+    try:
+        ttl = max(0, min(300, int(sn.get("ttl_seconds", 10))))
+    except Exception:
+        ttl = 10
+    try:
+        max_messages = max(1, min(500, int(sn.get("max_messages", 50))))
+    except Exception:
+        max_messages = 50
+    return {"ttl_seconds": ttl, "max_messages": max_messages}
+
+def get_message_store_settings() -> Dict[str, Any]:
+    ms = CONFIG.get("message_store", {}) or {}
+    try:
+        max_mb = max(1, int(ms.get("max_mb", 256)))
+    except Exception:
+        max_mb = 256
+    try:
+        labels_ttl = max(0, int(ms.get("labels_ttl_seconds", 60)))
+    except Exception:
+        labels_ttl = 60
+    return {
+        "enabled": bool(ms.get("enabled", False)),
+        "path": str(ms.get("path") or os.getenv("MESSAGE_STORE_PATH", "data/message_store.sqlite3")),
+        "max_mb": max_mb,
+        "labels_ttl_seconds": labels_ttl,
+    }
+
+def get_summary_store_settings() -> Dict[str, Any]:
+    """Store persistente de resúmenes LLM (utils/summary_store.py)."""
+    ss = CONFIG.get("summary_store", {}) or {}
+    try:
+        max_mb = max(1, int(ss.get("max_mb", 16)))
+    except Exception:
+        max_mb = 16
+    return {
+        "enabled": bool(ss.get("enabled", False)),
+        "path": str(ss.get("path") or os.getenv("SUMMARY_STORE_PATH", "data/summary_store.sqlite3")),
+        "max_mb": max_mb,
     }
 
 def get_keyword_weights() -> Dict[str, int]:
@@ -380,6 +697,14 @@ def validate(cfg: Dict[str, Any]) -> Tuple[bool, List[str], List[str]]:
     if not isinstance(ttl, int) or ttl < 0 or ttl > 600:
         errors.append("gmail.cache_ttl_seconds debe ser int en rango 0..600.")
 
+    stale = gmail.get("cache_stale_seconds", 30)
+    if not isinstance(stale, int) or stale < 0 or stale > 600:
+        errors.append("gmail.cache_stale_seconds debe ser int en rango 0..600.")
+
+    neg = gmail.get("negative_cache_seconds", 30)
+    if not isinstance(neg, int) or neg < 0 or neg > 600:
+        errors.append("gmail.negative_cache_seconds debe ser int en rango 0..600.")
+
     # Breaker
     cb = gmail.get("circuit_breaker", {})
     if not isinstance(cb, dict):
@@ -394,6 +719,97 @@ def validate(cfg: Dict[str, Any]) -> Tuple[bool, List[str], List[str]]:
             errors.append("gmail.circuit_breaker.threshold debe ser int 1..20.")
         if not isinstance(cd, int) or cd < 5 or cd > 600:
             errors.append("gmail.circuit_breaker.cooldown_seconds debe ser int 5..600.")
+        if cb.get("mode", "consecutive") not in CB_MODES:
+            errors.append(f"gmail.circuit_breaker.mode debe ser uno de {', '.join(CB_MODES)}.")
+        win = cb.get("window_seconds", 30)
+        if not isinstance(win, int) or not (5 <= win <= 600):
+            errors.append("gmail.circuit_breaker.window_seconds debe ser int 5..600.")
+        mreq = cb.get("min_requests", 10)
+        if not isinstance(mreq, int) or not (1 <= mreq <= 1000):
+            errors.append("gmail.circuit_breaker.min_requests debe ser int 1..1000.")
+        rate = cb.get("error_rate", 0.5)
+        if not isinstance(rate, (int, float)) or not (0 < rate <= 1):
+            errors.append("gmail.circuit_breaker.error_rate debe ser número en (0, 1].")
+        probes = cb.get("half_open_max_probes", 1)
+        if not isinstance(probes, int) or not (1 <= probes <= 16):
+            errors.append("gmail.circuit_breaker.half_open_max_probes debe ser int 1..16.")
+
+    # Hedging
+    hedge = gmail.get("hedging", {})
+    if not isinstance(hedge, dict):
+        errors.append("gmail.hedging debe ser un objeto.")
+    else:
+        if not isinstance(hedge.get("enabled", False), bool):
+            errors.append("gmail.hedging.enabled debe ser boolean.")
+        ratio = hedge.get("budget_ratio", 0.05)
+        if not isinstance(ratio, (int, float)) or not (0 <= ratio <= 0.5):
+            errors.append("gmail.hedging.budget_ratio debe ser número en [0, 0.5].")
+        elif ratio > 0.1:
+            warnings.append("gmail.hedging.budget_ratio > 0.1 gasta cuota extra notable.")
+        pct = hedge.get("percentile", 0.9)
+        if not isinstance(pct, (int, float)) or not (0.5 <= pct <= 0.99):
+            errors.append("gmail.hedging.percentile debe ser número en [0.5, 0.99].")
+        ms = hedge.get("min_samples", 20)
+        if not isinstance(ms, int) or not (5 <= ms <= 1000):
+            errors.append("gmail.hedging.min_samples debe ser int 5..1000.")
+        md = hedge.get("min_delay_ms", 50)
+        if not isinstance(md, int) or not (0 <= md <= 10000):
+            errors.append("gmail.hedging.min_delay_ms debe ser int 0..10000.")
+
+    # Governor de cuota
+    gov = gmail.get("rate_governor", {})
+    if not isinstance(gov, dict):
+        errors.append("gmail.rate_governor debe ser un objeto.")
+    else:
+        if not isinstance(gov.get("enabled", True), bool):
+            errors.append("gmail.rate_governor.enabled debe ser boolean.")
+        ups = gov.get("quota_units_per_second", 250)
+        if not isinstance(ups, int) or not (10 <= ups <= 250):
+            errors.append("gmail.rate_governor.quota_units_per_second debe ser int 10..250.")
+        mp = gov.get("max_pause_seconds", 60)
+        if not isinstance(mp, int) or not (1 <= mp <= 300):
+            errors.append("gmail.rate_governor.max_pause_seconds debe ser int 1..300.")
+
+    # Batch HTTP
+    batch = gmail.get("batch", {})
+    if not isinstance(batch, dict):
+        errors.append("gmail.batch debe ser un objeto.")
+    else:
+        b_en = batch.get("enabled", False)
+        b_size = batch.get("size", 50)
+        if not isinstance(b_en, bool):
+            errors.append("gmail.batch.enabled debe ser boolean.")
+        if not isinstance(b_size, int) or not (1 <= b_size <= 100):
+            errors.append("gmail.batch.size debe ser int en rango 1..100.")
+        elif b_size > 50:
+            warnings.append("gmail.batch.size > 50 puede gatillar 429 dentro del batch.")
+
+    # Espejo incremental
+    mirror = gmail.get("mirror", {})
+    if not isinstance(mirror, dict):
+        errors.append("gmail.mirror debe ser un objeto.")
+    else:
+        m_en = mirror.get("enabled", False)
+        m_max = mirror.get("max_messages", 200)
+        m_int = mirror.get("sync_interval_seconds", 5)
+        if not isinstance(m_en, bool):
+            errors.append("gmail.mirror.enabled debe ser boolean.")
+        if not isinstance(m_max, int) or not (10 <= m_max <= 2000):
+            errors.append("gmail.mirror.max_messages debe ser int en rango 10..2000.")
+        if not isinstance(m_int, int) or not (0 <= m_int <= 300):
+            errors.append("gmail.mirror.sync_interval_seconds debe ser int en rango 0..300.")
+
+    # Engine de I/O
+    engine = gmail.get("engine", "threads")
+    if engine not in GMAIL_ENGINES:
+        errors.append("gmail.engine debe ser 'threads' o 'async'.")
+    c_async = gmail.get("concurrency_async", 64)
+    if not isinstance(c_async, int) or not (1 <= c_async <= 512):
+        errors.append("gmail.concurrency_async debe ser int en rango 1..512.")
+    if not isinstance(gmail.get("warmup_on_start", True), bool):
+        errors.append("gmail.warmup_on_start debe ser boolean.")
+    if gmail.get("unread_count_mode", "labels") not in UNREAD_COUNT_MODES:
+        errors.append("gmail.unread_count_mode debe ser 'labels', 'estimate' o 'scan'.")
 
     if isinstance(mr, int) and mr > 50:
         warnings.append("gmail.max_results > 50 puede impactar latencia.")
@@ -402,5 +818,106 @@ def validate(cfg: Dict[str, Any]) -> Tuple[bool, List[str], List[str]]:
     if isinstance(timezone, str) and timezone.strip() and timezone != "America/Santiago":
         warnings.append("gmail.timezone distinto a America/Santiago (solo aviso).")
 
+    rc = cfg.get("response_cache", {})
+    if not isinstance(rc, dict):
+        errors.append("response_cache debe ser un objeto.")
+    else:
+        if not isinstance(rc.get("enabled", True), bool):
+            errors.append("response_cache.enabled debe ser boolean.")
+        rc_ttl = rc.get("ttl_seconds", 300)
+        if not isinstance(rc_ttl, int) or not (0 <= rc_ttl <= 3600):
+            errors.append("response_cache.ttl_seconds debe ser int en rango 0..3600.")
+        rc_vttl = rc.get("version_ttl_seconds", 5)
+        if not isinstance(rc_vttl, int) or not (0 <= rc_vttl <= 60):
+            errors.append("response_cache.version_ttl_seconds debe ser int en rango 0..60.")
+
+    dl = cfg.get("deadlines", {})
+    if not isinstance(dl, dict):
+        errors.append("deadlines debe ser un objeto.")
+    else:
+        if not isinstance(dl.get("enabled", True), bool):
+            errors.append("deadlines.enabled debe ser boolean.")
+        dl_default = dl.get("default_seconds", 20)
+        if not isinstance(dl_default, (int, float)) or not (0 <= dl_default <= 120):
+            errors.append("deadlines.default_seconds debe ser número en rango 0..120.")
+        dl_actions = dl.get("actions", {})
+        if not isinstance(dl_actions, dict):
+            errors.append("deadlines.actions debe ser un objeto {accion: segundos}.")
+        else:
+            for accion, val in dl_actions.items():
+                if not isinstance(val, (int, float)) or not (0 <= val <= 120):
+                    errors.append(f"deadlines.actions.{accion} debe ser número en rango 0..120.")
+
+    llm_cfg = cfg.get("llm", {})
+    if isinstance(llm_cfg, dict):
+        llm_conc = llm_cfg.get("max_concurrency", 1)
+        if not isinstance(llm_conc, int) or not (1 <= llm_conc <= 8):
+            errors.append("llm.max_concurrency debe ser int en rango 1..8.")
+        elif llm_conc > 1:
+            warnings.append("llm.max_concurrency > 1 carga una instancia del modelo por generación concurrente (RAM × N).")
+        llm_queue = llm_cfg.get("max_queue", 16)
+        if not isinstance(llm_queue, int) or not (0 <= llm_queue <= 256):
+            errors.append("llm.max_queue debe ser int en rango 0..256.")
+
+    summ = cfg.get("summarizer", {})
+    if isinstance(summ, dict):
+        summ_par = summ.get("parallelism", 4)
+        if not isinstance(summ_par, int) or not (1 <= summ_par <= 32):
+            errors.append("summarizer.parallelism debe ser int en rango 1..32.")
+
+    sn = cfg.get("snapshot", {})
+    if not isinstance(sn, dict):
+        errors.append("snapshot debe ser un objeto.")
+    else:
+        sn_ttl = sn.get("ttl_seconds", 10)
+        if not isinstance(sn_ttl, int) or not (0 <= sn_ttl <= 300):
+            errors.append("snapshot.ttl_seconds debe ser int en rango 0..300.")
+        sn_max = sn.get("max_messages", 50)
+        if not isinstance(sn_max, int) or not (1 <= sn_max <= 500):
+            errors.append("snapshot.max_messages debe ser int en rango 1..500.")
+
+    cache = cfg.get("cache", {})
+    if not isinstance(cache, dict):
+        errors.append("cache debe ser un objeto.")
+    else:
+        c_entries = cache.get("max_entries", 10000)
+        if not isinstance(c_entries, int) or c_entries < 100:
+            errors.append("cache.max_entries debe ser int >= 100.")
+        c_mb = cache.get("max_mb", 64)
+        if not isinstance(c_mb, int) or c_mb < 1:
+            errors.append("cache.max_mb debe ser int >= 1.")
+        c_shards = cache.get("shards", 16)
+        if not isinstance(c_shards, int) or not (1 <= c_shards <= 256):
+            errors.append("cache.shards debe ser int en rango 1..256.")
+        c_backend = cache.get("backend", "memory")
+        if c_backend not in CACHE_BACKENDS:
+            errors.append(f"cache.backend debe ser uno de {', '.join(CACHE_BACKENDS)}.")
+        c_path = cache.get("sqlite_path", "data/shared_cache.sqlite3")
+        if not isinstance(c_path, str) or not c_path.strip():
+            errors.append("cache.sqlite_path debe ser string no vacío.")
+
+    ms = cfg.get("message_store", {})
+    if not isinstance(ms, dict):
+        errors.append("message_store debe ser un objeto.")
+    else:
+        if not isinstance(ms.get("enabled", False), bool):
+            errors.append("message_store.enabled debe ser boolean.")
+        ms_mb = ms.get("max_mb", 256)
+        if not isinstance(ms_mb, int) or ms_mb < 1:
+            errors.append("message_store.max_mb debe ser int >= 1.")
+        ms_ttl = ms.get("labels_ttl_seconds", 60)
+        if not isinstance(ms_ttl, int) or not (0 <= ms_ttl <= 3600):
+            errors.append("message_store.labels_ttl_seconds debe ser int en rango 0..3600.")
+
+    ss = cfg.get("summary_store", {})
+    if not isinstance(ss, dict):
+        errors.append("summary_store debe ser un objeto.")
+    else:
+        if not isinstance(ss.get("enabled", False), bool):
+            errors.append("summary_store.enabled debe ser boolean.")
+        ss_mb = ss.get("max_mb", 16)
+        if not isinstance(ss_mb, int) or ss_mb < 1:
+            errors.append("summary_store.max_mb debe ser int >= 1.")
+
     errors.extend(_validate_paths_exist(gmail))
     return (len(errors) == 0), errors, warnings
@@ -0,0 +1,77 @@
+# utils/deadline.py
+"""
+Deadline por request: tope de tiempo total de /api/comando (por acción, ver
+config.deadlines) propagado en un contextvar a retries, pool de fetch y LLM.
+
+  - utils.retry: no empieza un intento ni duerme un backoff que pase el deadline
+    (levanta DeadlineExceeded, que no cuenta para el breaker ni la cache negativa)
+  - core.gmail.leer: deja de pedir páginas/gets y entrega lo que ya llegó
+  - core.llm.llm_client._complete: sin tiempo, no genera (fallback extractivo)
+
+Cada corte se anota (qué y cuántos) para que la respuesta diga qué quedó fuera.
+Sin deadline activo (tests, jobs de fondo, refresh stale) todo funciona igual que antes.
+
+Igual que utils.degradation: el caller llama start_deadline() al inicio del request
+(crea el acumulador en su contexto) y los workers (copy_context) escriben en él.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_deadline_ctx: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("_deadline_ctx", default=None)
+_LOCK = threading.Lock()
+
+
+def start_deadline(seconds: Optional[float]) -> None:
+    """Fija el deadline del request actual (None o <= 0 → sin tope)."""
+    at = time.monotonic() + float(seconds) if seconds and seconds > 0 else None
+    _deadline_ctx.set({"at": at, "budget_s": float(seconds) if at else None, "cut": {}})
+
+
+def remaining_s() -> Optional[float]:
+    """Segundos que quedan (>= 0); None si no hay deadline."""
+    data = _deadline_ctx.get()
+    if not data or data["at"] is None:
+        return None
+    return max(0.0, data["at"] - time.monotonic())
+
+
+def expired() -> bool:
+    rem = remaining_s()
+    return rem is not None and rem <= 0.0
+
+
+def would_overrun(seconds: float) -> bool:
+    """True si esperar `seconds` deja el request pasado de su deadline."""
+    rem = remaining_s()
+    return rem is not None and seconds >= rem
+
+
+def record_cut(what: str, n: int = 1) -> None:
+    """Anota un corte por deadline. what: gmail_call | retry_sleep | messages | llm."""
+    data = _deadline_ctx.get()
+    if not data or n <= 0:
+        return
+    with _LOCK:
+        data["cut"][what] = data["cut"].get(what, 0) + int(n)
+
+
+def deadline_cut_pending() -> bool:
+    """True si el request ya recortó algo (sin consumir el reporte)."""
+    data = _deadline_ctx.get()
+    return bool(data and data["cut"])
+
+
+def consume_deadline_report() -> Dict[str, Any]:
+    """
+    Snapshot y cierre del deadline:
+      {"exceeded": bool, "budget_s": float|None, "cut": {"messages": 4, "llm": 2}}
+    """
+    data = _deadline_ctx.get() or {"at": None, "budget_s": None, "cut": {}}
+    with _LOCK:
+        snapshot = {"exceeded": bool(data["cut"]), "budget_s": data["budget_s"], "cut": dict(data["cut"])}
+    _deadline_ctx.set(None)
+    return snapshot
@@ -0,0 +1,69 @@
+# utils/degradation.py
+"""
+Reporte de degradación por request: qué mensajes quedaron fuera y por qué.
+
+Cuando el breaker está abierto, se agotaron los retries o el id está en la cache
+negativa, el fetch devuelve {} y el mensaje no aparece en el resultado. Aquí se
+anota (id, motivo, retry_after) en un contextvar del request para que
+/api/comando pueda avisar que la respuesta es parcial.
+
+El caller debe llamar consume_degradation_report() al inicio del request: así el
+acumulador existe en su contexto y los workers (copy_context) escriben en él.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+from typing import Any, Dict, Optional
+
+# Tope de ids listados en el reporte (el conteo total va igual en "skipped")
+MAX_REPORTED_IDS = 50
+
+_degraded_ctx: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("_degraded_ctx", default=None)
+_LOCK = threading.Lock()
+
+
+def _empty() -> Dict[str, Any]:
+    return {"skipped": 0, "ids": [], "reasons": {}, "retry_after_s": None}
+
+
+def _ctx_get() -> Dict[str, Any]:
+    data = _degraded_ctx.get()
+    if data is None:
+        data = _empty()
+        _degraded_ctx.set(data)
+    return data
+
+
+def record_skipped(msg_id: str, reason: str, retry_after_s: Optional[float] = None) -> None:
+    """Anota un mensaje omitido. reason: breaker_open | retry_exhausted:<code> | negative_cache | error."""
+    data = _ctx_get()
+    with _LOCK:
+        data["skipped"] += 1
+        if len(data["ids"]) < MAX_REPORTED_IDS:
+            data["ids"].append(str(msg_id))
+        base = reason.split(":", 1)[0]
+        data["reasons"][base] = data["reasons"].get(base, 0) + 1
+        if retry_after_s is not None and retry_after_s > 0:
+            prev = data["retry_after_s"]
+            data["retry_after_s"] = round(max(prev or 0.0, float(retry_after_s)), 1)
+
+
+def degradation_pending() -> bool:
+    """True si el request ya omitió algún mensaje (sin consumir el reporte)."""
+    data = _degraded_ctx.get()
+    return bool(data and data["skipped"])
+
+
+def consume_degradation_report() -> Dict[str, Any]:
+    """
+    Snapshot y reset:
+      {"partial": bool, "skipped": int, "ids": [...], "reasons": {"breaker_open": 3},
+       "retry_after_s": float|None}
+    """
+    data = _ctx_get()
+    with _LOCK:
+        snapshot = {"partial": data["skipped"] > 0, **data,
+                    "ids": list(data["ids"]), "reasons": dict(data["reasons"])}
+    _degraded_ctx.set(_empty())
+    return snapshot
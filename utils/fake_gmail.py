@@ -205,10 +205,11 @@ def remitentes_hoy(now: Optional[datetime] = None) -> List[str]:
     return senders
 
 
-def contar_no_leidos() -> int:
+def contar_no_leidos(accurate: bool = False) -> int:
     """
     Cuenta correos marcados como no leídos en el fixture.
-    Simula costo por item.
+    Simula costo por item. Siempre recorre el fixture: `accurate` se acepta por
+    compatibilidad con el backend real (ya es exacto).
     """
     cnt = 0
     for e in _load_fixture():
@@ -239,3 +240,12 @@ def buscar(query: str, max_results: int = 20) -> List[Dict[str, Any]]:
         if len(out) >= max_results:
             break
     return out
+
+
+def mailbox_version() -> str:
+    """Versión del buzón fake: cambia si cambia el archivo de fixtures."""
+    path: Path = get_fake_emails_path()
+    try:
+        return f"fixture:{path.stat().st_mtime_ns}"
+    except OSError:
+        return "fixture:0"
@@ -0,0 +1,270 @@
+# utils/hedging.py
+"""
+Hedged requests para la cola de latencia (p95) de messages.get.
+
+Si un get no respondió al p90 observado de su operación, se lanza un duplicado y
+gana la primera respuesta exitosa (la otra se descarta al terminar). Con decenas de
+gets por `listar`, uno o dos lentos dominan el p95; el duplicado casi siempre cae
+en la parte rápida de la distribución.
+
+  - engine threads: `submit_primary` + `hedged_result`. El primario corre en el pool
+    del caller (en leer.iter_message_metadata, el chunk en su worker gmail-get: batch
+    HTTP o get por id) y quien espera el resultado lanza el duplicado del chunk
+    completo en un pool propio. La cola del caller no cuenta como latencia.
+  - engine async: `hedged_call_async` por intento, dentro del retry.
+
+Presupuesto global (por proceso), en gets: cada primario suma `budget_ratio` por
+get (tope `_BUDGET_BURST`, o lo que cueste un chunk) y cada hedge gasta los gets que
+repite → a régimen, ≤ budget_ratio (p.ej. 5%) requests extra aunque todo esté lento.
+Sin `min_samples` latencias no se hedgea.
+
+Conteos por request (hedges lanzados / ganados por el duplicado) van al acumulador
+de utils.retry → consume_gmail_retry_stats().
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# Latencias recordadas por operación (ventana para el percentil)
+_WINDOW = 256
+# Tokens acumulables: permite ráfagas cortas sin pasarse del ratio a régimen
+_BUDGET_BURST = 10.0
+
+_LOCK = threading.Lock()
+_LATENCIES: Dict[str, Deque[float]] = {}
+_BUDGET: Dict[str, float] = {"tokens": 0.0}
+_METRICS: Dict[str, Dict[str, int]] = {}
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    # sólo duplicados (≤ budget_ratio de los primarios): el primario nunca pasa por aquí
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="gmail-hedge")
+        return _POOL
+
+
+def _enabled(settings: Dict[str, Any]) -> bool:
+    # fake: sin latencia real que recortar (y el fixture corre secuencial)
+    if os.getenv("USE_FAKE_GMAIL", "").strip().lower() in {"1", "true", "yes", "y"}:
+        return False
+    return bool(settings.get("hedge_enabled", False)) and float(settings.get("hedge_budget_ratio", 0.0)) > 0
+
+
+def record_latency(op: str, seconds: float) -> None:
+    with _LOCK:
+        _LATENCIES.setdefault(op, deque(maxlen=_WINDOW)).append(max(0.0, float(seconds)))
+
+
+def hedge_delay_s(op: str, settings: Dict[str, Any]) -> Optional[float]:
+    """Percentil observado de `op` (None si aún no hay muestras suficientes)."""
+    with _LOCK:
+        samples = list(_LATENCIES.get(op, ()))
+    if len(samples) < int(settings.get("hedge_min_samples", 20)):
+        return None
+    samples.sort()
+    pct = float(settings.get("hedge_percentile", 0.9))
+    idx = min(len(samples) - 1, max(0, int(round(pct * (len(samples) - 1)))))
+    return max(samples[idx], int(settings.get("hedge_min_delay_ms", 50)) / 1000.0)
+
+
+def _earn(op: str, settings: Dict[str, Any], units: int = 1) -> None:
+    ratio = float(settings.get("hedge_budget_ratio", 0.05))
+    with _LOCK:
+        # el tope deja juntar lo que cuesta un hedge de `units` gets (chunk batch)
+        _BUDGET["tokens"] = min(max(_BUDGET_BURST, float(units)), _BUDGET["tokens"] + ratio * units)
+        m = _METRICS.setdefault(op, {"calls": 0, "hedges": 0, "wins": 0, "denied": 0})
+        m["calls"] += 1
+
+
+def _try_spend(op: str, settings: Dict[str, Any], units: int = 1, *, pay_quota: bool = False) -> bool:
+    from utils.rate_governor import DEFAULT_UNITS, configure_from_settings, pause_remaining, try_acquire
+    with _LOCK:
+        m = _METRICS.setdefault(op, {"calls": 0, "hedges": 0, "wins": 0, "denied": 0})
+        if _BUDGET["tokens"] < units:
+            m["denied"] += 1
+            return False
+        _BUDGET["tokens"] -= units
+    # con el governor pausado (o sin tokens, si el duplicado no pasa por su propio
+    # retry y hay que pagarlo aquí) no se hedgea
+    key = configure_from_settings(settings)
+    if key is None:
+        ok = True
+    elif pay_quota:
+        ok = try_acquire(key, DEFAULT_UNITS * units)
+    else:
+        ok = pause_remaining(key) <= 0
+    with _LOCK:
+        if ok:
+            m["hedges"] += 1
+        else:
+            _BUDGET["tokens"] += units
+            m["denied"] += 1
+    return ok
+
+
+def _record_outcome(op: str, hedged: bool, hedge_won: bool) -> None:
+    from utils.retry import record_hedge
+    if hedge_won:
+        with _LOCK:
+            _METRICS[op]["wins"] += 1
+    if hedged:
+        record_hedge(won=hedge_won)
+
+
+def hedge_metrics() -> Dict[str, Any]:
+    """Snapshot por operación (calls, hedges, wins, denied) + tokens disponibles."""
+    with _LOCK:
+        return {"tokens": round(_BUDGET["tokens"], 2),
+                "ops": {op: dict(m) for op, m in _METRICS.items()}}
+
+
+def submit_primary(op: str, ex: Executor, fn: Callable[..., Any], *args: Any) -> Future:
+    """
+    submit() del intento primario en el pool del caller (con contextvars). Anota
+    cuándo partió de verdad: la espera en la cola de `ex` no es latencia de Gmail y
+    no cuenta para el percentil ni para decidir el hedge.
+    """
+    started: Dict[str, float] = {}
+
+    def _run() -> Any:
+        started["t0"] = time.monotonic()
+        return _timed(op, fn)(*args)
+
+    fut = ex.submit(contextvars.copy_context().run, _run)
+    fut.hedge_started = started  # type: ignore[attr-defined]
+    return fut
+
+
+def _timed(op: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    def _run(*args: Any) -> Any:
+        t0 = time.monotonic()
+        result = fn(*args)
+        record_latency(op, time.monotonic() - t0)
+        return result
+    return _run
+
+
+def _left(end: Optional[float]) -> Optional[float]:
+    return None if end is None else max(0.0, end - time.monotonic())
+
+
+def hedged_result(
+    op: str,
+    primary: Future,
+    duplicate: Callable[[], Any],
+    settings: Dict[str, Any],
+    *,
+    units: int = 1,
+    timeout: Optional[float] = None,
+) -> Any:
+    """
+    Resultado de `primary` (lanzado con `submit_primary`) con hedging: si lleva
+    corriendo más que el p90 de `op`, `duplicate()` sale en el pool de hedging y gana
+    la primera respuesta exitosa; si ambas fallan se propaga el primer error.
+
+    Sólo el duplicado usa el pool propio: el primario sigue en el thread del caller
+    (p.ej. el worker gmail-get de un chunk). `units` = gets que repite el duplicado
+    (un chunk batch de 50 gasta 50 del presupuesto). `timeout` como en
+    Future.result(): vencido levanta concurrent.futures.TimeoutError.
+    """
+    if not _enabled(settings):
+        return primary.result(timeout=timeout)
+    _earn(op, settings, units)
+    delay = hedge_delay_s(op, settings)
+    if delay is None:
+        return primary.result(timeout=timeout)
+
+    end = None if timeout is None else time.monotonic() + timeout
+    started: Dict[str, float] = getattr(primary, "hedge_started", {})
+    while not primary.done():
+        t0 = started.get("t0")
+        # aún en la cola del caller: no está lento, está esperando turno
+        step = delay if t0 is None else t0 + delay - time.monotonic()
+        if step <= 0:
+            break
+        left = _left(end)
+        if left is not None and left <= 0:
+            raise FuturesTimeout()
+        wait([primary], timeout=step if left is None else min(step, left))
+
+    if primary.done() or not _try_spend(op, settings, units):
+        return primary.result(timeout=_left(end))
+
+    hedge: Future = _pool().submit(contextvars.copy_context().run, _timed(op, duplicate))
+    pending = {primary, hedge}
+    first_error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=_left(end), return_when=FIRST_COMPLETED)
+        if not done:
+            raise FuturesTimeout()
+        for fut in done:
+            exc = fut.exception()
+            if exc is None:
+                # el perdedor termina solo (un get bloqueante no se puede cancelar)
+                _record_outcome(op, True, fut is hedge)
+                return fut.result()
+            first_error = first_error or exc
+    _record_outcome(op, True, False)
+    assert first_error is not None
+    raise first_error
+
+
+async def hedged_call_async(op: str, call: Callable[[], Awaitable[Any]], settings: Dict[str, Any]) -> Any:
+    """Hedging de un intento (engine async): primario y duplicado son tasks del loop; el perdedor se cancela."""
+    if not _enabled(settings):
+        return await call()
+    _earn(op, settings)
+    delay = hedge_delay_s(op, settings)
+    t0 = time.monotonic()
+    if delay is None:
+        result = await call()
+        record_latency(op, time.monotonic() - t0)
+        return result
+
+    primary = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or not _try_spend(op, settings, pay_quota=True):
+        result = await primary
+        record_latency(op, time.monotonic() - t0)
+        _record_outcome(op, False, False)
+        return result
+
+    hedge = asyncio.ensure_future(call())
+    pending = {primary, hedge}
+    first_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                exc = task.exception()
+                if exc is None:
+                    record_latency(op, time.monotonic() - t0)
+                    _record_outcome(op, True, task is hedge)
+                    return task.result()
+                first_error = first_error or exc
+    finally:
+        for task in pending:
+            task.cancel()
+    _record_outcome(op, True, False)
+    assert first_error is not None
+    raise first_error
+
+
+def _reset_for_tests() -> None:
+    with _LOCK:
+        _LATENCIES.clear()
+        _METRICS.clear()
+        _BUDGET["tokens"] = 0.0
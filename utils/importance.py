@@ -1,8 +1,10 @@
 # utils/importance.py
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional, Tuple
-import os, re, math, time, html, base64
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import os, re, math, time
 from datetime import datetime, timezone, timedelta
 
 try:
@@ -68,151 +70,27 @@ EXCLUDED_LABELS = {
 
 # ===================== Utilidades comunes =====================
 
-def _headers_lower(meta: Dict[str, Any]) -> Dict[str, str]:
-    headers = (meta.get("payload", {}) or {}).get("headers", []) or []
-    return {h.get("name", "").lower(): h.get("value", "") for h in headers if isinstance(h, dict)}
-
-def _sender(meta: Dict[str, Any]) -> str:
-    h = _headers_lower(meta)
-    return (h.get("from") or "").strip()
-
-def _subject(meta: Dict[str, Any]) -> str:
-    h = _headers_lower(meta)
-    return (h.get("subject") or "").strip()
-
-def _labels_any(meta: Dict[str, Any]) -> List[str]:
-    # fixtures (labels) + Gmail real (labelIds)
-    lab1 = meta.get("labels") or []
-    lab2 = meta.get("labelIds") or []
-    labs = set()
-    for x in (lab1 or []):
-        if isinstance(x, str): labs.add(x.upper())
-    for x in (lab2 or []):
-        if isinstance(x, str): labs.add(x.upper())
-    return list(labs)
-
-def _b64url_to_bytes(data) -> bytes:
-    if data is None:
-        return b""
-    if isinstance(data, (bytes, bytearray)):
-        try:
-            s = bytes(data)
-            s += b"=" * ((4 - len(s) % 4) % 4)
-            return base64.urlsafe_b64decode(s)
-        except Exception:
-            return bytes(data)
-    if isinstance(data, str):
-        try:
-            s = data.encode("ascii")
-            s += b"=" * ((4 - len(s) % 4) % 4)
-            return base64.urlsafe_b64decode(s)
-        except Exception:
-            return data.encode("utf-8", errors="ignore")
-    return b""
-
-def _strip_html(s: str) -> str:
-    if not s:
-        return ""
-    s = re.sub(r"(?is)<(script|style)[^>]*>.*?</\1\s*>", " ", s)
-    s = re.sub(r"(?is)<br\s*/?>", "\n", s)
-    s = re.sub(r"(?is)</p\s*>", "\n", s)
-    s = re.sub(r"(?is)<[^>]+>", " ", s)
-    s = html.unescape(s)
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{2,}", "\n", s)
-    return s.strip()
-
-def _walk_payload(part: Dict[str, Any]) -> Tuple[str, str]:
-    if not part:
-        return "", ""
-    plain_acc, html_acc = "", ""
-    mime = (part.get("mimeType") or "").lower()
-    body = part.get("body") or {}
-
-    if "data" in body:
-        try:
-            text = _b64url_to_bytes(body["data"]).decode(errors="ignore")
-            if mime.startswith("text/html"):
-                html_acc += text
-            else:
-                plain_acc += text
-        except Exception:
-            pass
-
-    if "text" in body and isinstance(body["text"], str):
-        if mime.startswith("text/html"):
-            html_acc += body["text"]
-        else:
-            plain_acc += body["text"]
+# Campos parseados una vez por mensaje (remitente, fecha, labels, texto): utils.message_record
+from utils.message_record import NormalizedMessage, as_record, label_bit, label_mask, normalize_all
 
-    for sp in (part.get("parts") or []):
-        p_plain, p_html = _walk_payload(sp)
-        plain_acc += p_plain
-        html_acc += p_html
+_EXCLUDED_MASK = label_mask(EXCLUDED_LABELS)
+_URGENTE_BIT = label_bit("URGENTE")
+_DIRECT_BIT = label_bit("DIRECT")
 
-    return plain_acc, html_acc
+Message = Union[Dict[str, Any], NormalizedMessage]
 
-def _extract_text_from_payload(payload: Dict[str, Any]) -> str:
-    try:
-        plain, html_raw = _walk_payload(payload or {})
-    except Exception:
-        plain, html_raw = "", ""
-    if plain.strip():
-        # Si el plain trae tags por error, limpiamos igual
-        if "<" in plain and ">" in plain:
-            plain = _strip_html(plain)
-        return plain.strip()
-    if html_raw.strip():
-        return _strip_html(html_raw).strip()
-    return ""
-
-def _msg_datetime_local(meta: Dict[str, Any]) -> Optional[datetime]:
+def _msg_datetime_local(meta: Message) -> Optional[datetime]:
     """Fecha local del mensaje: ts → header Date → internalDate (ms)."""
-    try:
-        # ts ISO (fixtures)
-        ts_iso = meta.get("ts")
-        if isinstance(ts_iso, str) and ts_iso:
-            dt = datetime.fromisoformat(ts_iso)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt.astimezone(TZ_SCL) if TZ_SCL else dt
-
-        # Header Date
-        h = _headers_lower(meta)
-        date_hdr = h.get("date")
-        if date_hdr:
-            from email.utils import parsedate_to_datetime
-            dt = parsedate_to_datetime(date_hdr)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt.astimezone(TZ_SCL) if TZ_SCL else dt
-
-        # internalDate (epoch ms)
-        internal = meta.get("internalDate")
-        if internal is not None:
-            ts_ms = int(internal) if isinstance(internal, str) else int(internal)
-            dt = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc)
-            return dt.astimezone(TZ_SCL) if TZ_SCL else dt
-        return None
-    except Exception:
-        return None
-
-def _msg_epoch_ms(meta: Dict[str, Any]) -> int:
-    dt = _msg_datetime_local(meta)
-    if not dt:
-        return 0
-    return int(dt.timestamp() * 1000)
+    return as_record(meta).local_dt
 
-def _age_hours(meta: Dict[str, Any], now: Optional[datetime] = None) -> float:
+def _age_hours(rec: NormalizedMessage, now: Optional[datetime] = None) -> float:
     now_local = now or (datetime.now(TZ_SCL) if TZ_SCL else datetime.now(timezone.utc))
-    dt = _msg_datetime_local(meta)
-    if not dt:
+    if rec.ts is None:
         return 1e9
-    delta = now_local - dt
-    return max(0.0, delta.total_seconds() / 3600.0)
+    return max(0.0, (now_local.timestamp() - rec.ts) / 3600.0)
 
-def _pretty_age(meta: Dict[str, Any], now: Optional[datetime] = None) -> str:
-    ah = _age_hours(meta, now)
+def _pretty_age(rec: NormalizedMessage, now: Optional[datetime] = None) -> str:
+    ah = _age_hours(rec, now)
     if ah < 1.0:
         m = int(round(ah * 60))
         m = max(m, 1)
@@ -227,18 +105,6 @@ _RE_MONTO = re.compile(r"\$\s?\d[\d\.\,]*")
 _RE_HORA  = re.compile(r"\b\d{1,2}:\d{2}\b")
 _RE_P1    = re.compile(r"\bP1\b", re.IGNORECASE)
 
-def _normalize_text(meta: Dict[str, Any]) -> str:
-    subj = _subject(meta)
-    snip = (meta.get("snippet") or "").strip()
-    body = _extract_text_from_payload(meta.get("payload") or {})
-    # Fallback: algunos fakes guardan cuerpo en meta["body"]
-    if not body and isinstance(meta.get("body"), str):
-        body = meta["body"]
-    text = " ".join(x for x in [subj, snip, body] if x).lower()
-    # Colapsar espacios
-    text = re.sub(r"[ \t]+", " ", text)
-    return text
-
 def _sender_boost(sender: str) -> int:
     s = (sender or "").lower()
     if not s:
@@ -255,12 +121,11 @@ def _sender_boost(sender: str) -> int:
                 boost = max(boost, 15)
     return boost
 
-def _labels_boost(meta: Dict[str, Any]) -> int:
-    labs = set(_labels_any(meta))
+def _labels_boost(rec: NormalizedMessage) -> int:
     score = 0
-    if "URGENTE" in labs:
+    if rec.label_mask & _URGENTE_BIT:
         score += 12
-    if "DIRECT" in labs:
+    if rec.label_mask & _DIRECT_BIT:
         score += 3
     return score
 
@@ -292,26 +157,40 @@ def _recency_points(age_h: float) -> int:
     except Exception:
         return 0
 
-def compute_importance_score(meta: Dict[str, Any], now: Optional[datetime] = None) -> int:
+def compute_importance_score(meta: Message, now: Optional[datetime] = None) -> int:
     """Score total = remitente + labels + keywords + señales + recencia."""
-    sender = _sender(meta)
-    text = _normalize_text(meta)
+    rec = as_record(meta)
+    text = rec.search_text
 
     base = 0
-    base += _sender_boost(sender)
-    base += _labels_boost(meta)
+    base += _sender_boost(rec.sender)
+    base += _labels_boost(rec)
     base += _keywords_score(text)
     base += _business_signals_score(text)
 
-    age_h = _age_hours(meta, now)
+    age_h = _age_hours(rec, now)
     rec = _recency_points(age_h)
 
-    total = int(base + rec)
-    return max(0, total)
+    return max(0, int(base + rec))
 
 # ===================== Selección Top-N =====================
 
-def seleccionar_importantes(msgs: List[Dict[str, Any]],
+def _rank(recs: List[NormalizedMessage], top_n: int, thr: int,
+          now_local: datetime) -> List[Tuple[NormalizedMessage, int]]:
+    scored: List[Tuple[NormalizedMessage, int]] = []
+    for r in recs:
+        # Excluir labels de ruido en caso real
+        if r.label_mask & _EXCLUDED_MASK:
+            continue
+        sc = compute_importance_score(r, now_local)
+        if sc >= thr:
+            scored.append((r, sc))
+
+    # Orden estable: score DESC, luego fecha (epoch ms) DESC
+    scored.sort(key=lambda x: (x[1], x[0].epoch_ms), reverse=True)
+    return scored[:max(1, int(top_n))]
+
+def seleccionar_importantes(msgs: List[Message],
                             top_n: int = 3,
                             min_score: Optional[int] = None,
                             now: Optional[datetime] = None) -> List[Tuple[Dict[str, Any], int]]:
@@ -320,63 +199,62 @@ def seleccionar_importantes(msgs: List[Dict[str, Any]],
         return []
     thr = IMPORTANT_MIN_SCORE if min_score is None else int(min_score)
     now_local = now or (datetime.now(TZ_SCL) if TZ_SCL else datetime.now(timezone.utc))
+    return [(r.raw, sc) for r, sc in _rank(normalize_all(msgs), top_n, thr, now_local)]
 
-    scored: List[Tuple[Dict[str, Any], int]] = []
-    for m in msgs:
-        # Excluir labels de ruido en caso real
-        if set(m.get("labelIds", []) or []) & EXCLUDED_LABELS:
-            continue
-        sc = compute_importance_score(m, now_local)
-        if sc >= thr:
-            scored.append((m, sc))
-
-    # Orden estable: score DESC, luego fecha (epoch ms) DESC
-    scored.sort(key=lambda x: (x[1], _msg_epoch_ms(x[0])), reverse=True)
-    return scored[:max(1, int(top_n))]
+def _load_all(metas: List[Dict[str, Any]],
+              load_full: Callable[[Dict[str, Any]], Dict[str, Any]],
+              max_workers: int) -> List[Dict[str, Any]]:
+    """load_full en paralelo (conserva el orden); {} o excepción = no disponible."""
+    def _one(meta: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return load_full(meta) or {}
+        except Exception:
+            return {}
+
+    if max_workers <= 1 or len(metas) <= 1:
+        return [_one(m) for m in metas]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="importance-full") as ex:
+        # copy_context: las métricas de retry (contextvars) siguen en el request
+        futures = [ex.submit(contextvars.copy_context().run, _one, m) for m in metas]
+        return [f.result() for f in futures]
+
+def seleccionar_importantes_completos(metas: List[Message],
+                                      load_full: Callable[[Dict[str, Any]], Dict[str, Any]],
+                                      top_n: int = 3,
+                                      min_score: Optional[int] = None,
+                                      now: Optional[datetime] = None,
+                                      max_workers: int = 4,
+                                      stats: Optional[Dict[str, int]] = None) -> List[Tuple[Dict[str, Any], int]]:
+    """Igual que `_rank_completos`, devolviendo los dicts de Gmail completos."""
+    ranked = _rank_completos(metas, load_full, top_n=top_n, min_score=min_score, now=now,
+                             max_workers=max_workers, stats=stats)
+    return [(r.raw, sc) for r, sc in ranked]
+
+def _rank_completos(metas: List[Message],
+                    load_full: Callable[[Dict[str, Any]], Dict[str, Any]],
+                    top_n: int = 3,
+                    min_score: Optional[int] = None,
+                    now: Optional[datetime] = None,
+                    max_workers: int = 4,
+                    stats: Optional[Dict[str, int]] = None) -> List[Tuple[NormalizedMessage, int]]:
+    """
+    Top-N como `seleccionar_importantes` sobre los mensajes completos, a partir de
+    metadata: los labels excluidos se descartan sin bajar el cuerpo y el resto se baja
+    con `load_full` en paralelo (max_workers). El cuerpo puede sumar cualquier keyword,
+    así que no hay cota que permita saltarse cuerpos sin arriesgar el Top-N.
+    Un load_full vacío o con excepción deja el mensaje fuera del ranking.
+    """
+    thr = IMPORTANT_MIN_SCORE if min_score is None else int(min_score)
+    now_local = now or (datetime.now(TZ_SCL) if TZ_SCL else datetime.now(timezone.utc))
+    recs = [r for r in normalize_all(metas) if not (r.label_mask & _EXCLUDED_MASK)]
+    fulls = [f for f in _load_all([r.raw for r in recs], load_full, max_workers) if f]
+    if stats is not None:
+        stats["candidates"] = len(metas)
+        stats["full_fetched"] = len(fulls)
+    return _rank(normalize_all(fulls), max(1, int(top_n)), thr, now_local)
 
 # ===================== Public API (fake/real) =====================
 
-def _primary_query(base_query: Optional[str] = None) -> str:
-    parts = [
-        "category:primary", "-category:social", "-category:promotions",
-        "-category:updates", "-category:forums", "-in:spam", "-in:trash",
-    ]
-    if base_query:
-        parts.append(f"({base_query})")
-    return " ".join(parts)
-
-def _list_recent_primary_ids(service, max_results: int, base_query: Optional[str]) -> List[str]:
-    q = _primary_query(base_query)
-    resp = (
-        service.users()
-        .messages()
-        .list(
-            userId="me",
-            q=q,
-            labelIds=["INBOX"],
-            maxResults=max_results,
-            includeSpamTrash=False,
-            fields="messages(id),nextPageToken",
-        )
-        .execute()
-        or {}
-    )
-    return [m["id"] for m in resp.get("messages", []) or []]
-
-def _get_message_full(service, msg_id: str) -> Dict[str, Any]:
-    return (
-        service.users()
-        .messages()
-        .get(
-            userId="me",
-            id=msg_id,
-            format="full",
-            fields="id,internalDate,labelIds,snippet,payload(mimeType,body,data,parts,headers(name,value))",
-        )
-        .execute()
-        or {}
-    )
-
 def correos_importantes(cantidad: int = 3, newer_than_hours: int = 36) -> str:
     """
     Retorna una lista formateada de correos importantes (fake/real),
@@ -399,15 +277,10 @@ def correos_importantes(cantidad: int = 3, newer_than_hours: int = 36) -> str:
         except TypeError:
             msgs = listar()  # compat
         # Filtrar por ventana de tiempo (newer_than_hours)
-        recent: List[Dict[str, Any]] = []
-        for m in msgs:
-            dt = _msg_datetime_local(m)
-            if not dt:
-                continue
-            if now_local - dt <= timedelta(hours=newer_than_hours):
-                recent.append(m)
+        cutoff_ts = (now_local - timedelta(hours=newer_than_hours)).timestamp()
+        recent = [r for r in normalize_all(msgs) if r.ts is not None and r.ts >= cutoff_ts]
 
-        ranked = seleccionar_importantes(recent, top_n=top_k, min_score=IMPORTANT_MIN_SCORE, now=now_local)
+        ranked = _rank(recent, top_k, IMPORTANT_MIN_SCORE, now_local)
 
         if not ranked:
             dt_ms = (time.perf_counter() - t0) * 1000.0
@@ -415,50 +288,47 @@ def correos_importantes(cantidad: int = 3, newer_than_hours: int = 36) -> str:
             return "No hay correos importantes recientes."
 
         lines: List[str] = []
-        for meta, score in ranked:
-            age = _pretty_age(meta, now_local)
-            lines.append(f"• {_sender(meta)} — {_subject(meta)}  [ {age}, score {score} ]")
+        for rec, score in ranked:
+            age = _pretty_age(rec, now_local)
+            lines.append(f"• {rec.sender} — {rec.subject}  [ {age}, score {score} ]")
 
         dt_ms = (time.perf_counter() - t0) * 1000.0
         print(f"importantes backend=fake items={len(lines)} duration_ms={dt_ms:.2f}")
         return "⚠️ Tienes {} correos importantes:\n\n{}".format(len(lines), "\n".join(lines))
 
     # ---------- Rama REAL ----------
+    # Metadata de la ventana ~48h compartida (core.gmail.snapshot) y format=full en
+    # paralelo de los que no tienen label excluido (el snapshot reusa los ya bajados)
     try:
-        from core.gmail.auth import get_authenticated_service  # type: ignore
-        service = get_authenticated_service()
-    except Exception as e:
-        print(f"importantes backend=real error_service={e}")
-        return "No se pudo construir el servicio de Gmail."
-
-    try:
-        # buscamos en las últimas ~48h por cobertura
-        ids = _list_recent_primary_ids(service, max_results=50, base_query="newer_than:2d")
+        from core.gmail.snapshot import get_snapshot
+        snap = get_snapshot()
+        metas = snap.records()
     except Exception as e:
-        print(f"importantes backend=real error_list_ids={e}")
+        print(f"importantes backend=real error_snapshot={e}")
         return "No fue posible listar mensajes recientes."
 
-    msgs: List[Dict[str, Any]] = []
-    for mid in ids:
-        try:
-            m = _get_message_full(service, mid)
-        except Exception:
-            continue
-        if not m:
-            continue
-        msgs.append(m)
-
-    ranked = seleccionar_importantes(msgs, top_n=top_k, min_score=IMPORTANT_MIN_SCORE, now=now_local)
+    from core.gmail.leer import _effective_concurrency
+    ids = snap.ids
+    stats: Dict[str, int] = {}
+    ranked = _rank_completos(
+        metas,
+        lambda meta: snap.full(meta["id"]),
+        top_n=top_k,
+        min_score=IMPORTANT_MIN_SCORE,
+        now=now_local,
+        max_workers=_effective_concurrency(snap.settings),
+        stats=stats,
+    )
     if not ranked:
         dt_ms = (time.perf_counter() - t0) * 1000.0
-        print(f"importantes backend=real items=0 duration_ms={dt_ms:.2f}")
+        print(f"importantes backend=real items=0 full_fetched={stats.get('full_fetched', 0)}/{len(ids)} duration_ms={dt_ms:.2f}")
         return "No hay correos importantes recientes."
 
     lines: List[str] = []
-    for meta, score in ranked:
-        age = _pretty_age(meta, now_local)
-        lines.append(f"• {_sender(meta)} — {_subject(meta)}  [ {age}, score {score} ]")
+    for rec, score in ranked:
+        age = _pretty_age(rec, now_local)
+        lines.append(f"• {rec.sender} — {rec.subject}  [ {age}, score {score} ]")
 
     dt_ms = (time.perf_counter() - t0) * 1000.0
-    print(f"importantes backend=real items={len(lines)} duration_ms={dt_ms:.2f}")
+    print(f"importantes backend=real items={len(lines)} full_fetched={stats.get('full_fetched', 0)}/{len(ids)} duration_ms={dt_ms:.2f}")
     return "⚠️ Tienes {} correos importantes:\n\n{}".format(len(lines), "\n".join(lines))
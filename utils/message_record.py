@@ -0,0 +1,213 @@
+# utils/message_record.py
+"""
+Registro normalizado de un mensaje, armado una vez al ingresar (snapshot / fake).
+
+Antes cada consumidor (summarizer, importance, alerts, remitentes) volvía a
+recorrer payload.headers, a parsear la fecha con parsedate_to_datetime y a
+decodificar el cuerpo, a veces varias veces por mensaje (p. ej. dentro de la
+key del sort de seleccionar_importantes). `NormalizedMessage` guarda eso ya
+resuelto en __slots__:
+
+  - remitente / asunto internados (sys.intern: los repetidos comparten string)
+  - instante (epoch) + fecha local (gmail.timezone)
+  - labels como bitset (`label_mask`, bits asignados por proceso)
+  - flags to_me / cc_only
+  - texto del cuerpo decodificado y limpio sólo si alguien lo pide (lazy)
+
+`raw` conserva el dict de Gmail original (compartido: no mutarlo). Las
+funciones públicas que reciben dicts siguen funcionando: `as_record()` acepta
+ambos.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+try:
+    from zoneinfo import ZoneInfo  # En Windows: pip install tzdata
+except Exception:
+    ZoneInfo = None
+
+try:
+    from utils.config import get_config
+    _CFG = get_config() or {}
+except Exception:
+    _CFG = {}
+
+_GMAIL_CFG = _CFG.get("gmail", {}) if isinstance(_CFG.get("gmail", {}), dict) else {}
+PRIMARY_EMAIL: str = (os.getenv("PRIMARY_EMAIL") or _GMAIL_CFG.get("primary_email") or "carolina@home.cl").lower()
+try:
+    TZ_LOCAL = ZoneInfo(_GMAIL_CFG.get("timezone") or "America/Santiago") if ZoneInfo else timezone.utc
+except Exception:
+    TZ_LOCAL = timezone.utc
+
+# ====================== Labels como bitset ======================
+
+_LABEL_BITS: Dict[str, int] = {}
+_LABEL_NAMES: List[str] = []
+_LABEL_LOCK = threading.Lock()
+
+
+def label_bit(name: str) -> int:
+    """Bit de `name` (mayúsculas); se asigna al primer uso y no cambia en el proceso."""
+    key = name.upper()
+    bit = _LABEL_BITS.get(key)
+    if bit is None:
+        with _LABEL_LOCK:
+            bit = _LABEL_BITS.get(key)
+            if bit is None:
+                bit = 1 << len(_LABEL_NAMES)
+                _LABEL_NAMES.append(sys.intern(key))
+                _LABEL_BITS[key] = bit
+    return bit
+
+
+def label_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for n in names or ():
+        if isinstance(n, str) and n:
+            mask |= label_bit(n)
+    return mask
+
+
+def label_names(mask: int) -> List[str]:
+    return [name for i, name in enumerate(_LABEL_NAMES) if mask >> i & 1]
+
+# Cuerpo: utils.mime_text (una pasada, corta al llegar al presupuesto)
+from utils.mime_text import extract_text
+
+# Texto de cuerpo que se decodifica por mensaje (keywords de importance; el summarizer
+# pide menos con body_head). Newsletters enormes no se recorren enteras.
+_SUMMARY_CFG = _CFG.get("summarizer", {}) if isinstance(_CFG.get("summarizer", {}), dict) else {}
+BODY_MAX_CHARS: int = int(_SUMMARY_CFG.get("extract_max_chars", os.getenv("SUMMARY_EXTRACT_MAX_CHARS", 20000)))
+
+# ====================== Registro ======================
+
+_RE_SPACES = re.compile(r"[ \t]+")
+
+
+def _headers_lower(meta: Dict[str, Any]) -> Dict[str, str]:
+    headers = (meta.get("payload", {}) or {}).get("headers", []) or []
+    return {h.get("name", "").lower(): h.get("value", "") for h in headers if isinstance(h, dict)}
+
+
+def _epoch_s(meta: Dict[str, Any], hdrs: Dict[str, str]) -> Optional[float]:
+    """Instante del mensaje: ts (ISO en fixtures) → header Date → internalDate (ms)."""
+    ts_iso = meta.get("ts")
+    if isinstance(ts_iso, str) and ts_iso:
+        try:
+            dt = datetime.fromisoformat(ts_iso)
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.timestamp()
+        except Exception:
+            pass
+    try:
+        date_hdr = hdrs.get("date")
+        if date_hdr:
+            dt = parsedate_to_datetime(date_hdr)
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.timestamp()
+        internal = meta.get("internalDate")
+        if internal is not None:
+            return int(internal) / 1000.0
+    except Exception:
+        pass
+    return None
+
+
+def _to_me(meta: Dict[str, Any], hdrs: Dict[str, str], primary: str) -> bool:
+    if primary in (hdrs.get("to") or "").lower():
+        return True
+    # Fallback para fixtures: campo top-level "to": [...]
+    return any(isinstance(x, str) and primary in x.lower() for x in (meta.get("to") or []))
+
+
+class NormalizedMessage:
+    """Campos ya parseados de un mensaje Gmail; el cuerpo se decodifica al primer uso."""
+
+    __slots__ = (
+        "id", "sender", "subject", "snippet", "ts", "local_date",
+        "label_mask", "to_me", "cc_only", "raw", "_body", "_body_budget", "_search",
+    )
+
+    def __init__(self, meta: Dict[str, Any], *, primary_email: Optional[str] = None):
+        hdrs = _headers_lower(meta)
+        self.id: str = str(meta.get("id") or "")
+        self.sender: str = sys.intern((hdrs.get("from") or "").strip())
+        self.subject: str = sys.intern((hdrs.get("subject") or "").strip())
+        self.snippet: str = (meta.get("snippet") or "").strip()
+        self.ts: Optional[float] = _epoch_s(meta, hdrs)
+        self.local_date: Optional[date] = self.local_dt.date() if self.ts is not None else None
+        # fixtures (labels) + Gmail real (labelIds)
+        self.label_mask: int = label_mask(list(meta.get("labels") or []) + list(meta.get("labelIds") or []))
+        self.to_me: bool = _to_me(meta, hdrs, (primary_email or PRIMARY_EMAIL).lower())
+        self.cc_only: bool = bool((meta.get("meta") or {}).get("cc_only", False))
+        self.raw: Dict[str, Any] = meta
+        self._body: Optional[str] = None
+        self._body_budget = 0
+        self._search: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"NormalizedMessage(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
+
+    @property
+    def epoch_ms(self) -> int:
+        return int(self.ts * 1000) if self.ts is not None else 0
+
+    @property
+    def local_dt(self) -> Optional[datetime]:
+        if self.ts is None:
+            return None
+        return datetime.fromtimestamp(self.ts, tz=TZ_LOCAL)
+
+    @property
+    def labels(self) -> List[str]:
+        return label_names(self.label_mask)
+
+    def has_any_label(self, mask: int) -> bool:
+        return bool(self.label_mask & mask)
+
+    def body_head(self, max_chars: int) -> str:
+        """
+        Primeros `max_chars` caracteres del cuerpo (payload; fallback meta["body"] de
+        algunos fakes). Se reutiliza lo ya extraído si alcanza; si no, se extrae de nuevo
+        con el presupuesto mayor.
+        """
+        body = self._body
+        if body is not None and (len(body) >= max_chars or len(body) < self._body_budget):
+            # alcanza, o ya se había leído el cuerpo completo
+            return body[:max_chars]
+        body = extract_text(self.raw.get("payload") or {}, max_chars)
+        if not body and isinstance(self.raw.get("body"), str):
+            body = self.raw["body"][:max_chars]
+        self._body, self._body_budget = body, max_chars
+        return body
+
+    @property
+    def body_text(self) -> str:
+        """Cuerpo hasta summarizer.extract_max_chars."""
+        return self.body_head(BODY_MAX_CHARS)
+
+    @property
+    def search_text(self) -> str:
+        """asunto + snippet + cuerpo en minúsculas, espacios colapsados (para keywords)."""
+        if self._search is None:
+            text = " ".join(x for x in (self.subject, self.snippet, self.body_text) if x).lower()
+            self._search = _RE_SPACES.sub(" ", text)
+        return self._search
+
+
+def as_record(msg: Union[Dict[str, Any], NormalizedMessage]) -> NormalizedMessage:
+    """Acepta un registro ya armado o un dict de Gmail (lo normaliza)."""
+    return msg if isinstance(msg, NormalizedMessage) else NormalizedMessage(msg)
+
+
+def normalize_all(msgs: Iterable[Union[Dict[str, Any], NormalizedMessage]]) -> List[NormalizedMessage]:
+    return [as_record(m) for m in msgs if m]
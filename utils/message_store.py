@@ -0,0 +1,298 @@
+# utils/message_store.py
+"""
+Store persistente (SQLite, modo WAL) para mensajes de Gmail.
+
+El contenido de un mensaje es inmutable; sólo cambian sus labelIds. Por eso:
+  - messages: (id, mask) -> JSON del mensaje SIN labelIds (no expira; evicción por tamaño)
+  - labels:   id -> labelIds con TTL corto (message_store.labels_ttl_seconds)
+
+Compartido entre reinicios y workers del mismo host. Si está deshabilitado (o SQLite
+falla) todas las funciones hacen passthrough.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.config import get_message_store_settings
+from utils.sqlite_wal import TOUCH_EVERY_S, WalDB, resolve_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id          TEXT NOT NULL,
+    mask        TEXT NOT NULL,
+    body        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (id, mask)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_last_access ON messages(last_access);
+CREATE TABLE IF NOT EXISTS labels (
+    id         TEXT PRIMARY KEY,
+    label_ids  TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_LOCK = threading.RLock()
+_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "label_refreshes": 0, "puts": 0, "evictions": 0}
+_STATE: Dict[str, Any] = {"path": None, "size_bytes": None}
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _settings() -> Dict[str, Any]:
+    return get_message_store_settings()
+
+
+def _enabled() -> bool:
+    return bool(_settings().get("enabled", False)) and _DB.available()
+
+
+def _db_path() -> Path:
+    return resolve_path(_settings().get("path"), "data/message_store.sqlite3")
+
+
+def _on_open(conn: sqlite3.Connection, path: str) -> None:
+    with _LOCK:
+        if _STATE["path"] != path:
+            _STATE["path"] = path
+            row = conn.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()
+            _STATE["size_bytes"] = int(row[0] or 0)
+
+
+_DB = WalDB("message_store", _SCHEMA, on_open=_on_open)
+
+
+def _conn() -> sqlite3.Connection:
+    """Una conexión por thread (sqlite3 no comparte conexiones entre threads)."""
+    return _DB.conn(_db_path())
+
+
+def _disable(exc: Exception) -> None:
+    _DB.disable(exc)
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] = _STATS.get(name, 0) + n
+
+
+# ---------------- lectura ----------------
+
+def _get_content(conn: sqlite3.Connection, msg_id: str, mask: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        "SELECT body, last_access FROM messages WHERE id = ? AND mask = ?", (msg_id, mask)
+    ).fetchone()
+    if not row:
+        return None
+    now = _now()
+    if now - float(row[1]) >= TOUCH_EVERY_S:
+        conn.execute("UPDATE messages SET last_access = ? WHERE id = ? AND mask = ?", (now, msg_id, mask))
+    return json.loads(row[0])
+
+
+def _get_labels(conn: sqlite3.Connection, msg_id: str) -> Optional[List[str]]:
+    ttl = int(_settings().get("labels_ttl_seconds", 60))
+    row = conn.execute("SELECT label_ids, updated_at FROM labels WHERE id = ?", (msg_id,)).fetchone()
+    if not row or (_now() - float(row[1])) > ttl:
+        return None
+    return list(json.loads(row[0]))
+
+
+def store_peek(msg_id: str, mask: str) -> Optional[Dict[str, Any]]:
+    """Mensaje completo (contenido + labels vigentes) o None. No llama a Gmail."""
+    if not _enabled():
+        return None
+    try:
+        conn = _conn()
+        content = _get_content(conn, msg_id, mask)
+        labels = _get_labels(conn, msg_id) if content is not None else None
+    except sqlite3.Error as e:
+        _disable(e)
+        return None
+    if content is None or labels is None:
+        _count("misses")
+        return None
+    _count("hits")
+    content["labelIds"] = labels
+    return content
+
+
+# ---------------- escritura ----------------
+
+def _put_labels(conn: sqlite3.Connection, msg_id: str, label_ids: List[str]) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO labels (id, label_ids, updated_at) VALUES (?, ?, ?)",
+        (msg_id, json.dumps(list(label_ids)), _now()),
+    )
+
+
+def store_put(msg_id: str, mask: str, msg: Dict[str, Any]) -> None:
+    """Guarda contenido (sin labelIds) y labels por separado. Aplica evicción por tamaño."""
+    if not msg or not _enabled():
+        return
+    content = {k: v for k, v in msg.items() if k != "labelIds"}
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+    size = len(body.encode("utf-8"))
+    now = _now()
+    try:
+        conn = _conn()
+        prev = conn.execute("SELECT size FROM messages WHERE id = ? AND mask = ?", (msg_id, mask)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO messages (id, mask, body, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            (msg_id, mask, body, size, now, now),
+        )
+        if "labelIds" in msg:
+            _put_labels(conn, msg_id, msg.get("labelIds") or [])
+        with _LOCK:
+            _STATE["size_bytes"] = int(_STATE["size_bytes"] or 0) + size - (int(prev[0]) if prev else 0)
+        _count("puts")
+        _maybe_evict(conn)
+    except sqlite3.Error as e:
+        _disable(e)
+
+
+def store_put_labels(msg_id: str, label_ids: List[str]) -> None:
+    if not _enabled():
+        return
+    try:
+        _put_labels(_conn(), msg_id, label_ids)
+    except sqlite3.Error as e:
+        _disable(e)
+
+
+def _maybe_evict(conn: sqlite3.Connection) -> None:
+    """LRU por last_access hasta bajar al 90% de max_mb."""
+    max_bytes = int(_settings().get("max_mb", 256)) * 1024 * 1024
+    with _LOCK:
+        current = int(_STATE["size_bytes"] or 0)
+    if current <= max_bytes:
+        return
+    # Otros workers también escriben: recalculamos el tamaño real antes de evictar
+    current = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0] or 0)
+    if current <= max_bytes:
+        with _LOCK:
+            _STATE["size_bytes"] = current
+        return
+    target = int(max_bytes * 0.9)
+    freed = 0
+    evicted = 0
+    rows = conn.execute("SELECT id, mask, size FROM messages ORDER BY last_access ASC").fetchall()
+    for mid, mask, size in rows:
+        if current - freed <= target:
+            break
+        conn.execute("DELETE FROM messages WHERE id = ? AND mask = ?", (mid, mask))
+        freed += int(size)
+        evicted += 1
+    # labels huérfanos
+    conn.execute("DELETE FROM labels WHERE id NOT IN (SELECT DISTINCT id FROM messages)")
+    with _LOCK:
+        _STATE["size_bytes"] = current - freed
+    _count("evictions", evicted)
+
+
+# ---------------- read-through ----------------
+
+def read_through(
+    msg_id: str,
+    mask: str,
+    loader: Callable[[], Dict[str, Any]],
+    *,
+    labels_loader: Optional[Callable[[], Optional[List[str]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Devuelve el mensaje desde el store o lo carga con `loader()` y lo guarda.
+    Si el contenido está pero los labels expiraron, usa `labels_loader()` (barato:
+    format=minimal) para refrescarlos sin volver a bajar el mensaje.
+    `loader()` vacío ({}) = fallo/degradado: no se guarda.
+    """
+    if not _enabled():
+        return loader()
+
+    content: Optional[Dict[str, Any]] = None
+    try:
+        conn = _conn()
+        content = _get_content(conn, msg_id, mask)
+        labels = _get_labels(conn, msg_id) if content is not None else None
+    except sqlite3.Error as e:
+        _disable(e)
+        return loader()
+
+    if content is not None and labels is not None:
+        _count("hits")
+        content["labelIds"] = labels
+        return content
+
+    if content is not None and labels_loader is not None:
+        fresh = labels_loader()
+        if fresh is not None:
+            _count("hits")
+            _count("label_refreshes")
+            store_put_labels(msg_id, fresh)
+            content["labelIds"] = list(fresh)
+            return content
+
+    _count("misses")
+    msg = loader()
+    if msg:
+        store_put(msg_id, mask, msg)
+    return msg
+
+
+# ---------------- métricas / mantenimiento ----------------
+
+def store_stats() -> Dict[str, Any]:
+    with _LOCK:
+        stats = dict(_STATS)
+        size_bytes = _STATE["size_bytes"]
+        disabled_reason = _DB.disabled_reason
+    lookups = stats["hits"] + stats["misses"]
+    entries = None
+    if _enabled():
+        try:
+            conn = _conn()
+            entries = int(conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0])
+            size_bytes = _STATE["size_bytes"]
+        except sqlite3.Error:
+            entries = None
+    return {
+        "enabled": _enabled(),
+        "path": str(_db_path()),
+        "entries": entries,
+        "size_bytes": int(size_bytes or 0),
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+        "disabled_reason": disabled_reason,
+        **stats,
+    }
+
+
+def store_clear() -> None:
+    """Vacía el store (tests/diagnóstico)."""
+    if not _enabled():
+        return
+    try:
+        conn = _conn()
+        conn.execute("DELETE FROM messages")
+        conn.execute("DELETE FROM labels")
+        with _LOCK:
+            _STATE["size_bytes"] = 0
+            for k in _STATS:
+                _STATS[k] = 0
+    except sqlite3.Error as e:
+        _disable(e)
+
+
+def _reset_for_tests() -> None:
+    _DB.reset()
+    with _LOCK:
+        _STATE.update({"path": None, "size_bytes": None})
+        for k in _STATS:
+            _STATS[k] = 0
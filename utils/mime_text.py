@@ -0,0 +1,281 @@
+# utils/mime_text.py
+"""
+Extracción de texto de un payload Gmail (MIME) en una pasada y con presupuesto.
+
+Reemplaza el par _walk_payload + _strip_html que vivía duplicado en summarizer e
+importance. Aquel armaba strings con `+=` recursivo, decodificaba todo el base64
+aunque sólo se usaran los primeros SUMMARY_INPUT_CHARS y pasaba seis regex sobre
+el HTML completo. Con newsletters de cientos de KB eso dominaba `_format_list`.
+
+  - recorre las partes MIME de forma iterativa (pila, mismo orden que antes)
+  - decodifica base64-url por bloques con un decoder UTF-8 incremental
+  - `HtmlTextStream` limpia el HTML por trozos a medida que llega: salta
+    script/style, convierte <br> y </p> en saltos, resuelve entidades y colapsa
+    espacios sobre cada trozo (mismas reglas que antes)
+  - corta apenas junta `max_chars` caracteres de salida (None = todo)
+
+Mismo criterio que antes: text/plain si trae algo (sin tags si los tiene); si no,
+el HTML convertido a texto.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import codecs
+import html
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_B64_BLOCK = 8192                      # caracteres base64 por bloque (múltiplo de 4)
+_HTML_WINDOW = 8192                    # strip_html sobre un str ya decodificado: de a ventanas
+_B64URL_CLEAN = re.compile(r"[A-Za-z0-9_\-]*={0,2}")
+_TRANS_URL = bytes.maketrans(b"-_", b"+/")
+
+# Mismas reglas que el _strip_html de antes
+_SKIP_OPEN = re.compile(r"<(script|style)[^>]*>", re.I)
+_SKIP_CLOSE = {"script": re.compile(r"</script\s*>", re.I), "style": re.compile(r"</style\s*>", re.I)}
+_BR = re.compile(r"<br\s*/?>", re.I)
+_P_CLOSE = re.compile(r"</p\s*>", re.I)
+_TAG = re.compile(r"<[^>]+>")
+_WS_RUN = re.compile(r"[ \t]+")
+_NL_RUN = re.compile(r"\n{2,}")
+_MAX_ENTITY = 32
+
+
+def _b64url_to_bytes(data) -> bytes:
+    """Intenta decodificar base64-url; si falla, trata el input como texto UTF-8."""
+    if data is None:
+        return b""
+    if isinstance(data, (bytes, bytearray)):
+        try:
+            s = bytes(data)
+            s += b"=" * ((4 - len(s) % 4) % 4)
+            return base64.urlsafe_b64decode(s)
+        except Exception:
+            return bytes(data)
+    if isinstance(data, str):
+        try:
+            s = data.encode("ascii")
+            s += b"=" * ((4 - len(s) % 4) % 4)
+            return base64.urlsafe_b64decode(s)
+        except Exception:
+            return data.encode("utf-8", errors="ignore")
+    return b""
+
+
+def _iter_b64_text(data: Any) -> Iterator[str]:
+    """body.data decodificado a texto por bloques (base64-url limpio) o de una vez (raro)."""
+    # Gmail siempre manda base64-url limpio; basta mirar el primer bloque (validarlo
+    # entero costaría otra pasada). len % 4 == 1 nunca es válido: va al fallback.
+    if (isinstance(data, str) and len(data.rstrip("=")) % 4 != 1
+            and _B64URL_CLEAN.fullmatch(data, 0, min(len(data), _B64_BLOCK))):
+        dec = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        n = len(data)
+        for i in range(0, n, _B64_BLOCK):
+            last = i + _B64_BLOCK >= n
+            block = data[i:i + _B64_BLOCK].encode("ascii", errors="ignore").translate(_TRANS_URL)
+            if last:
+                block += b"=" * ((4 - len(block) % 4) % 4)
+            try:
+                raw = binascii.a2b_base64(block)
+            except binascii.Error:
+                return
+            text = dec.decode(raw, final=last)
+            if text:
+                yield text
+        return
+    # bytes, base64 con basura o texto crudo (fixtures): comportamiento histórico
+    text = _b64url_to_bytes(data).decode(errors="ignore")
+    if text:
+        yield text
+
+
+def _collect_sources(payload: Dict[str, Any]) -> Tuple[List[Tuple[str, Any]], List[Tuple[str, Any]]]:
+    """Fuentes (kind, valor) de texto plano y HTML en orden de documento, sin decodificar."""
+    plain: List[Tuple[str, Any]] = []
+    html_src: List[Tuple[str, Any]] = []
+    stack: List[Dict[str, Any]] = [payload] if payload else []
+    while stack:
+        part = stack.pop()
+        if not isinstance(part, dict) or not part:
+            continue
+        is_html = (part.get("mimeType") or "").lower().startswith("text/html")
+        body = part.get("body") or {}
+        dest = html_src if is_html else plain
+        if "data" in body:
+            dest.append(("data", body["data"]))
+        if isinstance(body.get("text"), str):
+            dest.append(("text", body["text"]))
+        children = part.get("parts") or []
+        stack.extend(reversed(children))
+    return plain, html_src
+
+
+def _iter_sources(sources: List[Tuple[str, Any]]) -> Iterator[str]:
+    for kind, value in sources:
+        if kind == "text":
+            if value:
+                yield value
+        else:
+            yield from _iter_b64_text(value)
+
+
+class HtmlTextStream:
+    """
+    Convierte HTML a texto a medida que se alimenta; `full` indica que ya llegó al
+    presupuesto. Mismas regex que el _strip_html de antes, en dos etapas por feed:
+
+      1. sobre el HTML crudo se sacan los bloques script/style completos (uno sin
+         cerrar deja el stream saltando hasta su cierre)
+      2. el texto resultante (con <br> y </p> ya convertidos) se limpia hasta el último punto seguro: un "<" sin ">"
+         posterior o un "&" de texto sin ";" cerca del final quedan para el siguiente
+         feed, así un tag o una entidad partidos entre trozos salen igual que antes
+    """
+
+    def __init__(self, max_chars: Optional[int] = None):
+        self.max_chars = max_chars
+        self.full = False
+        self._raw = ""                 # HTML sin procesar (posible "<script" partido)
+        self._text = ""                # ya sin script/style, pendiente de limpiar
+        self._skip: Optional[re.Pattern] = None
+        self._out: List[str] = []
+        self._len = 0
+        self._last = "\n"              # nada escrito aún: sin espacio inicial
+
+    def _flush(self, text: str) -> None:
+        if not text:
+            return
+        text = _TAG.sub(" ", text)
+        if "&" in text:
+            text = html.unescape(text)
+        text = _NL_RUN.sub("\n", _WS_RUN.sub(" ", text))
+        if self._last in " \t" and text[0] in " \t":
+            text = text.lstrip(" \t")
+        elif self._last == "\n" and text[0] == "\n":
+            text = text.lstrip("\n")
+        if not text:
+            return
+        self._out.append(text)
+        self._len += len(text)
+        self._last = text[-1]
+        if self.max_chars is not None and self._len >= self.max_chars:
+            self.full = True
+
+    def feed(self, chunk: str) -> None:
+        if not self.full:
+            self._process(self._raw + chunk, final=False)
+
+    def _strip_blocks(self, buf: str, final: bool) -> str:
+        """Etapa 1: texto de `buf` sin bloques script/style; deja en _raw lo que falta ver."""
+        pos, n = 0, len(buf)
+        parts: List[str] = []
+        if self._skip is not None:
+            m = self._skip.search(buf)
+            if not m:
+                self._raw = buf[-16:]        # el cierre puede venir partido
+                return ""
+            pos = m.end()
+            self._skip = None
+            parts.append(" ")
+        # un "<" sin ">" al final puede ser un "<script" a medio llegar
+        end = n
+        if not final:
+            lt = buf.find("<", max(pos, buf.rfind(">", pos) + 1))
+            if lt >= 0:
+                end = lt
+        while True:
+            m = _SKIP_OPEN.search(buf, pos, end)
+            if m is None:
+                parts.append(buf[pos:end])
+                pos = end
+                break
+            parts.append(buf[pos:m.start()])
+            skip = _SKIP_CLOSE[m.group(1).lower()]
+            close = skip.search(buf, m.end())
+            if close is None:
+                # se descarta hasta el cierre (antes, un script sin cerrar quedaba como texto)
+                self._skip = skip
+                pos = max(m.end(), n - 16)
+                break
+            parts.append(" ")
+            pos = close.end()
+            if pos > end:                # el cierre quedó después del "<" guardado
+                end = n
+                if not final:
+                    lt = buf.find("<", max(pos, buf.rfind(">", pos) + 1))
+                    if lt >= 0:
+                        end = lt
+        self._raw = buf[pos:]
+        return "".join(parts)
+
+    def _process(self, buf: str, final: bool) -> None:
+        # <br> y </p> van antes que el resto de los tags (como antes: un "<" suelto
+        # se junta con el ">" siguiente después de reemplazarlos). Lo pendiente no
+        # tiene ">", así que re-aplicarlos sobre la concatenación es seguro.
+        text = self._text + self._strip_blocks(buf, final)
+        text = _P_CLOSE.sub("\n", _BR.sub("\n", text))
+        end = len(text)
+        if not final:
+            # Etapa 2: punto seguro sobre el texto ya sin script/style
+            gt = text.rfind(">")
+            lt = text.find("<", gt + 1)
+            if lt >= 0:
+                end = lt
+            # sólo un "&" de texto (después del último ">"): uno dentro de un tag
+            # (href="...?a=1&b=2") no es entidad y cortar ahí partiría el tag
+            amp = text.rfind("&", max(gt + 1, end - _MAX_ENTITY), end)
+            if amp >= 0 and ";" not in text[amp:end]:
+                end = amp
+        self._text = text[end:]
+        self._flush(text[:end])
+
+    def close(self) -> str:
+        if (self._raw or self._text) and not self.full:
+            self._process(self._raw, final=True)   # "<" sin cerrar: texto, como antes
+        self._raw = self._text = ""
+        text = "".join(self._out).strip()
+        return text[: self.max_chars] if self.max_chars is not None else text
+
+
+def strip_html(s: str, max_chars: Optional[int] = None) -> str:
+    """Quita tags HTML, remueve script/style, decodifica entidades y colapsa espacios."""
+    if not s:
+        return ""
+    return _stream_html((s[i:i + _HTML_WINDOW] for i in range(0, len(s), _HTML_WINDOW)), max_chars)
+
+
+def extract_text(payload: Dict[str, Any], max_chars: Optional[int] = None) -> str:
+    """Texto del cuerpo: text/plain si hay (sin tags), si no el HTML convertido a texto."""
+    try:
+        plain_src, html_src = _collect_sources(payload or {})
+    except Exception:
+        return ""
+
+    if plain_src:
+        acc: List[str] = []
+        size = 0
+        for piece in _iter_sources(plain_src):
+            acc.append(piece)
+            size += len(piece)
+            if max_chars is not None and size >= max_chars and len("".join(acc).strip()) >= max_chars:
+                break
+        plain = "".join(acc)
+        if plain.strip():
+            if "<" in plain and ">" in plain:
+                # el "plain" trae tags: se limpia igual (ahora con presupuesto de salida)
+                return _stream_html(_iter_sources(plain_src), max_chars)
+            plain = plain.strip()
+            return plain[:max_chars] if max_chars is not None else plain
+
+    if html_src:
+        return _stream_html(_iter_sources(html_src), max_chars)
+    return ""
+
+
+def _stream_html(pieces: Iterator[str], max_chars: Optional[int]) -> str:
+    stream = HtmlTextStream(max_chars)
+    for piece in pieces:
+        stream.feed(piece)
+        if stream.full:
+            break
+    return stream.close()
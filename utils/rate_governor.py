@@ -0,0 +1,214 @@
+# utils/rate_governor.py
+"""
+Governor de cuota Gmail compartido por todos los threads (y el loop async) del proceso.
+
+  - Token bucket en *quota units* de Gmail (messages.get/list = 5, history.list = 2,
+    getProfile/labels.get = 1; un batch cuesta la suma de sus sub-requests). Cada
+    intento reserva sus unidades antes de salir; si el balance queda negativo espera
+    a que se recargue (`quota_units_per_second`, 250 = límite por usuario de Gmail).
+  - Pausa coordinada: un 429 / 403 rateLimitExceeded de cualquier thread pausa *todas*
+    las llamadas de esa llave (usuario) hasta que pase Retry-After (o el backoff si el
+    header no viene), tope `max_pause_seconds`. Los que ya estaban esperando vuelven a
+    mirar la pausa antes de salir: en vez de 16 threads juntando su propio 429, espera
+    uno y los demás aprovechan la ventana.
+
+El estado es por proceso (dict + lock, como utils.circuit_breaker). Lo usa
+utils.retry.run_with_retry_gmail; en modo fake no interviene.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils import deadline
+from utils.retry import DeadlineExceeded
+
+# Costos por método (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS: Dict[str, int] = {
+    "messages.list": 5,
+    "messages.get": 5,
+    "history.list": 2,
+    "labels.get": 1,
+    "getProfile": 1,
+}
+DEFAULT_UNITS = QUOTA_UNITS["messages.get"]
+
+_LOCK = threading.Lock()
+_STATE: Dict[str, Dict[str, Any]] = {}
+
+
+def _now() -> float:
+    return time.monotonic()
+
+
+def _new_state(rate: float, max_pause_s: float) -> Dict[str, Any]:
+    return {
+        "rate": rate, "burst": rate, "max_pause_s": max_pause_s,
+        "tokens": rate, "last": _now(), "paused_until": 0.0,
+        # métricas
+        "pauses": 0, "throttled": 0, "waited_ms_total": 0,
+    }
+
+
+def configure(key: str, *, units_per_s: float, max_pause_s: float) -> None:
+    """Crea/actualiza el bucket de `key` (idempotente)."""
+    rate = max(1.0, float(units_per_s))
+    with _LOCK:
+        st = _STATE.get(key)
+        if st is None:
+            _STATE[key] = _new_state(rate, float(max_pause_s))
+        else:
+            st["rate"] = st["burst"] = rate
+            st["max_pause_s"] = float(max_pause_s)
+
+
+def configure_from_settings(settings: Dict[str, Any]) -> Optional[str]:
+    """Llave del governor según get_gmail_settings() (None si está deshabilitado o en fake)."""
+    if not settings.get("governor_enabled", True):
+        return None
+    if os.getenv("USE_FAKE_GMAIL", "").strip().lower() in {"1", "true", "yes", "y"}:
+        return None
+    key = str(settings.get("primary_email") or "me")
+    configure(key,
+              units_per_s=float(settings.get("governor_units_per_s", 250)),
+              max_pause_s=float(settings.get("governor_max_pause_s", 60)))
+    return key
+
+
+def _refill(st: Dict[str, Any], now: float) -> None:
+    # durante una pausa `last` queda en el futuro: no se acumulan tokens
+    if now > st["last"]:
+        st["tokens"] = min(st["burst"], st["tokens"] + (now - st["last"]) * st["rate"])
+        st["last"] = now
+
+
+def _reserve(key: str, units: int) -> float:
+    """Descuenta `units` y devuelve cuánto hay que esperar para que estén pagadas."""
+    with _LOCK:
+        st = _STATE[key]
+        now = _now()
+        _refill(st, now)
+        st["tokens"] -= units
+        start = max(now, st["last"], st["paused_until"])
+        wait = (start - now) + max(0.0, -st["tokens"]) / st["rate"]
+        if wait > 0:
+            st["throttled"] += 1
+        return wait
+
+
+def pause_remaining(key: str) -> float:
+    """Segundos de pausa coordinada que quedan para `key` (0 si no hay o no existe)."""
+    with _LOCK:
+        st = _STATE.get(key)
+        return max(0.0, st["paused_until"] - _now()) if st else 0.0
+
+
+def _add_waited(key: str, waited_s: float) -> None:
+    with _LOCK:
+        _STATE[key]["waited_ms_total"] += int(waited_s * 1000)
+
+
+def _refund(key: str, units: int) -> None:
+    with _LOCK:
+        st = _STATE[key]
+        st["tokens"] = min(st["burst"], st["tokens"] + units)
+
+
+def _check_deadline(key: str, units: int, wait: float, waited: float) -> None:
+    """Antes de cada espera: si deja el request pasado de su deadline, devuelve la reserva y corta."""
+    if not deadline.would_overrun(wait):
+        return
+    _refund(key, units)
+    if waited:
+        _add_waited(key, waited)
+    deadline.record_cut("gmail_call")
+    raise DeadlineExceeded(f"Deadline del request: espera de cuota de {wait:.2f}s no alcanza.")
+
+
+def acquire(key: str, units: int, sleep_fn: Callable[[float], None] = time.sleep) -> float:
+    """
+    Bloquea hasta que `units` estén disponibles y no haya pausa. Retorna segundos esperados.
+    Si una espera (bucket o pausa) no cabe en el deadline del request, devuelve las
+    unidades reservadas y levanta utils.retry.DeadlineExceeded.
+    """
+    waited = 0.0
+    wait = _reserve(key, units)
+    while wait > 0:
+        _check_deadline(key, units, wait, waited)
+        sleep_fn(wait)
+        waited += wait
+        wait = pause_remaining(key)   # una pausa nueva mientras dormíamos también aplica
+    if waited:
+        _add_waited(key, waited)
+    return waited
+
+
+async def acquire_async(key: str, units: int) -> float:
+    """Igual que `acquire`, sin bloquear el event loop."""
+    waited = 0.0
+    wait = _reserve(key, units)
+    while wait > 0:
+        _check_deadline(key, units, wait, waited)
+        await asyncio.sleep(wait)
+        waited += wait
+        wait = pause_remaining(key)
+    if waited:
+        _add_waited(key, waited)
+    return waited
+
+
+def try_acquire(key: str, units: int) -> bool:
+    """Descuenta `units` sólo si están disponibles ya (sin pausa): para trabajo opcional (hedging)."""
+    with _LOCK:
+        st = _STATE[key]
+        now = _now()
+        _refill(st, now)
+        if now < st["paused_until"] or st["tokens"] < units:
+            return False
+        st["tokens"] -= units
+        return True
+
+
+def pause(key: str, seconds: float) -> float:
+    """Pausa todas las llamadas de `key` por `seconds` (tope max_pause_s). Retorna la pausa aplicada."""
+    with _LOCK:
+        st = _STATE[key]
+        seconds = min(max(0.0, float(seconds)), st["max_pause_s"])
+        now = _now()
+        until = now + seconds
+        if until > st["paused_until"]:
+            _refill(st, now)
+            st["paused_until"] = until
+            st["last"] = max(st["last"], until)
+            st["tokens"] = min(st["tokens"], 0.0)   # al reanudar se sale de a poco, no en ráfaga
+            st["pauses"] += 1
+        return seconds
+
+
+def governor_metrics() -> Dict[str, Any]:
+    """Snapshot por llave: tokens, pausa restante, pausas, llamadas frenadas, espera total."""
+    now = _now()
+    with _LOCK:
+        out = {}
+        for key, st in _STATE.items():
+            _refill(st, now)
+            out[key] = {
+                "tokens": round(st["tokens"], 1),
+                "units_per_s": st["rate"],
+                "paused_for_s": round(max(0.0, st["paused_until"] - now), 1),
+                "pauses": st["pauses"],
+                "throttled": st["throttled"],
+                "waited_ms_total": st["waited_ms_total"],
+            }
+        return out
+
+
+def reset(key: Optional[str] = None) -> None:
+    with _LOCK:
+        if key is None:
+            _STATE.clear()
+        else:
+            _STATE.pop(key, None)
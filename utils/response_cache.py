@@ -0,0 +1,126 @@
+# utils/response_cache.py
+"""
+Cache de respuestas completas de /api/comando.
+
+Llave: (usuario_id, accion, filtros normalizados, día local, versión del buzón).
+  - día local (gmail.timezone): "resumen de hoy" cambia a medianoche
+  - versión del buzón (historyId en real, mtime del fixture en fake): cualquier
+    cambio en el inbox genera llaves nuevas; las viejas mueren por TTL/LRU
+Con Gmail caído la versión es la última conocida (falla rápido por el breaker):
+lo ya cacheado se sigue sirviendo. Sin versión alguna no se cachea. Vive sobre utils.cache: con
+cache.backend = "sqlite" también se comparte entre workers.
+
+Requests idénticos concurrentes comparten un único cómputo (single-flight).
+Resultados parciales (utils.degradation: mensajes omitidos; utils.deadline: cortes
+por tiempo) no se guardan.
+"""
+from __future__ import annotations
+
+import json
+import time
+import unicodedata
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils import config
+from utils.cache import cache_delete, cache_get_or_load, make_cache_key
+from utils.deadline import deadline_cut_pending
+from utils.degradation import degradation_pending
+
+try:
+    from zoneinfo import ZoneInfo
+except Exception:  # pragma: no cover
+    ZoneInfo = None  # type: ignore[assignment]
+
+# Sólo acciones de lectura (sin efectos): repetirlas con el mismo buzón da lo mismo
+CACHEABLE_ACTIONS = {
+    "resumen", "resumen_hoy", "resumen_ayer",
+    "remitentes_hoy", "remitentes_ayer",
+    "contar_no_leidos", "leer_ultimo",
+    "correos_importantes", "importantes",
+    "buscar", "buscar_correo", "buscar_correos",
+}
+# Acciones cuyo resultado depende del texto libre (query) y no sólo de los filtros
+_QUERY_ACTIONS = {"buscar", "buscar_correo", "buscar_correos"}
+
+
+def _norm_text(s: str) -> str:
+    s = unicodedata.normalize("NFD", s or "")
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return " ".join(s.lower().split())
+
+
+def normalize_filtros(filtros: Optional[Dict[str, Any]]) -> str:
+    """JSON canónico: sin vacíos, strings normalizados, llaves ordenadas."""
+    out: Dict[str, Any] = {}
+    for k, v in (filtros or {}).items():
+        if v is None or v == "" or v == [] or v == {}:
+            continue
+        out[str(k)] = _norm_text(v) if isinstance(v, str) else v
+    return json.dumps(out, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def date_bucket(now: Optional[datetime] = None) -> str:
+    """Día local del buzón (YYYY-MM-DD)."""
+    tz = ZoneInfo(config.gmail_timezone()) if ZoneInfo else timezone.utc
+    return (now.astimezone(tz) if now else datetime.now(tz)).date().isoformat()
+
+
+def _mailbox_version(max_age_s: int) -> Optional[str]:
+    try:
+        from core.gmail import mailbox_version
+        return mailbox_version(max_age_s)
+    except Exception:
+        return None
+
+
+def response_key(usuario_id: str, accion: str, filtros: Optional[Dict[str, Any]], *,
+                 version: str, comando: str = "", day: Optional[str] = None):
+    norm = normalize_filtros(filtros)
+    q = _norm_text(comando) if accion in _QUERY_ACTIONS and not (filtros or {}).get("query") else ""
+    return make_cache_key("comando", u=str(usuario_id), accion=accion, filtros=norm, q=q,
+                          day=day or date_bucket(), version=version)
+
+
+def cached_response(
+    usuario_id: str,
+    accion: str,
+    filtros: Optional[Dict[str, Any]],
+    compute: Callable[[], Any],
+    *,
+    comando: str = "",
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    (resultado, {"cached": bool, "age_s": float[, "partial": True]}). `compute()` corre
+    sólo si no hay respuesta vigente para la llave; sus excepciones se propagan (y no
+    se cachean). Un resultado parcial (degradado o cortado por deadline) no se guarda
+    y llega con "partial" también a quien esperaba el mismo cálculo.
+    """
+    settings = config.get_response_cache_settings()
+    if not settings["enabled"] or settings["ttl_seconds"] <= 0 or accion not in CACHEABLE_ACTIONS:
+        return compute(), {"cached": False, "age_s": 0.0}
+
+    version = _mailbox_version(settings["version_ttl_seconds"])
+    if version is None:
+        return compute(), {"cached": False, "age_s": 0.0}
+
+    computed = []
+
+    def _load() -> Dict[str, Any]:
+        computed.append(True)
+        resultado = compute()
+        # la parcialidad se mide aquí: los reportes viven en el contexto del que calcula,
+        # no en el de quien espera el single-flight
+        return {"resultado": resultado, "at": time.time(),
+                "partial": degradation_pending() or deadline_cut_pending()}
+
+    key = response_key(usuario_id, accion, filtros, version=version, comando=comando)
+    entry = cache_get_or_load(key, _load, settings["ttl_seconds"])
+    if entry.get("partial"):
+        if computed:
+            # parcial: la próxima vez hay que intentar completarla
+            cache_delete(key)
+        return entry["resultado"], {"cached": False, "age_s": 0.0, "partial": True}
+    if computed:
+        return entry["resultado"], {"cached": False, "age_s": 0.0}
+    return entry["resultado"], {"cached": True, "age_s": round(max(0.0, time.time() - float(entry["at"])), 3)}
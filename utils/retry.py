@@ -3,8 +3,11 @@ from __future__ import annotations
 import os
 import time
 import random
+import asyncio
 import contextvars
-from typing import Any, Callable, Dict, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils import deadline
 
 
 class RetryError(Exception):
@@ -16,13 +19,27 @@ class RetryError(Exception):
         self.attempts = attempts
 
 
+# 408: no es retryable ni lo vigila el circuit breaker (el corte es nuestro, no de Gmail)
+DEADLINE_CODE = 408
+
+
+class DeadlineExceeded(RetryError):
+    """El deadline del request (utils.deadline) no alcanza para otro intento o backoff."""
+    def __init__(self, message: str, *, retries_by_code: Optional[Dict[str, int]] = None, attempts: int = 0):
+        super().__init__(message, last_error_code=DEADLINE_CODE, retries_by_code=retries_by_code or {}, attempts=attempts)
+
+
 # ---- Acumulador de métricas por-request (contexto local) ----
 _retry_ctx: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("_retry_ctx", default=None)
 
+def _empty_stats() -> Dict[str, Any]:
+    return {"calls": 0, "retries_by_code": {}, "slept_ms_total": 0, "backend": None,
+            "hedges": 0, "hedge_wins": 0, "throttled_ms_total": 0}
+
 def _ctx_get() -> Dict[str, Any]:
     data = _retry_ctx.get()
     if data is None:
-        data = {"calls": 0, "retries_by_code": {}, "slept_ms_total": 0, "backend": None}
+        data = _empty_stats()
         _retry_ctx.set(data)
     return data
 
@@ -34,7 +51,10 @@ def consume_gmail_retry_stats() -> Dict[str, Any]:
         "calls": int,
         "retries_by_code": {"429":2,...},
         "slept_ms_total": 500,
-        "backend": "fake"|"real"|None
+        "backend": "fake"|"real"|None,
+        "hedges": 1,        # duplicados lanzados (utils.hedging)
+        "hedge_wins": 1,    # veces que el duplicado respondió primero
+        "throttled_ms_total": 0   # espera en el governor de cuota (utils.rate_governor)
       }
     """
     data = _ctx_get()
@@ -43,12 +63,57 @@ def consume_gmail_retry_stats() -> Dict[str, Any]:
         "retries_by_code": dict(data.get("retries_by_code", {})),
         "slept_ms_total": int(data.get("slept_ms_total", 0)),
         "backend": data.get("backend"),
+        "hedges": int(data.get("hedges", 0)),
+        "hedge_wins": int(data.get("hedge_wins", 0)),
+        "throttled_ms_total": int(data.get("throttled_ms_total", 0)),
     }
     # reset
-    _retry_ctx.set({"calls": 0, "retries_by_code": {}, "slept_ms_total": 0, "backend": None})
+    _retry_ctx.set(_empty_stats())
     return snapshot
 
 
+def _ctx_record(retries_by_code: Dict[str, int], slept_ms_total: int, backend: str, throttled_ms: int = 0) -> None:
+    """Acumula una llamada exitosa en las métricas del request."""
+    ctx = _ctx_get()
+    ctx["throttled_ms_total"] = int(ctx.get("throttled_ms_total", 0)) + int(throttled_ms)
+    ctx["calls"] = int(ctx.get("calls", 0)) + 1
+    ctx["backend"] = backend
+    agg = ctx.setdefault("retries_by_code", {})
+    for k, v in retries_by_code.items():
+        agg[k] = agg.get(k, 0) + int(v)
+    ctx["slept_ms_total"] = int(ctx.get("slept_ms_total", 0)) + int(slept_ms_total)
+
+
+def record_hedge(*, won: bool) -> None:
+    """Anota un hedge (utils.hedging) en las métricas del request."""
+    ctx = _ctx_get()
+    ctx["hedges"] = int(ctx.get("hedges", 0)) + 1
+    if won:
+        ctx["hedge_wins"] = int(ctx.get("hedge_wins", 0)) + 1
+
+
+def _check_deadline(attempt: int, retries_by_code: Dict[str, int], quota_key: Optional[str]) -> None:
+    """Antes de cada intento: sin tiempo (o con una pausa de cuota más larga que lo que queda) no se llama."""
+    wait = 0.0
+    if quota_key is not None:
+        from utils import rate_governor
+        wait = rate_governor.pause_remaining(quota_key)
+    if deadline.expired() or (wait > 0 and deadline.would_overrun(wait)):
+        deadline.record_cut("gmail_call")
+        raise DeadlineExceeded(
+            f"Deadline del request: intento {attempt} no iniciado.",
+            retries_by_code=retries_by_code, attempts=attempt - 1,
+        )
+
+
+def _backoff_delay_s(attempt: int, base: int, jitter: int) -> float:
+    # intento 1 (fallido) → sleep base; intento 2 → base*2, etc.
+    delay_ms = base * (2 ** (attempt - 1))
+    if jitter > 0:
+        delay_ms += random.randint(-jitter, jitter)
+    return max(0.0, delay_ms / 1000.0)
+
+
 def _extract_status_and_reason(exc: Exception) -> Tuple[Optional[int], str]:
     """
     Intenta extraer status code y una razón útil del error (compatible con googleapiclient y genérico).
@@ -80,6 +145,32 @@ def _extract_status_and_reason(exc: Exception) -> Tuple[Optional[int], str]:
     return status, (reason or "")
 
 
+def _extract_retry_after_s(exc: Exception) -> Optional[float]:
+    """Retry-After en segundos (atributo propio, o header del resp de googleapiclient)."""
+    val = getattr(exc, "retry_after", None)
+    if val is None:
+        resp = getattr(exc, "resp", None)
+        getter = getattr(resp, "get", None)
+        if callable(getter):
+            val = getter("retry-after") or getter("Retry-After")
+    if val is None or val == "":
+        return None
+    try:
+        return max(0.0, float(val))
+    except (TypeError, ValueError):
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(str(val)).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _is_rate_limited(status_code: Optional[int], reason_text: str) -> bool:
+    """429 o 403 por rate/cuota: señal para pausar a todo el proceso, no sólo a este call."""
+    return status_code == 429 or (status_code == 403 and _is_retryable_error(status_code, reason_text))
+
+
 def _is_retryable_error(status_code: Optional[int], reason_text: str) -> bool:
     """
     Política de reintento para Gmail:
@@ -106,6 +197,8 @@ def run_with_retry_gmail(
     jitter_ms: int,
     is_retryable: Callable[[Optional[int], str], bool] = _is_retryable_error,
     sleep_fn: Callable[[float], None] = time.sleep,
+    quota_key: Optional[str] = None,
+    units: int = 0,
 ) -> Tuple[Any, Dict[str, Any]]:
     """
     Ejecuta `call()` con backoff exponencial + jitter controlado.
@@ -114,9 +207,13 @@ def run_with_retry_gmail(
       - retries_by_code: Dict[str,int]
       - last_error: Optional[int]
       - slept_ms_total: int
+      - throttled_ms_total: int (espera en el governor)
       - backend: "fake"|"real"
     Lanza RetryError si se agotan los intentos.
 
+    Con `quota_key`, cada intento reserva `units` en utils.rate_governor y un 429/403
+    de rate pausa a todos los calls de esa llave (Retry-After o el backoff).
+
     NOTA: en modo fake (USE_FAKE_GMAIL=1) hace passthrough sin sleeps.
     """
     # Passthrough en modo FAKE
@@ -127,17 +224,19 @@ def run_with_retry_gmail(
             "retries_by_code": {},
             "last_error": None,
             "slept_ms_total": 0,
+            "throttled_ms_total": 0,
             "backend": "fake",
         }
         # acumula en contexto
-        ctx = _ctx_get()
-        ctx["calls"] = int(ctx.get("calls", 0)) + 1
-        ctx["backend"] = "fake"
+        _ctx_record({}, 0, "fake")
         return result, meta
 
     retries_by_code: Dict[str, int] = {}
     slept_ms_total = 0
+    throttled_ms_total = 0
     last_error_code: Optional[int] = None
+    if quota_key is not None:
+        from utils import rate_governor
 
     tries = max(1, int(max_tries))
     base = max(1, int(base_ms))
@@ -145,6 +244,9 @@ def run_with_retry_gmail(
 
     attempt = 1
     while True:
+        _check_deadline(attempt, retries_by_code, quota_key)
+        if quota_key is not None and units > 0:
+            throttled_ms_total += int(rate_governor.acquire(quota_key, units, sleep_fn) * 1000)
         try:
             result = call()
             meta = {
@@ -152,16 +254,11 @@ def run_with_retry_gmail(
                 "retries_by_code": retries_by_code,
                 "last_error": last_error_code,
                 "slept_ms_total": slept_ms_total,
+                "throttled_ms_total": throttled_ms_total,
                 "backend": "real",
             }
             # acumula en contexto
-            ctx = _ctx_get()
-            ctx["calls"] = int(ctx.get("calls", 0)) + 1
-            ctx["backend"] = "real"
-            agg = ctx.setdefault("retries_by_code", {})
-            for k, v in retries_by_code.items():
-                agg[k] = agg.get(k, 0) + int(v)
-            ctx["slept_ms_total"] = int(ctx.get("slept_ms_total", 0)) + int(slept_ms_total)
+            _ctx_record(retries_by_code, slept_ms_total, "real", throttled_ms_total)
             return result, meta
         except Exception as exc:
             status, reason = _extract_status_and_reason(exc)
@@ -181,12 +278,19 @@ def run_with_retry_gmail(
             retries_by_code[key] = retries_by_code.get(key, 0) + 1
 
             # Calcula backoff exponencial con jitter
-            # intento 1 (fallido) → sleep base
-            # intento 2 → base*2, etc.
-            delay_ms = base * (2 ** (attempt - 1))
-            if jitter > 0:
-                delay_ms += random.randint(-jitter, jitter)
-            delay_s = max(0.0, delay_ms / 1000.0)
+            delay_s = _backoff_delay_s(attempt, base, jitter)
+
+            # Rate limit → pausa coordinada: el próximo acquire de *cualquier* thread espera
+            if quota_key is not None and _is_rate_limited(status, reason):
+                rate_governor.pause(quota_key, _extract_retry_after_s(exc) or delay_s)
+
+            # Un backoff que pasa el deadline no se duerme: el request entrega lo que tenga
+            if deadline.would_overrun(delay_s):
+                deadline.record_cut("retry_sleep")
+                raise DeadlineExceeded(
+                    f"Deadline del request: backoff de {delay_s:.2f}s tras HTTP={status} omitido.",
+                    retries_by_code=retries_by_code, attempts=attempt,
+                ) from exc
 
             # Duerme y reintenta
             try:
@@ -197,19 +301,139 @@ def run_with_retry_gmail(
             attempt += 1
 
 
+async def run_with_retry_gmail_async(
+    call: Callable[[], Awaitable[Any]],
+    *,
+    max_tries: int,
+    base_ms: int,
+    jitter_ms: int,
+    is_retryable: Callable[[Optional[int], str], bool] = _is_retryable_error,
+    quota_key: Optional[str] = None,
+    units: int = 0,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Versión asyncio de `run_with_retry_gmail` (misma política, métricas, governor y RetryError).
+    El backoff usa asyncio.sleep: no bloquea el event loop.
+    """
+    retries_by_code: Dict[str, int] = {}
+    slept_ms_total = 0
+    throttled_ms_total = 0
+    if quota_key is not None:
+        from utils import rate_governor
+    tries = max(1, int(max_tries))
+    base = max(1, int(base_ms))
+    jitter = max(0, int(jitter_ms))
+
+    attempt = 1
+    while True:
+        _check_deadline(attempt, retries_by_code, quota_key)
+        if quota_key is not None and units > 0:
+            throttled_ms_total += int(await rate_governor.acquire_async(quota_key, units) * 1000)
+        try:
+            result = await call()
+            _ctx_record(retries_by_code, slept_ms_total, "real", throttled_ms_total)
+            meta = {
+                "attempts": attempt,
+                "retries_by_code": retries_by_code,
+                "last_error": None,
+                "slept_ms_total": slept_ms_total,
+                "throttled_ms_total": throttled_ms_total,
+                "backend": "real",
+            }
+            return result, meta
+        except Exception as exc:
+            status, reason = _extract_status_and_reason(exc)
+            if attempt >= tries or not is_retryable(status, reason):
+                raise RetryError(
+                    f"Fallo tras {attempt} intento(s). Último error HTTP={status}.",
+                    last_error_code=status,
+                    retries_by_code=retries_by_code,
+                    attempts=attempt,
+                ) from exc
+
+            key = str(status) if status is not None else "unknown"
+            retries_by_code[key] = retries_by_code.get(key, 0) + 1
+
+            delay_s = _backoff_delay_s(attempt, base, jitter)
+            if quota_key is not None and _is_rate_limited(status, reason):
+                rate_governor.pause(quota_key, _extract_retry_after_s(exc) or delay_s)
+            if deadline.would_overrun(delay_s):
+                deadline.record_cut("retry_sleep")
+                raise DeadlineExceeded(
+                    f"Deadline del request: backoff de {delay_s:.2f}s tras HTTP={status} omitido.",
+                    retries_by_code=retries_by_code, attempts=attempt,
+                ) from exc
+            try:
+                await asyncio.sleep(delay_s)
+            finally:
+                slept_ms_total += max(0, int(delay_s * 1000))
+            attempt += 1
+
+
 # Atajo: envoltorio práctico usando un dict de settings (p.ej. utils.config.get_gmail_settings())
-def gmail_retry_wrapper(call: Callable[[], Any], settings: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+def gmail_retry_wrapper(call: Callable[[], Any], settings: Dict[str, Any], *, units: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
     """
     Envuelve `call` con retry usando un dict de settings:
       {
         "backoff_max_tries": int,
         "backoff_base_ms": int,
-        "backoff_jitter_ms": int
+        "backoff_jitter_ms": int,
+        "governor_enabled": bool, ...
       }
+    `units`: costo en quota units de Gmail del call (default messages.get = 5;
+    ver utils.rate_governor.QUOTA_UNITS).
     """
+    from utils.rate_governor import DEFAULT_UNITS, configure_from_settings
     return run_with_retry_gmail(
         call,
         max_tries=int(settings.get("backoff_max_tries", 3)),
         base_ms=int(settings.get("backoff_base_ms", 200)),
         jitter_ms=int(settings.get("backoff_jitter_ms", 100)),
+        quota_key=configure_from_settings(settings),
+        units=DEFAULT_UNITS if units is None else int(units),
+    )
+
+
+def gmail_guarded_call(cb_key: str, call: Callable[[], Any], settings: Dict[str, Any], *, units: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    gmail_retry_wrapper detrás del circuit breaker de `cb_key` (p.ej. "gmail:messages.list").
+    Breaker abierto → RetryError(503) sin llamar a Gmail; fallo tras retries → cuenta
+    para el breaker y se propaga.
+    """
+    from utils.circuit_breaker import (
+        before_call as cb_before, after_success as cb_ok, after_failure as cb_fail,
+        configure_from_settings as cb_conf,
+    )
+    cb_enabled = settings.get("cb_enabled", True)
+    if cb_enabled:
+        cb_conf(cb_key, settings)
+        allow, retry_after = cb_before(cb_key)
+        if not allow:
+            raise RetryError(
+                f"Circuit breaker abierto para {cb_key} (retry_after={retry_after:.0f}s).",
+                last_error_code=503,
+                retries_by_code={},
+                attempts=0,
+            )
+    try:
+        result = gmail_retry_wrapper(call, settings, units=units)
+    except RetryError as e:
+        if cb_enabled:
+            cb_fail(cb_key, int(e.last_error_code or 429))
+        raise
+    if cb_enabled:
+        cb_ok(cb_key)
+    return result
+
+
+async def gmail_retry_wrapper_async(call: Callable[[], Awaitable[Any]], settings: Dict[str, Any], *, units: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
+    """Igual que `gmail_retry_wrapper`, para corutinas (engine async)."""
+    from utils.rate_governor import DEFAULT_UNITS, configure_from_settings
+    return await run_with_retry_gmail_async(
+        call,
+        max_tries=int(settings.get("backoff_max_tries", 3)),
+        base_ms=int(settings.get("backoff_base_ms", 200)),
+        jitter_ms=int(settings.get("backoff_jitter_ms", 100)),
+        quota_key=configure_from_settings(settings),
+        units=DEFAULT_UNITS if units is None else int(units),
     )
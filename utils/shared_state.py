@@ -0,0 +1,91 @@
+# utils/shared_state.py
+"""
+Archivo SQLite (modo WAL) compartido por todos los workers del host.
+
+Con `cache.backend = "sqlite"` lo usan:
+  - utils.cache      → tabla `cache`: un hit de un worker sirve a todos
+  - utils.circuit_breaker → tabla `breakers`: si un worker abre el breaker, los demás
+    dejan de pegarle a Gmail
+
+Con `cache.backend = "memory"` (default) nada de esto se usa. Si SQLite falla se
+deshabilita y los módulos vuelven a su estado en memoria (nunca rompe un request).
+"""
+from __future__ import annotations
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from utils.config import get_cache_settings
+from utils.sqlite_wal import WalDB, resolve_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key         TEXT PRIMARY KEY,
+    prefix      TEXT,
+    value       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    fresh_until REAL NOT NULL,
+    expires_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access);
+CREATE INDEX IF NOT EXISTS idx_cache_prefix ON cache(prefix);
+CREATE TABLE IF NOT EXISTS breakers (
+    key   TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+_DB = WalDB("shared_state", _SCHEMA)
+
+
+def shared_enabled() -> bool:
+    """True si el backend compartido está configurado y operativo."""
+    try:
+        backend = get_cache_settings().get("backend", "memory")
+    except Exception:
+        return False
+    return backend == "sqlite" and available()
+
+
+def available() -> bool:
+    """False si SQLite falló antes en este proceso (los módulos vuelven a memoria)."""
+    return _DB.available()
+
+
+def db_path() -> Path:
+    return resolve_path(get_cache_settings().get("sqlite_path"), "data/shared_cache.sqlite3")
+
+
+def conn() -> sqlite3.Connection:
+    """Una conexión por thread (autocommit; transacciones explícitas vía `immediate`)."""
+    return _DB.conn(db_path())
+
+
+@contextmanager
+def immediate() -> Iterator[sqlite3.Connection]:
+    """Transacción con lock de escritura tomado al inicio (read-modify-write entre procesos)."""
+    c = conn()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        yield c
+    except BaseException:
+        c.execute("ROLLBACK")
+        raise
+    else:
+        c.execute("COMMIT")
+
+
+def disable(exc: Exception) -> None:
+    _DB.disable(exc)
+
+
+def disabled_reason() -> Optional[str]:
+    return _DB.disabled_reason
+
+
+def _reset_for_tests() -> None:
+    _DB.reset()
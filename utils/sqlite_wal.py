@@ -0,0 +1,82 @@
+# utils/sqlite_wal.py
+"""
+Conexiones SQLite (modo WAL) compartidas por los stores persistentes del host:
+utils.shared_state, utils.message_store y utils.summary_store.
+
+  - una conexión por thread (sqlite3 no comparte conexiones entre threads), en
+    autocommit; se reabre si cambia el path configurado
+  - estado "deshabilitado": al primer error de SQLite el store pasa a passthrough
+    (nunca rompe un request) y lo reporta en sus métricas
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from utils.config import PROJECT_ROOT
+
+# Re-tocar last_access sólo si pasó este tiempo (evita un write por cada hit)
+TOUCH_EVERY_S = 60.0
+
+
+def resolve_path(value: object, default: str) -> Path:
+    """Path del archivo: relativo a la raíz del proyecto salvo que sea absoluto."""
+    p = Path(str(value or default))
+    return p if p.is_absolute() else (PROJECT_ROOT / p)
+
+
+class WalDB:
+    """
+    Conexión por thread a un archivo SQLite con `schema` aplicado.
+    `on_open(conn, path)` corre cada vez que un thread abre su conexión.
+    """
+
+    def __init__(self, name: str, schema: str,
+                 on_open: Optional[Callable[[sqlite3.Connection, str], None]] = None):
+        self.name = name
+        self._schema = schema
+        self._on_open = on_open
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.disabled_reason: Optional[str] = None
+
+    def conn(self, path: Path) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is not None and getattr(self._local, "path", None) == str(path):
+            return c
+        path.parent.mkdir(parents=True, exist_ok=True)
+        c = sqlite3.connect(str(path), timeout=5.0, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.executescript(self._schema)
+        self._local.conn = c
+        self._local.path = str(path)
+        if self._on_open is not None:
+            self._on_open(c, str(path))
+        return c
+
+    def available(self) -> bool:
+        return self.disabled_reason is None
+
+    def disable(self, exc: Exception) -> None:
+        # SQLite roto/no disponible: el store sigue en passthrough (se avisa una vez)
+        with self._lock:
+            if self.disabled_reason is not None:
+                return
+            self.disabled_reason = f"{type(exc).__name__}: {exc}"
+        print(f"⚠️ {self.name} deshabilitado: {self.disabled_reason}")
+
+    def reset(self) -> None:
+        """Cierra la conexión de este thread y rehabilita (tests)."""
+        c = getattr(self._local, "conn", None)
+        if c is not None:
+            try:
+                c.close()
+            except Exception:
+                pass
+        self._local.conn = None
+        self._local.path = None
+        with self._lock:
+            self.disabled_reason = None
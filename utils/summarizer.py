@@ -1,6 +1,8 @@
 # utils/summarizer.py
 from typing import List, Dict, Any, Optional, Tuple
-import os, re, base64, html, time
+import os, re, time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
 try:
@@ -29,6 +31,8 @@ def _cfg(path: str, default=None):
 PRIMARY_EMAIL: str = (_cfg("gmail.primary_email", "carolina@home.cl") or "").lower()
 TIMEZONE_STR: str = _cfg("gmail.timezone", "America/Santiago")
 GMAIL_MAX_RESULTS: int = int(_cfg("gmail.max_results", 10))
+GMAIL_CACHE_TTL_S: int = int(_cfg("gmail.cache_ttl_seconds", 60))
+GMAIL_CACHE_STALE_S: int = int(_cfg("gmail.cache_stale_seconds", 30))
 
 # Summarizer params
 SUMMARY_MAX_CHARS: int = int(_cfg("summarizer.max_chars", 280))         # límite contrato
@@ -36,6 +40,8 @@ SUMMARY_INPUT_CHARS: int = int(_cfg("summarizer.input_chars", 1200))     # conte
 SUMMARY_CHUNK_BYTES: int = int(_cfg("summarizer.chunk_bytes", 2048))
 SUMMARY_CHUNK_OVERLAP: int = int(_cfg("summarizer.chunk_overlap", 200))
 SUMMARY_FORCE_ONE_SENTENCE: bool = bool(_cfg("summarizer.force_one_sentence", True))
+# Mensajes resumidos a la vez por request; las generaciones LLM las acota la cola de llm_client
+SUMMARY_PARALLELISM: int = max(1, min(32, int(_cfg("summarizer.parallelism", os.getenv("SUMMARY_PARALLELISM", 4)))))
 
 # Modo LLM (se apaga en fake)
 LLM_MODE: str = str(_cfg("llm.mode", "off")).lower()
@@ -50,20 +56,19 @@ TZ_SCL = ZoneInfo(TIMEZONE_STR) if ZoneInfo else timezone.utc
 # LLM local (opcional). Si falla, devolvemos None para forzar fallback.
 try:
     from core.llm.llm_client import parafrasear_una_oracion
+    from core.llm.llm_client import MODEL_PATH as LLM_MODEL_PATH, PROMPT_VERSION as LLM_PROMPT_VERSION
 except Exception:
+    LLM_MODEL_PATH, LLM_PROMPT_VERSION = "", ""
     def parafrasear_una_oracion(texto: str, max_chars: int = 220) -> Optional[str]:
         return None
 
+# Resúmenes LLM ya generados (persistentes entre requests, usuarios y reinicios)
+from utils.summary_store import summary_get, summary_key, summary_put
+
 # --- Campos de Gmail (modo real) ---
 if not USE_FAKE_GMAIL:
     from core.gmail.auth import get_authenticated_service  # noqa: F401
 
-MESSAGE_FIELDS_LIST = "messages(id),nextPageToken"
-MESSAGE_FIELDS_GET_FULL = (
-    "id,internalDate,labelIds,snippet,"
-    "payload(mimeType,body/data,parts,headers(name,value))"
-)
-
 # Excluir categorías no primarias
 EXCLUDED_LABELS = {
     "CATEGORY_SOCIAL", "CATEGORY_PROMOTIONS", "CATEGORY_UPDATES",
@@ -72,129 +77,10 @@ EXCLUDED_LABELS = {
 
 # ====================== Utils comunes ======================
 
-def _b64url_to_bytes(data) -> bytes:
-    """Intenta decodificar base64-url; si falla, trata el input como texto UTF-8."""
-    if data is None:
-        return b""
-    if isinstance(data, (bytes, bytearray)):
-        try:
-            s = bytes(data)
-            s += b"=" * ((4 - len(s) % 4) % 4)
-            return base64.urlsafe_b64decode(s)
-        except Exception:
-            return bytes(data)
-    if isinstance(data, str):
-        try:
-            s = data.encode("ascii")
-            s += b"=" * ((4 - len(s) % 4) % 4)
-            return base64.urlsafe_b64decode(s)
-        except Exception:
-            return data.encode("utf-8", errors="ignore")
-    return b""
-
-def _strip_html(s: str) -> str:
-    """Quita tags HTML, remueve script/style, decodifica entidades y colapsa espacios."""
-    if not s:
-        return ""
-    s = re.sub(r"(?is)<(script|style)[^>]*>.*?</\1\s*>", " ", s)
-    s = re.sub(r"(?is)<br\s*/?>", "\n", s)
-    s = re.sub(r"(?is)</p\s*>", "\n", s)
-    s = re.sub(r"(?is)<[^>]+>", " ", s)
-    s = html.unescape(s)
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{2,}", "\n", s)
-    return s.strip()
-
-# -------- payload (plain/html) --------
-
-def _walk_payload(part: Dict[str, Any]) -> Tuple[str, str]:
-    """Extrae texto plano y HTML del payload. Tolera base64-url/text y recorre subpartes."""
-    if not part:
-        return "", ""
-    plain_acc, html_acc = "", ""
+# Decodificación de cuerpo + campos parseados: utils.message_record (una vez por mensaje)
+from utils.message_record import NormalizedMessage, label_mask, normalize_all
 
-    mime = (part.get("mimeType") or "").lower()
-    body = part.get("body") or {}
-
-    # 1) body.data (base64-url o texto crudo)
-    if "data" in body:
-        try:
-            text = _b64url_to_bytes(body["data"]).decode(errors="ignore")
-            if mime.startswith("text/html"):
-                html_acc += text
-            elif mime.startswith("text/plain") or not mime:
-                plain_acc += text
-            else:
-                plain_acc += text
-        except Exception:
-            pass
-
-    # 2) body.text (ya decodificado)
-    if "text" in body and isinstance(body["text"], str):
-        if mime.startswith("text/html"):
-            html_acc += body["text"]
-        else:
-            plain_acc += body["text"]
-
-    # 3) Subpartes
-    for sp in (part.get("parts") or []):
-        p_plain, p_html = _walk_payload(sp)
-        plain_acc += p_plain
-        html_acc += p_html
-
-    return plain_acc, html_acc
-
-def _extract_text_from_payload(payload: Dict[str, Any]) -> str:
-    try:
-        plain, html_raw = _walk_payload(payload)
-    except Exception:
-        plain, html_raw = "", ""
-    if plain.strip():
-        # si el "plain" trae tags, igual los removemos
-        if "<" in plain and ">" in plain:
-            plain = _strip_html(plain)
-        return plain.strip()
-    if html_raw.strip():
-        return _strip_html(html_raw).strip()
-    return ""
-
-def _headers_lower(meta: Dict[str, Any]) -> Dict[str, str]:
-    headers = (meta.get("payload", {}) or {}).get("headers", []) or []
-    return {h.get("name", "").lower(): h.get("value", "") for h in headers if isinstance(h, dict)}
-
-def _msg_datetime_local(meta: Dict[str, Any]) -> Optional[datetime]:
-    """Fecha del mensaje: ts (fixtures) → Date header → internalDate. Devuelve timezone de config."""
-    try:
-        # 0) ts (ISO en fixtures fake)
-        ts_iso = meta.get("ts")
-        if isinstance(ts_iso, str) and ts_iso:
-            try:
-                dt = datetime.fromisoformat(ts_iso)
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=timezone.utc)
-                return dt.astimezone(TZ_SCL) if TZ_SCL else dt
-            except Exception:
-                pass
-
-        # 1) Header Date
-        hdrs = _headers_lower(meta)
-        date_hdr = hdrs.get("date")
-        if date_hdr:
-            from email.utils import parsedate_to_datetime
-            dt = parsedate_to_datetime(date_hdr)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt.astimezone(TZ_SCL) if TZ_SCL else dt
-
-        # 2) internalDate (epoch ms)
-        internal = meta.get("internalDate")
-        if internal is not None:
-            ts_ms = int(internal) if isinstance(internal, str) else int(internal)
-            dt = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc)
-            return dt.astimezone(TZ_SCL) if TZ_SCL else dt
-        return None
-    except Exception:
-        return None
+_EXCLUDED_MASK = label_mask(EXCLUDED_LABELS)
 
 # -------- Limpieza de texto del cuerpo --------
 
@@ -346,9 +232,10 @@ def chunk_text_if_needed(text: str) -> List[str]:
 
 # ====================== Resumen (LLM + fallback) ======================
 
-def _summarize_one(text: str, budget: int) -> str:
+def _summarize_one(text: str, budget: int, trace: Optional[Dict[str, bool]] = None) -> str:
     """
     Resume en 1 oración (≤ budget). Si hay LLM local, lo usa; si no, fallback extractivo.
+    `trace["fallback"]` queda en True si el LLM no respondió (cola, deadline, breaker, error).
     """
     text = (text or "").strip()
     if not text:
@@ -359,6 +246,8 @@ def _summarize_one(text: str, budget: int) -> str:
             out = parafrasear_una_oracion(texto=text, max_chars=budget)
         except Exception:
             out = None
+        if not out and trace is not None:
+            trace["fallback"] = True
     if out:
         # Limpieza de encabezados tipo "Resumen:"
         out = re.sub(r"^#+\s*resumen.*?:\s*", "", out, flags=re.IGNORECASE)
@@ -367,16 +256,16 @@ def _summarize_one(text: str, budget: int) -> str:
     out = _enforce_one_sentence(out or text, budget)
     return out
 
-def summarize_chunks(chunks: List[str], budget: int) -> List[str]:
+def summarize_chunks(chunks: List[str], budget: int, trace: Optional[Dict[str, bool]] = None) -> List[str]:
     """Resume cada chunk en 1 oración (≤ budget)."""
     results: List[str] = []
     for ch in chunks:
-        s = _summarize_one(ch, budget)
+        s = _summarize_one(ch, budget, trace)
         if s:
             results.append(s)
     return results
 
-def merge_chunk_summaries(summaries: List[str], budget: int) -> str:
+def merge_chunk_summaries(summaries: List[str], budget: int, trace: Optional[Dict[str, bool]] = None) -> str:
     """
     Fusiona mini-resúmenes en una sola oración (≤ budget).
     Estrategia simple: unir con '; ' y volver a resumir 1 oración.
@@ -386,18 +275,16 @@ def merge_chunk_summaries(summaries: List[str], budget: int) -> str:
     if len(summaries) == 1:
         return _enforce_one_sentence(summaries[0], budget)
     fused = "; ".join(summaries)
-    return _summarize_one(fused, budget)
+    return _summarize_one(fused, budget, trace)
 
 # ====================== Composición de ítem ======================
 
-def _compose_item(meta: Dict[str, Any], clean_body: str) -> Optional[str]:
-    if not meta:
+def _compose_item(rec: NormalizedMessage, clean_body: str) -> Optional[str]:
+    if not rec:
         return None
-    headers = _headers_lower(meta)
-    frm = (headers.get("from") or "").strip()
-    subject = (headers.get("subject") or "").strip()
-    snippet = (meta.get("snippet") or "").strip()
-    base_text = clean_body if clean_body else snippet
+    frm = rec.sender
+    subject = rec.subject
+    base_text = clean_body if clean_body else rec.snippet
 
     hdr = f"De: {frm} | Asunto: {subject} — "
     budget = max(60, SUMMARY_MAX_CHARS - len(hdr))
@@ -406,13 +293,22 @@ def _compose_item(meta: Dict[str, Any], clean_body: str) -> Optional[str]:
     summary: Optional[str] = None
     text = (base_text or "").strip()
 
+    # Con LLM, el resumen final se reutiliza mientras no cambien texto, modelo, prompt ni budget
+    key = (summary_key(rec.id, text, LLM_MODEL_PATH, f"{LLM_PROMPT_VERSION}/{int(SUMMARY_FORCE_ONE_SENTENCE)}", budget)
+           if text and LLM_MODE == "local" else None)
+    if key:
+        summary = summary_get(key)
+        if summary:
+            return _smart_cut((hdr + summary).strip(), SUMMARY_MAX_CHARS)
+
+    trace: Dict[str, bool] = {"fallback": False}
     if text:
         if _utf8_len(text) > SUMMARY_CHUNK_BYTES:
             chunks = chunk_text_if_needed(text)
-            mini = summarize_chunks(chunks, budget)
-            summary = merge_chunk_summaries(mini, budget)
+            mini = summarize_chunks(chunks, budget, trace)
+            summary = merge_chunk_summaries(mini, budget, trace)
         else:
-            summary = _summarize_one(text, budget)
+            summary = _summarize_one(text, budget, trace)
         if summary and _too_similar(text, summary):
             summary = None  # fuerza fallback extractivo
 
@@ -422,97 +318,48 @@ def _compose_item(meta: Dict[str, Any], clean_body: str) -> Optional[str]:
     if SUMMARY_FORCE_ONE_SENTENCE and summary:
         summary = _enforce_one_sentence(summary, budget)
 
+    # Un fallback por cola llena / deadline / breaker no se guarda: la próxima vez se reintenta el LLM
+    if key and summary and not trace["fallback"]:
+        summary_put(key, rec.id, summary)
+
     out = (hdr + (summary or "")).strip()
     return _smart_cut(out, SUMMARY_MAX_CHARS)
 
-# ====================== Gmail REAL helpers ======================
-
-def _primary_query(base_query: Optional[str] = None) -> str:
-    parts = [
-        "category:primary", "-category:social", "-category:promotions",
-        "-category:updates", "-category:forums", "-in:spam", "-in:trash",
-    ]
-    if base_query:
-        parts.append(f"({base_query})")
-    return " ".join(parts)
-
-def _list_primary_message_ids(service, max_results: int, base_query: Optional[str]) -> List[str]:
-    q = _primary_query(base_query)
-    resp = (
-        service.users()
-        .messages()
-        .list(
-            userId="me",
-            q=q,
-            labelIds=["INBOX"],
-            maxResults=max_results,
-            includeSpamTrash=False,
-            fields=MESSAGE_FIELDS_LIST,
-        )
-        .execute()
-        or {}
-    )
-    return [m["id"] for m in resp.get("messages", []) or []]
-
-def _get_message_full(service, msg_id: str) -> Dict[str, Any]:
-    return (
-        service.users()
-        .messages()
-        .get(
-            userId="me",
-            id=msg_id,
-            format="full",
-            fields=MESSAGE_FIELDS_GET_FULL,
-        )
-        .execute()
-        or {}
-    )
-
 # ====================== Filtro por fecha & helpers ======================
 
-def _is_to_me(meta: Dict[str, Any]) -> bool:
-    """True si el correo va dirigido al PRIMARY_EMAIL (header o campo top-level)."""
-    hdrs = _headers_lower(meta)
-    to_hdr = (hdrs.get("to") or "").lower()
-    if PRIMARY_EMAIL in to_hdr:
-        return True
-    # Fallback para fixtures: campo top-level "to": [...]
-    to_list = meta.get("to") or []
-    for x in to_list:
-        if isinstance(x, str) and PRIMARY_EMAIL in x.lower():
-            return True
-    return False
-
-def _filter_messages_for_date(msgs: List[Dict[str, Any]], target_date: datetime.date) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    for meta in msgs:
-        # respetar flag del fixture (cc_only)
-        if meta.get("meta", {}).get("cc_only", False):
-            continue
-        dt_local = _msg_datetime_local(meta)
-        if not (dt_local and dt_local.date() == target_date):
-            continue
-        if not _is_to_me(meta):
-            continue
-        out.append(meta)
-    return out
+def _filter_messages_for_date(msgs: List[NormalizedMessage], target_date: datetime.date) -> List[NormalizedMessage]:
+    # cc_only respeta el flag del fixture; to_me: header To o campo top-level "to"
+    return [r for r in msgs if not r.cc_only and r.local_date == target_date and r.to_me]
+
+def _summarize_item(rec: NormalizedMessage) -> Optional[str]:
+    # _clean sólo mira los primeros SUMMARY_INPUT_CHARS: no se extrae más que eso
+    clean = _clean(rec.body_head(SUMMARY_INPUT_CHARS))
+    return _compose_item(rec, clean)
 
-def _format_list(items: List[Dict[str, Any]]) -> str:
+def _format_list(items: List[NormalizedMessage], parallelism: Optional[int] = None) -> str:
+    """
+    Un ítem por mensaje, en el orden de `items`. Extracción, limpieza y resumen de
+    cada mensaje corren en paralelo (hasta `parallelism` por request, default
+    summarizer.parallelism); las llamadas al LLM esperan turno en la cola de llm_client.
+    """
     if not items:
         return "No hay correos para la fecha indicada."
-    lines: List[str] = []
-    for meta in items:
-        body = _extract_text_from_payload(meta.get("payload") or {})
-        clean = _clean(body)
-        formatted = _compose_item(meta, clean)
-        if formatted:
-            lines.append(formatted)
+    workers = min(len(items), max(1, int(parallelism or SUMMARY_PARALLELISM)))
+    if workers <= 1:
+        results = [_summarize_item(rec) for rec in items]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary") as ex:
+            # copy_context: deadline y métricas del request siguen en los workers
+            futures = [ex.submit(contextvars.copy_context().run, _summarize_item, rec) for rec in items]
+            results = [f.result() for f in futures]
+    lines = [r for r in results if r]
     return "\n-----\n".join(lines) if lines else "No hay correos para la fecha indicada."
 
 # ====================== Endpoints de resumen ======================
 
-def _resumen_para_fecha(target_date: datetime.date, cantidad: int = 10) -> str:
-    """Motor común para HOY/AYER, soporta fake y real."""
+def _resumen_para_fecha(target_date: datetime.date, cantidad: int = 10,
+                        parallelism: Optional[int] = None) -> str:
+    """Motor común para HOY/AYER, soporta fake y real. `parallelism`: tope de este request."""
     t0 = time.perf_counter()
     n = max(1, min(int(cantidad), GMAIL_MAX_RESULTS))
 
@@ -529,63 +376,47 @@ def _resumen_para_fecha(target_date: datetime.date, cantidad: int = 10) -> str:
         except TypeError:
             all_msgs = listar()  # compat firma
 
-        filtered = _filter_messages_for_date(all_msgs, target_date)
+        filtered = _filter_messages_for_date(normalize_all(all_msgs), target_date)
 
         # Orden explícito por fecha desc (por si acaso)
-        filtered.sort(
-            key=lambda m: (_msg_datetime_local(m) or datetime.min.replace(tzinfo=timezone.utc)),
-            reverse=True
-        )
+        filtered.sort(key=lambda r: r.epoch_ms, reverse=True)
 
         items = filtered[:n]  # aplicar límite después del filtro
         print(f"[DEBUG] correos_fecha={target_date.isoformat()} detectados={len(items)} (fake)")
 
-        out = _format_list(items)
+        out = _format_list(items, parallelism)
         dt_ms = (time.perf_counter() - t0) * 1000.0
         print(f"resumen_fecha backend=fake items={len(items)} duration_ms={dt_ms:.2f}")
         return out if items else "No hay correos para la fecha indicada."
 
     # --- REAL ---
+    # Ventana ~2d compartida (core.gmail.snapshot): se filtra por fecha local sobre
+    # la metadata y sólo se bajan cuerpos de los `n` que se van a resumir.
     try:
-        from core.gmail.auth import get_authenticated_service  # lazy import
-        service = get_authenticated_service()
-    except Exception as e:
-        print(f"resumen_fecha backend=real error_service={e}")
-        return "No se pudo construir el servicio de Gmail."
-
-    # Traemos ~2d y filtramos por fecha exacta local
-    try:
-        ids = _list_primary_message_ids(service, n, base_query="newer_than:2d")
+        from core.gmail.snapshot import get_snapshot
+        snap = get_snapshot()
     except Exception as e:
-        print(f"resumen_fecha backend=real error_list_ids={e}")
+        print(f"resumen_fecha backend=real error_snapshot={e}")
         return "No fue posible listar mensajes recientes."
 
-    if not ids:
+    candidates = _filter_messages_for_date(snap.records(), target_date)[:n]
+    if not candidates:
         return "No hay correos para la fecha indicada."
 
-    msgs: List[Dict[str, Any]] = []
-    for mid in ids:
-        try:
-            meta = _get_message_full(service, mid)
-        except Exception:
-            continue
-        if not meta:
-            continue
-        if set(meta.get("labelIds", []) or []) & EXCLUDED_LABELS:
-            continue
-        msgs.append(meta)
+    msgs = [r for r in snap.with_bodies([c.id for c in candidates])
+            if not r.has_any_label(_EXCLUDED_MASK)]
 
     items = _filter_messages_for_date(msgs, target_date)
-    out = _format_list(items)
+    out = _format_list(items, parallelism)
     dt_ms = (time.perf_counter() - t0) * 1000.0
     print(f"resumen_fecha backend=real items={len(items)} duration_ms={dt_ms:.2f}")
     return out if items else "No hay correos para la fecha indicada."
 
-def resumen_correos_hoy(cantidad: int = 10) -> str:
+def resumen_correos_hoy(cantidad: int = 10, parallelism: Optional[int] = None) -> str:
     now_local = datetime.now(TZ_SCL) if TZ_SCL else datetime.now(timezone.utc)
-    return _resumen_para_fecha(now_local.date(), cantidad=cantidad)
+    return _resumen_para_fecha(now_local.date(), cantidad=cantidad, parallelism=parallelism)
 
-def resumen_correos_ayer(cantidad: int = 10) -> str:
+def resumen_correos_ayer(cantidad: int = 10, parallelism: Optional[int] = None) -> str:
     now_local = datetime.now(TZ_SCL) if TZ_SCL else datetime.now(timezone.utc)
     yday = (now_local - timedelta(days=1)).date()
-    return _resumen_para_fecha(yday, cantidad=cantidad)
+    return _resumen_para_fecha(yday, cantidad=cantidad, parallelism=parallelism)
@@ -0,0 +1,210 @@
+# utils/summary_store.py
+"""
+Store persistente (SQLite, modo WAL) de resúmenes generados por el LLM local.
+
+Un resumen depende sólo del texto que se le pasó al modelo y de cómo se generó,
+así que la key es sha256 de (id del mensaje, hash del texto limpio, modelo,
+versión del prompt, max_chars). Mientras no cambie ninguno de esos, el mismo
+correo no se vuelve a resumir en "resumen de hoy" / "de ayer", entre usuarios ni
+después de un reinicio.
+
+  - summaries: key -> resumen (evicción LRU por last_access al pasar summary_store.max_mb)
+  - métricas: hits / misses / puts / evictions + hit_rate (health)
+
+Igual que utils.message_store: compartido entre workers del mismo host y, si está
+deshabilitado (o SQLite falla), todas las funciones hacen passthrough.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.config import get_summary_store_settings
+from utils.sqlite_wal import TOUCH_EVERY_S, WalDB, resolve_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key         TEXT PRIMARY KEY,
+    msg_id      TEXT NOT NULL,
+    summary     TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_last_access ON summaries(last_access);
+"""
+
+_LOCK = threading.RLock()
+_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+_STATE: Dict[str, Any] = {"path": None, "size_bytes": None}
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _settings() -> Dict[str, Any]:
+    return get_summary_store_settings()
+
+
+def _enabled() -> bool:
+    return bool(_settings().get("enabled", False)) and _DB.available()
+
+
+def _db_path() -> Path:
+    return resolve_path(_settings().get("path"), "data/summary_store.sqlite3")
+
+
+def _on_open(conn: sqlite3.Connection, path: str) -> None:
+    with _LOCK:
+        if _STATE["path"] != path:
+            _STATE["path"] = path
+            row = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()
+            _STATE["size_bytes"] = int(row[0] or 0)
+
+
+_DB = WalDB("summary_store", _SCHEMA, on_open=_on_open)
+
+
+def _conn() -> sqlite3.Connection:
+    """Una conexión por thread (el summarizer resume en un pool)."""
+    return _DB.conn(_db_path())
+
+
+def _disable(exc: Exception) -> None:
+    _DB.disable(exc)
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] = _STATS.get(name, 0) + n
+
+
+def summary_key(msg_id: str, text: str, model: str, prompt_version: str, max_chars: int) -> str:
+    """Key estable del resumen de `text` (texto limpio que recibe el modelo)."""
+    text_hash = hashlib.sha256((text or "").encode("utf-8", errors="ignore")).hexdigest()
+    raw = "\x1f".join((str(msg_id or ""), text_hash, str(model or ""), str(prompt_version or ""), str(int(max_chars))))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def summary_get(key: str) -> Optional[str]:
+    """Resumen guardado para `key` o None (deshabilitado / no está)."""
+    if not key or not _enabled():
+        return None
+    try:
+        conn = _conn()
+        row = conn.execute("SELECT summary, last_access FROM summaries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            now = _now()
+            if now - float(row[1]) >= TOUCH_EVERY_S:
+                conn.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (now, key))
+    except sqlite3.Error as e:
+        _disable(e)
+        return None
+    if row is None:
+        _count("misses")
+        return None
+    _count("hits")
+    return str(row[0])
+
+
+def summary_put(key: str, msg_id: str, summary: str) -> None:
+    """Guarda el resumen y aplica evicción por tamaño."""
+    if not key or not summary or not _enabled():
+        return
+    size = len(summary.encode("utf-8")) + len(key) + len(msg_id or "")
+    now = _now()
+    try:
+        conn = _conn()
+        prev = conn.execute("SELECT size FROM summaries WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO summaries (key, msg_id, summary, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, msg_id or "", summary, size, now, now),
+        )
+        with _LOCK:
+            _STATE["size_bytes"] = int(_STATE["size_bytes"] or 0) + size - (int(prev[0]) if prev else 0)
+        _count("puts")
+        _maybe_evict(conn)
+    except sqlite3.Error as e:
+        _disable(e)
+
+
+def _maybe_evict(conn: sqlite3.Connection) -> None:
+    """LRU por last_access hasta bajar al 90% de max_mb."""
+    max_bytes = int(_settings().get("max_mb", 16)) * 1024 * 1024
+    with _LOCK:
+        current = int(_STATE["size_bytes"] or 0)
+    if current <= max_bytes:
+        return
+    # Otros workers también escriben: recalculamos el tamaño real antes de evictar
+    current = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0] or 0)
+    if current <= max_bytes:
+        with _LOCK:
+            _STATE["size_bytes"] = current
+        return
+    target = int(max_bytes * 0.9)
+    freed = 0
+    evicted = 0
+    rows = conn.execute("SELECT key, size FROM summaries ORDER BY last_access ASC").fetchall()
+    for key, size in rows:
+        if current - freed <= target:
+            break
+        conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+        freed += int(size)
+        evicted += 1
+    with _LOCK:
+        _STATE["size_bytes"] = current - freed
+    _count("evictions", evicted)
+
+
+# ---------------- métricas / mantenimiento ----------------
+
+def summary_store_stats() -> Dict[str, Any]:
+    with _LOCK:
+        stats = dict(_STATS)
+        size_bytes = _STATE["size_bytes"]
+        disabled_reason = _DB.disabled_reason
+    lookups = stats["hits"] + stats["misses"]
+    entries = None
+    if _enabled():
+        try:
+            conn = _conn()
+            entries = int(conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0])
+            size_bytes = _STATE["size_bytes"]
+        except sqlite3.Error:
+            entries = None
+    return {
+        "enabled": _enabled(),
+        "path": str(_db_path()),
+        "entries": entries,
+        "size_bytes": int(size_bytes or 0),
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+        "disabled_reason": disabled_reason,
+        **stats,
+    }
+
+
+def summary_store_clear() -> None:
+    """Vacía el store (tests/diagnóstico)."""
+    if not _enabled():
+        return
+    try:
+        _conn().execute("DELETE FROM summaries")
+        with _LOCK:
+            _STATE["size_bytes"] = 0
+            for k in _STATS:
+                _STATS[k] = 0
+    except sqlite3.Error as e:
+        _disable(e)
+
+
+def _reset_for_tests() -> None:
+    _DB.reset()
+    with _LOCK:
+        _STATE.update({"path": None, "size_bytes": None})
+        for k in _STATS:
+            _STATS[k] = 0